@@ -0,0 +1,223 @@
+# batch_mp.py
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+
+from frame_scheduler import FrameScheduler
+from landmark_cache import CacheEntry, LandmarkCache
+from pose_backends import BACKENDS, DEFAULT_BACKEND
+from pose_estimator_mp import PoseEstimatorMP, write_data_csv
+from segments import frames_in_segments, parse_segments
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mkv")
+# Gaps between wanted frames longer than this are skipped with a seek instead of grab()
+SEEK_GAP_FRAMES = 300
+
+# One PoseEstimatorMP per worker process, created by the pool initializer
+_worker_estimator = None
+_worker_batch_size = 1
+
+
+def _init_worker(backend=DEFAULT_BACKEND, backend_options=None, batch_size=1):
+    global _worker_estimator, _worker_batch_size
+    _worker_estimator = PoseEstimatorMP()
+    _worker_estimator.backend = backend
+    _worker_estimator.backend_options = dict(backend_options or {})
+    _worker_batch_size = batch_size
+
+
+def _infer_batch(frame_indices, frames, samples, cache_entry):
+    for frame_index, landmarks in zip(frame_indices, _worker_estimator.infer_landmark_batch(frames)):
+        samples[frame_index] = landmarks
+        if cache_entry is not None:
+            cache_entry.put(frame_index, landmarks)
+
+
+def _process_frames(job):
+    video_path, frame_indices, cache_path = job
+    cache_entry = CacheEntry(cache_path) if cache_path else None
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError(f"Error opening video file: {video_path}")
+
+    # Neither the region of interest nor the subject the model tracked in the previous job
+    # (maybe another video) applies to this one, the landmarks must not depend on which
+    # worker ran which chunk before
+    _worker_estimator.front_end.reset()
+    _worker_estimator.pose_landmarker.reset()
+
+    wanted = set(frame_indices)
+    first_frame = min(wanted)
+    if first_frame > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, first_frame)
+
+    samples = {}
+    # Decoded frames wait here until a whole batch can go to the backend in one call
+    batch_indices, batch_frames = [], []
+    position = first_frame
+    for frame_index in sorted(wanted):
+        if frame_index - position > SEEK_GAP_FRAMES:
+            # Long gap, e.g. between segments: seeking beats grabbing through it
+            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+            position = frame_index
+        # Frames that are not sampled are only grabbed, never decoded or passed to the model
+        while position < frame_index and cap.grab():
+            position += 1
+        if position < frame_index:
+            break
+
+        ret, frame = cap.read()
+        position += 1
+        if not ret:
+            break
+
+        batch_indices.append(frame_index)
+        batch_frames.append(frame)
+        if len(batch_frames) >= _worker_batch_size:
+            _infer_batch(batch_indices, batch_frames, samples, cache_entry)
+            batch_indices, batch_frames = [], []
+    if batch_frames:
+        _infer_batch(batch_indices, batch_frames, samples, cache_entry)
+
+    if cache_entry is not None:
+        # Frames past the real end of the file (frame counts are estimates) are never retried
+        for frame_index in wanted.difference(samples):
+            cache_entry.put(frame_index, None)
+        cache_entry.flush()
+
+    cap.release()
+    return video_path, samples
+
+
+def probe_video(video_path):
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError(f"Error opening video file: {video_path}")
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    cap.release()
+
+    if frame_count <= 0:
+        raise ValueError(f"Cannot determine the number of frames in {video_path}")
+    return frame_count, fps
+
+
+def sampled_frames(frame_count, fps, data_points_per_second):
+    # Timestamps come from the frame position, not the wall clock, so ranges can be merged
+    scheduler = FrameScheduler(data_points_per_second)
+    return [frame_index for frame_index in range(frame_count) if scheduler.should_sample(frame_index / fps)]
+
+
+def output_path_for(video_path, output_dir):
+    base_name = os.path.splitext(os.path.basename(video_path))[0]
+    return os.path.join(output_dir or os.path.dirname(video_path), f"{base_name}_motion_data.csv")
+
+
+def run_batch(video_paths, chosen_joint="LEFT_SHOULDER", user_distance=100, output_dir="", workers=None, frames_per_chunk=600, data_points_per_second=None, cache=None,
+              segments=None, backend=DEFAULT_BACKEND, backend_options=None, batch_size=1):
+    # cache: a LandmarkCache, re-analysing a cached video does not run the model at all
+    # segments: only frames inside these (see segments.py) are analysed, workers seek to them
+    # backend, backend_options: pose runtime of the workers (see pose_backends), batch_size
+    # frames go to it per call
+    videos = {}
+    jobs = []
+    for video_path in video_paths:
+        pose_estimator = PoseEstimatorMP(chosen_joint, user_distance=user_distance)
+        pose_estimator.backend = backend
+        pose_estimator.backend_options = dict(backend_options or {})
+        frame_count, fps = probe_video(video_path)
+        frames = frames_in_segments(sampled_frames(frame_count, fps, data_points_per_second), segments, fps)
+
+        cache_entry = None
+        missing = frames
+        if cache is not None:
+            cache_entry = cache.open(video_path, pose_estimator.model_settings(), frame_count, fps)
+            missing = cache_entry.missing(frames).tolist()
+
+        videos[video_path] = (pose_estimator, fps, frames, cache_entry, {})
+        for start in range(0, len(missing), frames_per_chunk):
+            jobs.append((video_path, missing[start:start + frames_per_chunk], cache_entry.path if cache_entry else None))
+
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(backend, backend_options, batch_size)) as executor:
+            futures = [executor.submit(_process_frames, job) for job in jobs]
+            for future in as_completed(futures):
+                video_path, samples = future.result()
+                videos[video_path][4].update(samples)
+
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    output_files = []
+    for video_path, (pose_estimator, fps, frames, cache_entry, computed) in videos.items():
+        # Frames are walked in order, the initial point must come from the earliest frame
+        for frame_index in frames:
+            if frame_index in computed:
+                landmarks = computed[frame_index]
+            elif cache_entry is not None:
+                landmarks = cache_entry.get(frame_index)[1]
+            else:
+                landmarks = None
+            if landmarks is not None:
+                pose_estimator.add_landmark_sample(frame_index / fps, landmarks)
+
+        file_path = output_path_for(video_path, output_dir)
+        write_data_csv(file_path, pose_estimator.data)
+        output_files.append(file_path)
+
+    return output_files
+
+
+def collect_video_paths(paths):
+    video_paths = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.lower().endswith(VIDEO_EXTENSIONS):
+                    video_paths.append(os.path.join(path, name))
+        else:
+            video_paths.append(path)
+    return video_paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless batch pose analysis of recorded video files.")
+    parser.add_argument("videos", nargs="+", help="Video files or folders containing .mp4/.avi/.mkv files")
+    parser.add_argument("--joint", default="LEFT_SHOULDER", help="Joint to analyse (see utils.get_joint_combinations), or ALL_JOINTS")
+    parser.add_argument("--distance", type=float, default=100, help="Reference distance per screen percentage, as sent by the distance picker")
+    parser.add_argument("--output-dir", default="", help="Folder for the CSV files (defaults to next to each video)")
+    parser.add_argument("--rate", type=int, default=None, help="Data points per second (defaults to every frame)")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (defaults to the CPU count)")
+    parser.add_argument("--frames-per-chunk", type=int, default=600, help="Frames handed to a worker at a time")
+    parser.add_argument("--segment", action="append", default=None, metavar="START-END",
+                        help="Only analyse this part of every video, e.g. 1:30-2:00 or f2700-f3600; repeat for more")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default=DEFAULT_BACKEND, help="Pose runtime, see pose_backends.py")
+    parser.add_argument("--model-path", default=None, help="Model file for the mediapipe-tasks (.task) and onnx (.onnx) backends")
+    parser.add_argument("--detector-path", default=None, help="BlazePose person detector (.onnx) the onnx backend finds the subject with")
+    parser.add_argument("--batch-size", type=int, default=1, help="Frames per backend call, the onnx backend runs them as one batch")
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or fill the landmark cache")
+    parser.add_argument("--cache-size-gb", type=float, default=4, help="Size limit of the landmark cache")
+    args = parser.parse_args()
+    if args.backend != DEFAULT_BACKEND and not args.model_path:
+        parser.error(f"--backend {args.backend} needs --model-path")
+    if args.detector_path and args.backend != "onnx":
+        parser.error("--detector-path is for the onnx backend")
+    backend_options = {"model_path": args.model_path} if args.backend != DEFAULT_BACKEND else {}
+    if args.detector_path:
+        backend_options["detector_path"] = args.detector_path
+
+    video_paths = collect_video_paths(args.videos)
+    start = time.perf_counter()
+    cache = None if args.no_cache else LandmarkCache(max_bytes=int(args.cache_size_gb * 1024 ** 3))
+    output_files = run_batch(video_paths, args.joint, args.distance, args.output_dir, args.workers, args.frames_per_chunk, args.rate, cache,
+                              parse_segments(args.segment) if args.segment else None, args.backend, backend_options, max(1, args.batch_size))
+    print(f"Processed {len(video_paths)} video(s) in {time.perf_counter() - start:.1f} s")
+    for file_path in output_files:
+        print(file_path)
+
+
+if __name__ == '__main__':
+    main()
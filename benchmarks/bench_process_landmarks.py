@@ -0,0 +1,147 @@
+# benchmarks/bench_process_landmarks.py
+# Per-frame overhead between the pose model's output and the joint angle, before
+# joints were precompiled into index arrays (string lookups straight into the
+# MediaPipe results) and on the path live sessions run now: the backend converts
+# the landmark list to a (33, 3) array, then PoseEstimatorMP picks the joint's rows
+# out of it.
+#
+# Sessions that draw the skeleton, fill the landmark cache or keep a landmark log
+# convert all 33 landmarks, which costs more than reading three used to (a single
+# joint takes about twice as long per frame as before on plain objects). Headless
+# single-joint sessions only convert the joint's rows and the ones the subject crop
+# is fitted to (PoseEstimatorMP.convert_needed_landmarks_only), which saves about
+# 2 us of the conversion; the rest of the difference is reading those dozen
+# landmarks for the crop every frame. ALL_JOINTS is faster (about 89 -> 51 us).
+#
+#   python benchmarks/bench_process_landmarks.py [--frames 20000]
+import argparse
+import enum
+import math
+import os
+import random
+import sys
+import timeit
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inference_frontend import ROI_LANDMARKS
+from pose_estimator_mp import PoseEstimatorMP
+from utils import ALL_JOINTS, POSE_LANDMARK_NAMES, TRACKED_JOINTS, calculate_angles, landmarks_to_array
+
+try:
+    from mediapipe.framework.formats import landmark_pb2
+    import mediapipe as mp
+    PoseLandmark = mp.solutions.pose.PoseLandmark
+except ImportError:
+    landmark_pb2 = None
+    PoseLandmark = enum.IntEnum('PoseLandmark', {name: i for i, name in enumerate(POSE_LANDMARK_NAMES)})
+
+
+def make_results():
+    # Real MediaPipe protobuf landmarks when available, plain objects otherwise
+    values = [(random.random(), random.random(), random.random()) for _ in POSE_LANDMARK_NAMES]
+    if landmark_pb2 is not None:
+        pose_landmarks = landmark_pb2.NormalizedLandmarkList()
+        for x, y, visibility in values:
+            pose_landmarks.landmark.add(x=x, y=y, visibility=visibility)
+    else:
+        pose_landmarks = SimpleNamespace(landmark=[SimpleNamespace(x=x, y=y, visibility=v) for x, y, v in values])
+    return SimpleNamespace(pose_landmarks=pose_landmarks)
+
+
+def legacy_joint_combinations(chosen_joint):
+    # The string if-chain get_joint_combinations used to be
+    if chosen_joint == "LEFT_SHOULDER":
+        return "RIGHT_SHOULDER", "LEFT_ELBOW", "LEFT_SHOULDER"
+    elif chosen_joint == "RIGHT_SHOULDER":
+        return "LEFT_SHOULDER", "RIGHT_ELBOW", "RIGHT_SHOULDER"
+    elif chosen_joint == "LEFT_ELBOW":
+        return "LEFT_SHOULDER", "LEFT_WRIST", "LEFT_ELBOW"
+    elif chosen_joint == "RIGHT_ELBOW":
+        return "RIGHT_SHOULDER", "RIGHT_WRIST", "RIGHT_ELBOW"
+    elif chosen_joint == "RIGHT_WRIST":
+        return "RIGHT_ELBOW", "RIGHT_INDEX", "RIGHT_WRIST"
+    elif chosen_joint == "LEFT_WRIST":
+        return "LEFT_ELBOW", "LEFT_INDEX", "LEFT_WRIST"
+    elif chosen_joint == "RIGHT_HIP":
+        return "RIGHT_SHOULDER", "RIGHT_KNEE", "RIGHT_HIP"
+    elif chosen_joint == "LEFT_HIP":
+        return "LEFT_SHOULDER", "LEFT_KNEE", "LEFT_HIP"
+    elif chosen_joint == "RIGHT_KNEE":
+        return "RIGHT_HIP", "RIGHT_ANKLE", "RIGHT_KNEE"
+    elif chosen_joint == "LEFT_KNEE":
+        return "LEFT_HIP", "LEFT_ANKLE", "LEFT_KNEE"
+    elif chosen_joint == "RIGHT_ANKLE":
+        return "RIGHT_KNEE", "RIGHT_HEEL", "RIGHT_ANKLE"
+    elif chosen_joint == "LEFT_ANKLE":
+        return "LEFT_KNEE", "LEFT_HEEL", "LEFT_ANKLE"
+    elif chosen_joint == "SKELETON":
+        return "RIGHT_SHOULDER", "LEFT_ELBOW", "LEFT_SHOULDER"
+    else:
+        return "LEFT_SHOULDER", "RIGHT_SHOULDER", "LEFT_ELBOW"
+
+
+def scalar_angle(joint1, joint2, joint_common):
+    # Same math as PoseEstimatorMP.calculate_angle, shared by both paths
+    vector1 = (joint1[0] - joint_common[0], joint1[1] - joint_common[1])
+    vector2 = (joint2[0] - joint_common[0], joint2[1] - joint_common[1])
+    dot_product = vector1[0] * vector2[0] + vector1[1] * vector2[1]
+    magnitude1 = math.sqrt(vector1[0] ** 2 + vector1[1] ** 2)
+    magnitude2 = math.sqrt(vector2[0] ** 2 + vector2[1] ** 2)
+    return math.degrees(math.acos(max(-1.0, min(1.0, dot_product / (magnitude1 * magnitude2)))))
+
+
+def legacy_frame(results, chosen_joint):
+    joint1, joint2, joint_elbow = legacy_joint_combinations(chosen_joint)
+    joint1_position = (
+        results.pose_landmarks.landmark[PoseLandmark[joint1].value].x,
+        results.pose_landmarks.landmark[PoseLandmark[joint1].value].y
+    )
+    joint2_position = (
+        results.pose_landmarks.landmark[PoseLandmark[joint2].value].x,
+        results.pose_landmarks.landmark[PoseLandmark[joint2].value].y
+    )
+    joint_elbow_position = (
+        results.pose_landmarks.landmark[PoseLandmark[joint_elbow].value].x,
+        results.pose_landmarks.landmark[PoseLandmark[joint_elbow].value].y
+    )
+    return scalar_angle(joint1_position, joint2_position, joint_elbow_position)
+
+
+def per_frame_us(function, frames, repeat=5):
+    # Best of a few runs, single runs vary by tens of percent on a busy machine
+    return min(timeit.repeat(function, number=frames, repeat=repeat)) / frames * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the landmark handling between the pose model and the joint angles.")
+    parser.add_argument("--frames", type=int, default=20000)
+    args = parser.parse_args()
+
+    results = make_results()
+    landmarks = landmarks_to_array(results.pose_landmarks)
+    print(f"Landmarks: {'MediaPipe protobuf' if landmark_pb2 is not None else 'plain Python objects'}, {args.frames} frames")
+    print(f"{'joint':>16} {'before (us)':>12} {'convert (us)':>13} {'extract (us)':>13} {'after (us)':>12} {'headless (us)':>14}")
+
+    convert = per_frame_us(lambda: landmarks_to_array(results.pose_landmarks), args.frames)
+    for joint in ("LEFT_SHOULDER", "LEFT_ANKLE", "SKELETON"):
+        pose_estimator = PoseEstimatorMP(joint)
+        before = per_frame_us(lambda: legacy_frame(results, joint), args.frames)
+        extract = per_frame_us(lambda: scalar_angle(*pose_estimator.joint_positions(landmarks)), args.frames)
+        # The rows convert_needed_landmarks_only leaves the backend to read
+        rows = np.array(sorted(set(ROI_LANDMARKS).union(pose_estimator.joint_rows)), dtype=np.intp)
+        convert_rows = per_frame_us(lambda: landmarks_to_array(results.pose_landmarks, rows), args.frames)
+        print(f"{joint:>16} {before:>12.2f} {convert:>13.2f} {extract:>13.2f} {convert + extract:>12.2f} {convert_rows + extract:>14.2f}")
+
+    # All twelve joints: twelve single-joint passes before, one vectorized call after
+    triples = PoseEstimatorMP(ALL_JOINTS).joint_triples
+    before = per_frame_us(lambda: [legacy_frame(results, joint) for joint in TRACKED_JOINTS], args.frames // 10)
+    extract = per_frame_us(lambda: calculate_angles(landmarks, triples), args.frames // 10)
+    print(f"{'ALL_JOINTS':>16} {before:>12.2f} {convert:>13.2f} {extract:>13.2f} {convert + extract:>12.2f} {'-':>14}")
+
+
+if __name__ == '__main__':
+    main()
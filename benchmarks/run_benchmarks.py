@@ -0,0 +1,332 @@
+# benchmarks/run_benchmarks.py
+# Repeatable headless benchmark of the estimation pipeline. Runs on generated
+# frames or recorded videos, with a stub pose model (default, measures everything
+# but the network) or the real MediaPipe model, and saves the results as JSON so
+# two versions can be compared.
+#
+#   python benchmarks/run_benchmarks.py --frames 300 --output before.json
+#   python benchmarks/run_benchmarks.py --video clip.mp4 --model mediapipe --output after.json --compare before.json
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pose_backends import BACKENDS, PoseBackend
+from pose_estimator_mp import PoseEstimatorMP, create_pose_model
+from recompute import recompute_store
+from session import EstimationSession
+from utils import ALL_JOINTS, POSE_LANDMARK_NAMES, draw_landmark_array
+
+
+# Stands in for a real pose backend: a fixed pose that sways with every frame
+class StubPoseModel(PoseBackend):
+    name = "stub"
+    model_name = "stub"
+
+    def __init__(self, seed=0):
+        rng = np.random.default_rng(seed)
+        self.base = np.column_stack((rng.uniform(0.3, 0.7, len(POSE_LANDMARK_NAMES)),
+                                     rng.uniform(0.2, 0.9, len(POSE_LANDMARK_NAMES)),
+                                     rng.uniform(0.6, 1.0, len(POSE_LANDMARK_NAMES))))
+        self.calls = 0
+
+    def infer(self, frame, timestamp=None):
+        self.calls += 1
+        landmarks = self.base.copy()
+        landmarks[:, 0] += 0.05 * np.sin(self.calls / 10)
+        return landmarks
+
+    def reset(self):
+        self.calls = 0
+
+
+def synthetic_frames(count, width, height):
+    # A bright figure-sized block moving over a noisy background
+    rng = np.random.default_rng(0)
+    background = rng.integers(0, 64, (height, width, 3), dtype=np.uint8)
+    for index in range(count):
+        frame = background.copy()
+        x = int((0.3 + 0.2 * np.sin(index / 15)) * width)
+        cv2.rectangle(frame, (x, height // 6), (x + width // 5, height * 5 // 6), (200, 180, 160), -1)
+        yield frame
+
+
+def write_fixture_video(path, count, width, height, fps=30):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (width, height))
+    for frame in synthetic_frames(count, width, height):
+        writer.write(frame)
+    writer.release()
+
+
+def read_frames(video_path, limit):
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+    while len(frames) < limit:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def make_estimator(model, chosen_joint, model_path=None):
+    # model is "stub" or a pose_backends backend name
+    pose_estimator = PoseEstimatorMP(chosen_joint, user_distance=0.05)
+    if model == "stub":
+        pose_estimator._pose_landmarker = StubPoseModel()
+    else:
+        pose_estimator.backend = model
+        pose_estimator.backend_options = {"model_path": model_path} if model_path else {}
+        pose_estimator._pose_landmarker = create_pose_model(pose_estimator.model_complexity, model, pose_estimator.backend_options)
+    return pose_estimator
+
+
+def summarize(durations, cpu_seconds=None, frames=None):
+    # cpu_seconds is the process CPU time the calls used on all cores together,
+    # frames per CPU second compares runtimes that use different numbers of threads
+    durations = np.asarray(durations) * 1000
+    if len(durations) == 0:
+        return {"count": 0}
+    summary = {
+        "count": int(len(durations)),
+        "mean_ms": float(durations.mean()),
+        "p50_ms": float(np.percentile(durations, 50)),
+        "p99_ms": float(np.percentile(durations, 99)),
+        "fps": float(1000 / durations.mean()) if durations.mean() > 0 else None,
+    }
+    if cpu_seconds:
+        summary["fps_per_core"] = float((frames or len(durations)) / cpu_seconds)
+    return summary
+
+
+def time_calls(function, items):
+    durations = []
+    for item in items:
+        start = time.perf_counter()
+        function(item)
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def bench_stages(frames, model, chosen_joint, model_path=None, batch_size=1):
+    # Every stage on the same frames, one after the other, without threads in between
+    pose_estimator = make_estimator(model, chosen_joint, model_path)
+    stages = {}
+
+    landmarks = []
+    cpu_start = time.process_time()
+    durations = time_calls(lambda frame: landmarks.append(pose_estimator.infer_landmarks(frame)), frames)
+    stages["inference"] = summarize(durations, time.process_time() - cpu_start)
+
+    if batch_size > 1:
+        # Same frames through infer_landmark_batch, durations are per batch
+        batching = make_estimator(model, chosen_joint, model_path)
+        batches = [frames[start:start + batch_size] for start in range(0, len(frames), batch_size)]
+        cpu_start = time.process_time()
+        durations = time_calls(batching.infer_landmark_batch, batches)
+        stages["inference_batch"] = summarize(durations, time.process_time() - cpu_start, len(frames))
+
+    timestamps = iter(np.arange(len(frames)) / 30)
+    stages["process_landmarks"] = summarize(time_calls(
+        lambda pair: pose_estimator.process_landmark_array(pair[0], chosen_joint, pair[1], next(timestamps)), list(zip(frames, landmarks))))
+
+    found = [frame_landmarks for frame_landmarks in landmarks if frame_landmarks is not None]
+    if found:
+        points = [pose_estimator.joint_positions(frame_landmarks) for frame_landmarks in found]
+        stages["calculate_angle"] = summarize(time_calls(lambda joints: pose_estimator.calculate_angle(*joints), points))
+        stages["draw_landmarks"] = summarize(time_calls(lambda pair: draw_landmark_array(pair[0], pair[1]), list(zip(frames, found))))
+
+    stages["display"] = bench_display(frames)
+
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        pose_estimator.save_data(os.path.join(directory, "motion_data.csv"))
+        stages["save_data"] = summarize([time.perf_counter() - start])
+
+        streaming = make_estimator("stub", chosen_joint)
+        streaming.start_streaming(os.path.join(directory, "streamed"))
+        rows = pose_estimator.data.samples()
+        stages["stream_append"] = summarize(time_calls(streaming.record_sample, [row.tolist() for row in rows]))
+        streaming.writer.close()
+
+    stages["recompute"] = bench_recompute(landmarks, chosen_joint)
+    return stages
+
+
+def bench_recompute(landmarks, chosen_joint, samples=30000):
+    # recompute.py throughput on a landmark log of `samples` samples, as logged and with the filter run again
+    found = [frame_landmarks for frame_landmarks in landmarks if frame_landmarks is not None]
+    if not found:
+        return {"skipped": "no pose found"}
+    pose_estimator = make_estimator("stub", chosen_joint)
+    log = pose_estimator.keep_landmarks()
+    for index in range(samples):
+        pose_estimator.add_landmark_sample(index / 30, found[index % len(found)])
+
+    results = {"samples": samples}
+    for name, filter_settings in (("logged", None), ("refiltered", {})):
+        start = time.perf_counter()
+        recompute_store(log, filter_settings=filter_settings)
+        results[f"{name}_samples_per_second"] = samples / (time.perf_counter() - start)
+    return results
+
+
+def bench_display(frames):
+    # Zero-copy QImage wrapping plus a scaled paint into an offscreen image, skipped without PyQt5
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    try:
+        from PyQt5.QtCore import QRectF
+        from PyQt5.QtGui import QImage, QPainter
+        from PyQt5.QtWidgets import QApplication
+        from video_display import frame_to_qimage
+    except ImportError:
+        return {"count": 0, "skipped": "PyQt5 is not installed"}
+
+    app = QApplication.instance() or QApplication([])  # QPainter needs an application object
+    target = QImage(1920, 1080, QImage.Format_RGB32)
+
+    def paint(frame):
+        image, buffer = frame_to_qimage(frame)
+        painter = QPainter(target)
+        painter.drawImage(QRectF(0, 0, 1920, 1080), image)
+        painter.end()
+
+    return summarize(time_calls(paint, frames))
+
+
+def bench_pipeline(video_path, model, chosen_joint, frame_count, model_path=None):
+    # End-to-end headless session through the threaded pipeline. Tracing allocations
+    # slows Python down, so throughput and peak memory come from two separate runs.
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    cap.release()
+
+    def run_session():
+        pose_estimator = make_estimator(model, chosen_joint, model_path)
+        report = EstimationSession(pose_estimator, video_path, max_duration=frame_count / fps).run()
+        return pose_estimator, report
+
+    start = time.perf_counter()
+    pose_estimator, report = run_session()
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    run_session()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    frames = report[0]["frames"]
+    return {
+        "frames": frames,
+        "samples": len(pose_estimator.data),
+        "seconds": elapsed,
+        "fps": frames / elapsed if elapsed > 0 else None,
+        "peak_memory_mb": peak / 1024 ** 2,
+        "stages": report,
+    }
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def print_results(results, baseline=None):
+    print(f"{'stage':>18} {'p50 (ms)':>10} {'p99 (ms)':>10} {'FPS':>10} {'FPS/core':>10}" + (f" {'p50 vs baseline':>16}" if baseline else ""))
+    for name, stage in results["stages"].items():
+        if name == "recompute":
+            continue
+        if not stage.get("count"):
+            print(f"{name:>18} {'skipped: ' + stage.get('skipped', 'no data')}")
+            continue
+        fps_per_core = f"{stage['fps_per_core']:.1f}" if stage.get("fps_per_core") else "-"
+        line = f"{name:>18} {stage['p50_ms']:>10.3f} {stage['p99_ms']:>10.3f} {stage['fps']:>10.1f} {fps_per_core:>10}"
+        before = baseline["stages"].get(name, {}) if baseline else {}
+        if before.get("p50_ms"):
+            line += f" {stage['p50_ms'] / before['p50_ms']:>15.2f}x"
+        print(line)
+
+    recompute = results["stages"].get("recompute", {})
+    if recompute.get("samples"):
+        print(f"recompute: {recompute['samples']} samples, {recompute['logged_samples_per_second']:.0f} samples/s as logged, "
+              f"{recompute['refiltered_samples_per_second']:.0f} samples/s with --refilter")
+
+    pipeline = results["pipeline"]
+    line = f"pipeline: {pipeline['frames']} frames at {pipeline['fps']:.1f} FPS, peak memory {pipeline['peak_memory_mb']:.1f} MB"
+    if baseline:
+        line += f" (baseline {baseline['pipeline']['fps']:.1f} FPS, {baseline['pipeline']['peak_memory_mb']:.1f} MB)"
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the estimation pipeline stage by stage.")
+    parser.add_argument("--video", default=None, help="Recorded video to use instead of generated frames")
+    parser.add_argument("--frames", type=int, default=300, help="Number of frames to benchmark")
+    parser.add_argument("--width", type=int, default=1280, help="Width of generated frames")
+    parser.add_argument("--height", type=int, default=720, help="Height of generated frames")
+    parser.add_argument("--model", choices=["stub"] + sorted(BACKENDS), default="stub", help="Pose backend, the stub leaves only our own code")
+    parser.add_argument("--model-path", default=None, help="Model file for the mediapipe-tasks and onnx backends")
+    parser.add_argument("--batch-size", type=int, default=1, help="Also time inference in batches of this many frames")
+    parser.add_argument("--joint", default="LEFT_ELBOW", help=f"Joint to analyse, or {ALL_JOINTS}")
+    parser.add_argument("--output", default=None, help="JSON file for the results")
+    parser.add_argument("--compare", default=None, help="Earlier JSON results to compare against")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        video_path = args.video
+        if video_path is None:
+            video_path = os.path.join(directory, "synthetic.avi")
+            write_fixture_video(video_path, args.frames, args.width, args.height)
+
+        frames = read_frames(video_path, args.frames)
+        if not frames:
+            raise ValueError(f"No frames could be read from {video_path}")
+
+        results = {
+            "environment": environment(),
+            "fixture": {"video": args.video or "synthetic", "frames": len(frames),
+                        "width": frames[0].shape[1], "height": frames[0].shape[0]},
+            "model": args.model,
+            "joint": args.joint,
+            "batch_size": args.batch_size,
+            "stages": bench_stages(frames, args.model, args.joint, args.model_path, args.batch_size),
+            "pipeline": bench_pipeline(video_path, args.model, args.joint, len(frames), args.model_path),
+        }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+    print_results(results, baseline)
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(results, output_file, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
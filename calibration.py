@@ -0,0 +1,205 @@
+# calibration.py
+# Reference scale of a camera, saved per camera and resolution so later sessions
+# start without picking the reference again. A calibration is a known real length
+# (e.g. 100 cm) and how long it is in the camera frame, in percent of the frame
+# diagonal, measured in the frame's own pixels whatever window it was picked in.
+#
+# Besides picking two points in PointSelectorApp the reference can be found
+# automatically, from a printed checkerboard or ArUco marker of known size:
+#   python calibration.py 0 --checkerboard 9x6 --square-size 2.5
+#   python calibration.py 0 --aruco --marker-size 15
+#   python calibration.py --list
+import argparse
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+
+from utils import app_data_dir
+
+CALIBRATION_FILE = "calibrations.json"
+MANUAL = "manual"
+CHECKERBOARD = "checkerboard"
+ARUCO = "aruco"
+ARUCO_DICTIONARY = "DICT_4X4_50"
+
+
+def reference_scale(reference_distance, reference_percentage):
+    # Same scale PointSelectorApp sends: distance per percent of the frame, divided by 100
+    return float(reference_distance) / float(reference_percentage * 100)
+
+
+def diagonal_percentage(pixel_length, width, height):
+    return pixel_length / np.hypot(width, height) * 100
+
+
+def calibration_key(device, width, height):
+    return f"{device}:{int(width)}x{int(height)}"
+
+
+class Calibration:
+    def __init__(self, device, width, height, percentage, reference_distance, unit="cm", method=MANUAL, points=None, saved_at=None):
+        self.device = device
+        self.width = int(width)
+        self.height = int(height)
+        self.percentage = float(percentage)  # reference length in percent of the frame diagonal
+        self.reference_distance = float(reference_distance)
+        self.unit = unit
+        self.method = method
+        self.points = points or []  # the reference's end points in frame pixels, for showing it again
+        self.saved_at = saved_at
+
+    @property
+    def key(self):
+        return calibration_key(self.device, self.width, self.height)
+
+    @property
+    def scale(self):
+        return reference_scale(self.reference_distance, self.percentage)
+
+    def describe(self):
+        return f"{self.reference_distance:g} {self.unit} = {self.percentage:.2f}% of the frame ({self.method}, {self.width}x{self.height})"
+
+    def to_dict(self):
+        return {"device": self.device, "width": self.width, "height": self.height, "percentage": self.percentage,
+                "reference_distance": self.reference_distance, "unit": self.unit, "method": self.method,
+                "points": [list(map(float, point)) for point in self.points], "saved_at": self.saved_at}
+
+
+def load_calibrations():
+    try:
+        with open(os.path.join(app_data_dir(), CALIBRATION_FILE)) as calibration_file:
+            return {key: Calibration(**values) for key, values in json.load(calibration_file).items()}
+    except (OSError, ValueError, TypeError):
+        return {}
+
+
+def load_calibration(device, width, height):
+    return load_calibrations().get(calibration_key(device, width, height))
+
+
+def save_calibration(calibration):
+    calibrations = load_calibrations()
+    calibration.saved_at = time.strftime("%Y-%m-%dT%H:%M:%S")
+    calibrations[calibration.key] = calibration
+    path = os.path.join(app_data_dir(), CALIBRATION_FILE)
+    with open(path, "w") as calibration_file:
+        json.dump({key: value.to_dict() for key, value in calibrations.items()}, calibration_file, indent=2)
+    return path
+
+
+def find_checkerboard(frame, pattern=(9, 6)):
+    # (pixel length, end points) of one row of inner corners, i.e. pattern[0] - 1 squares,
+    # averaged over every row; None when the board is not found.
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    found, corners = cv2.findChessboardCorners(gray, pattern, flags=cv2.CALIB_CB_ADAPTIVE_THRESH | cv2.CALIB_CB_NORMALIZE_IMAGE)
+    if not found:
+        return None
+    criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 30, 0.01)
+    corners = cv2.cornerSubPix(gray, corners, (11, 11), (-1, -1), criteria).reshape(pattern[1], pattern[0], 2)
+    row_lengths = np.linalg.norm(corners[:, -1] - corners[:, 0], axis=1)
+    middle_row = corners[pattern[1] // 2]
+    return float(row_lengths.mean()), [tuple(middle_row[0]), tuple(middle_row[-1])]
+
+
+def find_aruco_marker(frame, dictionary=ARUCO_DICTIONARY):
+    # (pixel length, end points) of a marker side, averaged over the sides of every marker
+    # found; None when there is none or OpenCV was built without the aruco module.
+    if not hasattr(cv2, "aruco"):
+        print("This OpenCV build has no aruco module")
+        return None
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    marker_dictionary = cv2.aruco.getPredefinedDictionary(getattr(cv2.aruco, dictionary))
+    if hasattr(cv2.aruco, "ArucoDetector"):
+        corners, ids, _ = cv2.aruco.ArucoDetector(marker_dictionary, cv2.aruco.DetectorParameters()).detectMarkers(gray)
+    else:
+        corners, ids, _ = cv2.aruco.detectMarkers(gray, marker_dictionary)
+    if ids is None or len(corners) == 0:
+        return None
+    quads = np.concatenate([corner.reshape(1, 4, 2) for corner in corners])
+    side_lengths = np.linalg.norm(quads - np.roll(quads, -1, axis=1), axis=2)
+    return float(side_lengths.mean()), [tuple(quads[0, 0]), tuple(quads[0, 1])]
+
+
+def auto_calibrate(frame, device, method, reference_distance, unit="cm", pattern=(9, 6)):
+    # Calibration from a checkerboard (reference_distance is one square) or an ArUco
+    # marker (reference_distance is its side), None when the target is not in the frame
+    if method == CHECKERBOARD:
+        found = find_checkerboard(frame, pattern)
+        reference_distance = reference_distance * (pattern[0] - 1)
+    else:
+        found = find_aruco_marker(frame)
+    if found is None:
+        return None
+    pixel_length, points = found
+    height, width = frame.shape[:2]
+    return Calibration(device, width, height, diagonal_percentage(pixel_length, width, height), reference_distance, unit, method, points)
+
+
+def camera_resolution(device):
+    # Frame size the camera opens with, which is what a session will get
+    cap = cv2.VideoCapture(device)
+    try:
+        if not cap.isOpened():
+            return None
+        return int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    finally:
+        cap.release()
+
+
+def read_camera_frame(device, warm_up_frames=10):
+    # One settled frame, the first ones of many cameras are still adjusting exposure
+    cap = cv2.VideoCapture(device)
+    try:
+        frame = None
+        for _ in range(warm_up_frames):
+            ret, candidate = cap.read()
+            if ret:
+                frame = candidate
+        return frame
+    finally:
+        cap.release()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate a camera's reference scale from a checkerboard or ArUco marker.")
+    parser.add_argument("device", nargs="?", type=int, help="Camera index")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--checkerboard", default=None, metavar="COLSxROWS", help="Inner corners of the checkerboard, e.g. 9x6")
+    target.add_argument("--aruco", action="store_true", help=f"Use an ArUco marker from {ARUCO_DICTIONARY}")
+    parser.add_argument("--square-size", type=float, default=None, help="Side of one checkerboard square")
+    parser.add_argument("--marker-size", type=float, default=None, help="Side of the ArUco marker")
+    parser.add_argument("--unit", default="cm", choices=("cm", "inch"))
+    parser.add_argument("--list", action="store_true", help="Show the saved calibrations")
+    args = parser.parse_args()
+
+    if args.list:
+        for key, calibration in sorted(load_calibrations().items()):
+            print(f"{key}: {calibration.describe()}, scale {calibration.scale:.6f}, saved {calibration.saved_at}")
+        return
+    if args.device is None or not (args.checkerboard or args.aruco):
+        parser.error("give a camera index and --checkerboard or --aruco")
+
+    if args.checkerboard:
+        if not args.square_size:
+            parser.error("--checkerboard needs --square-size")
+        method, size, pattern = CHECKERBOARD, args.square_size, tuple(int(value) for value in args.checkerboard.lower().split("x"))
+    else:
+        if not args.marker_size:
+            parser.error("--aruco needs --marker-size")
+        method, size, pattern = ARUCO, args.marker_size, (9, 6)
+
+    frame = read_camera_frame(args.device)
+    if frame is None:
+        raise ValueError(f"Error opening camera {args.device}")
+    calibration = auto_calibrate(frame, args.device, method, size, args.unit, pattern)
+    if calibration is None:
+        raise SystemExit(f"No {method} found in the frame of camera {args.device}")
+    path = save_calibration(calibration)
+    print(f"Camera {args.device}: {calibration.describe()}, scale {calibration.scale:.6f}, saved to {path}")
+
+
+if __name__ == '__main__':
+    main()
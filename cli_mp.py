@@ -0,0 +1,184 @@
+# cli_mp.py
+# Headless command-line entry point, never imports Qt or Tk:
+#   python cli_mp.py 0 --joint LEFT_ELBOW --scale 0.05 --rate 10 --output session.csv --duration 60
+#   python cli_mp.py recording.mp4 --joint ALL_JOINTS --reference-distance 100 --reference-percentage 25 --output out.csv
+#   python cli_mp.py 0 1 --scale 0.05 0.04 --output lab.csv   (lab_0.csv and lab_1.csv, one per camera)
+#   python cli_mp.py 0 --spool-to lab.spool --duration 600      (capture only, analyse lab.spool later)
+# Cameras without a scale use the calibration saved for them (distance picker or calibration.py).
+import argparse
+import os
+
+from calibration import camera_resolution, load_calibration, reference_scale
+from landmark_cache import LandmarkCache
+from metrics_publisher import DEFAULT_CHANNEL
+from pose_backends import BACKENDS, DEFAULT_BACKEND
+from segments import parse_segments
+from session import OpenCVDisplay, parse_source, run_session
+from session_manager import SessionManager
+from video_capture import is_live_source
+from spool import SpoolRecorder, is_spool
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Run a pose estimation session from a camera index or video file.")
+    parser.add_argument("sources", nargs="+", metavar="source", help="Camera index (e.g. 0) or path to a video file, several run concurrently")
+    parser.add_argument("--joint", default="LEFT_SHOULDER", help="Joint to analyse (see utils.JOINT_COMBINATIONS), or ALL_JOINTS")
+    # Scales take one value for every source or one value per source
+    parser.add_argument("--scale", type=float, nargs="+", default=None, help="Reference scale as sent by the distance picker")
+    parser.add_argument("--reference-distance", type=float, nargs="+", default=None, help="Real length of the reference, e.g. 100 (cm)")
+    parser.add_argument("--reference-percentage", type=float, nargs="+", default=None, help="Length of the reference in percent of the frame diagonal")
+    parser.add_argument("--rate", type=int, default=None, help="Data points per second (defaults to every frame)")
+    parser.add_argument("--output", default=None, help="CSV file to write, a .npy file is written next to it")
+    parser.add_argument("--duration", type=float, default=None, help="Stop after this many seconds of video")
+    parser.add_argument("--display", action="store_true", help="Show the annotated frames in an OpenCV window")
+    parser.add_argument("--publish", nargs="?", const=DEFAULT_CHANNEL, default=None, metavar="CHANNEL",
+                        help="Publish samples live on a shared-memory channel, read with metrics_publisher.py")
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or fill the landmark cache")
+    parser.add_argument("--stats", default=None, metavar="PATH", help="Time every stage and write the statistics to this JSON file")
+    parser.add_argument("--overlay", action="store_true", help="Draw live stage timings on the displayed frames (with --display)")
+    parser.add_argument("--segment", action="append", default=None, metavar="START-END",
+                        help="Only analyse this part of a video file, e.g. 1:30-2:00, 95-120 or f2700-f3600; repeat for more")
+    parser.add_argument("--keep-landmarks", action="store_true", help="Save the landmarks next to --output for recompute.py")
+    parser.add_argument("--spool-to", default=None, metavar="PATH",
+                        help="Only record the camera to this .spool file at its full frame rate, analyse it later by passing it as the source")
+    parser.add_argument("--spool-quality", type=int, default=90, help="JPEG quality of spooled frames")
+    parser.add_argument("--adaptive-quality", action="store_true",
+                        help="Lower model, resolution and display cost of a camera under load to hold the rate, logged per sample")
+    parser.add_argument("--reps", action="store_true", help="Count repetitions, range of motion and holds live, summary saved next to --output")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default=DEFAULT_BACKEND, help="Pose runtime, see pose_backends.py")
+    parser.add_argument("--model-path", default=None, help="Model file for the mediapipe-tasks (.task) and onnx (.onnx) backends")
+    parser.add_argument("--detector-path", default=None, help="BlazePose person detector (.onnx) the onnx backend finds the subject with")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Sources run at the same time (defaults to all of them, at least one per camera)")
+    return parser
+
+
+def per_source(parser, values, count, name):
+    if len(values) == 1:
+        return values * count
+    if len(values) != count:
+        parser.error(f"{name} needs one value or one value per source")
+    return values
+
+
+def output_path_for(output, index):
+    base, extension = os.path.splitext(output)
+    return f"{base}_{index}{extension or '.csv'}"
+
+
+def sample_count(pose_estimator):
+    # While streaming, data only holds the newest samples, the writer counted every row it saved
+    return pose_estimator.saved_rows if pose_estimator.saved_rows is not None else len(pose_estimator.data)
+
+
+def saved_scales(parser, sources):
+    user_distances = []
+    for source in sources:
+        source = parse_source(source)
+        calibration = None
+        if is_live_source(source):
+            resolution = camera_resolution(source)
+            calibration = load_calibration(source, *resolution) if resolution else None
+        if calibration is None:
+            parser.error(f"give either --scale or --reference-distance with --reference-percentage, {source} has no saved calibration")
+        print(f"Camera {source}: {calibration.describe()}")
+        user_distances.append(calibration.scale)
+    return user_distances
+
+
+def record_spool(parser, args):
+    if len(args.sources) > 1:
+        parser.error("--spool-to takes a single source")
+    if not is_spool(args.spool_to):
+        parser.error("--spool-to needs a path ending in .spool")
+    recorder = SpoolRecorder(parse_source(args.sources[0]), args.spool_to, display=OpenCVDisplay() if args.display else None,
+                             max_duration=args.duration, quality=args.spool_quality)
+    try:
+        recorder.run()
+    except KeyboardInterrupt:
+        pass  # Ctrl+C ends the recording, the spool is complete up to here
+    recorder.print_report()
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    count = len(args.sources)
+    if args.spool_to:
+        record_spool(parser, args)
+        return
+    if args.segment and any(is_spool(source) for source in args.sources):
+        parser.error("--segment works on video files, not spools")
+
+    if args.scale is not None:
+        user_distances = per_source(parser, args.scale, count, "--scale")
+    elif args.reference_distance is not None and args.reference_percentage:
+        distances = per_source(parser, args.reference_distance, count, "--reference-distance")
+        percentages = per_source(parser, args.reference_percentage, count, "--reference-percentage")
+        user_distances = [reference_scale(distance, percentage) for distance, percentage in zip(distances, percentages)]
+    else:
+        user_distances = saved_scales(parser, args.sources)
+
+    if args.backend != DEFAULT_BACKEND and not args.model_path:
+        parser.error(f"--backend {args.backend} needs --model-path")
+    if args.detector_path and args.backend != "onnx":
+        parser.error("--detector-path is for the onnx backend")
+    backend_options = {"model_path": args.model_path} if args.backend != DEFAULT_BACKEND else {}
+    if args.detector_path:
+        backend_options["detector_path"] = args.detector_path
+
+    if args.keep_landmarks and not args.output:
+        parser.error("--keep-landmarks needs --output, the landmarks are saved next to it")
+
+    cache = None if args.no_cache else LandmarkCache()
+    if count > 1:
+        if args.display or args.publish or args.stats or args.segment:
+            parser.error("--display, --publish, --stats and --segment take a single source")
+        manager = SessionManager(workers=args.workers, landmark_cache=cache, max_duration=args.duration,
+                                 backend=args.backend, backend_options=backend_options, keep_landmarks=args.keep_landmarks,
+                                 analytics=args.reps, adaptive_quality=args.adaptive_quality)
+        for index, (source, user_distance) in enumerate(zip(args.sources, user_distances)):
+            manager.add_source(source, chosen_joint=args.joint, user_distance=user_distance, data_points_per_second=args.rate,
+                               output_path=output_path_for(args.output, index) if args.output else None)
+        live_count = len(manager.live_sources())
+        if args.workers and args.workers < live_count:
+            parser.error(f"--workers must be at least the number of cameras ({live_count}), they are captured together")
+        manager.run()
+        manager.print_report()
+        for session_source in manager.sources:
+            print(f"{session_source.name}: {sample_count(session_source.pose_estimator)} samples"
+                  + (f" written to {session_source.output_path}" if session_source.output_path else ""))
+            if session_source.pose_estimator.analytics is not None:
+                session_source.pose_estimator.analytics.print_summary()
+        return
+
+    pose_estimator = run_session(
+        args.sources[0],
+        chosen_joint=args.joint,
+        user_distance=user_distances[0],
+        data_points_per_second=args.rate,
+        output_path=args.output,
+        display=OpenCVDisplay() if args.display else None,
+        landmark_cache=cache,
+        max_duration=args.duration,
+        publish_channel=args.publish,
+        stats_path=args.stats,
+        overlay=args.overlay,
+        keep_landmarks=args.keep_landmarks,
+        segments=parse_segments(args.segment) if args.segment else None,
+        backend=args.backend,
+        backend_options=backend_options,
+        adaptive_quality=args.adaptive_quality,
+        analytics=args.reps,
+    )
+
+    for stage in pose_estimator.session_report:
+        print(f"{stage['stage']:>10}: {stage['frames']} frames, {stage['fps']:.1f} FPS, {stage['mean_ms']:.1f} ms/frame")
+    print(f"{sample_count(pose_estimator)} samples" + (f" written to {args.output}" if args.output else ""))
+    if pose_estimator.analytics is not None:
+        pose_estimator.analytics.print_summary()
+
+
+if __name__ == '__main__':
+    main()
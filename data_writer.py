@@ -0,0 +1,133 @@
+# data_writer.py
+import ast
+import csv
+import os
+import queue
+import shutil
+import struct
+import threading
+
+import numpy as np
+
+NPY_MAGIC = b'\x93NUMPY\x01\x00'
+NPY_HEADER_SIZE = 128  # fixed so the row count can be rewritten in place after every flush
+
+PARTIAL_SUFFIX = ".partial"
+
+
+def _npy_header(rows, columns):
+    header = "{'descr': '<f8', 'fortran_order': False, 'shape': (%d, %d), }" % (rows, columns)
+    padding = NPY_HEADER_SIZE - len(NPY_MAGIC) - 2 - len(header) - 1
+    return NPY_MAGIC + struct.pack('<H', NPY_HEADER_SIZE - len(NPY_MAGIC) - 2) + (header + ' ' * padding + '\n').encode('latin1')
+
+
+def recover_npy(file_path):
+    # Partial .npy files are valid up to their last flush, anything written after it is ignored
+    with open(file_path, 'rb') as npy_file:
+        header = npy_file.read(NPY_HEADER_SIZE)
+    shape = ast.literal_eval(header[len(NPY_MAGIC) + 2:].decode('latin1').strip())['shape']
+    return np.memmap(file_path, dtype='<f8', mode='r', offset=NPY_HEADER_SIZE, shape=shape)
+
+
+# Writes samples to disk from a background thread as they arrive.
+# Rows go to <name>.partial.csv and <name>.partial.npy, every batch is flushed and
+# fsync'ed so a crash loses at most flush_interval seconds of data. finalize()
+# renames the partial files, so the end-of-session save does not depend on the
+# length of the session.
+class StreamingDataWriter:
+    def __init__(self, base_path, fieldnames, batch_size=64, flush_interval=1.0, decimals=2):
+        self.base_path = os.path.splitext(base_path)[0]
+        self.fieldnames = fieldnames
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.decimals = decimals
+        self.rows_written = 0
+        self.closed = False
+        self.error = None
+
+        self.csv_path = self.base_path + PARTIAL_SUFFIX + ".csv"
+        self.npy_path = self.base_path + PARTIAL_SUFFIX + ".npy"
+
+        self.csv_file = open(self.csv_path, mode='w', newline='')
+        self.csv_writer = csv.writer(self.csv_file)
+        self.csv_writer.writerow(fieldnames)
+        self.npy_file = open(self.npy_path, mode='w+b')
+        self.npy_file.write(_npy_header(0, len(fieldnames)))
+        self._sync()
+
+        self.queue = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self._run, name="data-writer", daemon=True)
+        self.thread.start()
+
+    def append(self, row):
+        self.queue.put(row)
+
+    def _run(self):
+        batch = []
+        running = True
+        while running:
+            try:
+                row = self.queue.get(timeout=self.flush_interval)
+                if row is None:
+                    running = False
+                else:
+                    batch.append(row)
+                    if len(batch) < self.batch_size:
+                        continue
+            except queue.Empty:
+                pass
+
+            if batch:
+                try:
+                    self._write_batch(batch)
+                except Exception as e:
+                    self.error = e
+                    running = False
+                batch = []
+
+    def _write_batch(self, batch):
+        values = np.asarray(batch, dtype=np.float64)
+
+        # Rounding is done once per batch instead of value by value
+        self.csv_writer.writerows(np.round(values, self.decimals).tolist())
+
+        self.npy_file.seek(0, os.SEEK_END)
+        self.npy_file.write(values.tobytes())
+        self.rows_written += len(values)
+        self.npy_file.seek(0)
+        self.npy_file.write(_npy_header(self.rows_written, len(self.fieldnames)))
+        self._sync()
+
+    def _sync(self):
+        for file in (self.csv_file, self.npy_file):
+            file.flush()
+            os.fsync(file.fileno())
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.put(None)
+        self.thread.join()
+        self.csv_file.close()
+        self.npy_file.close()
+        if self.error is not None:
+            raise self.error
+
+    def finalize(self, csv_path):
+        # Move the partial files to their final names, the .npy file sits next to the CSV
+        self.close()
+        npy_path = os.path.splitext(csv_path)[0] + ".npy"
+        for source, destination in ((self.csv_path, csv_path), (self.npy_path, npy_path)):
+            try:
+                os.replace(source, destination)
+            except OSError:
+                # Different drive, fall back to a copy
+                shutil.move(source, destination)
+        return csv_path, npy_path
+
+    def discard(self):
+        self.close()
+        for file_path in (self.csv_path, self.npy_path):
+            if os.path.exists(file_path):
+                os.remove(file_path)
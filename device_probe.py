@@ -0,0 +1,66 @@
+# device_probe.py
+import json
+import os
+
+import cv2
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from utils import app_data_dir
+
+DEVICE_CACHE_FILE = "devices.json"
+
+
+def device_label(device):
+    return f"Device {device['index']}: {device['fps']} FPS"
+
+
+def device_index(label):
+    return int(label.split(":")[0].split(" ")[-1])
+
+
+def load_cached_devices():
+    try:
+        with open(os.path.join(app_data_dir(), DEVICE_CACHE_FILE)) as cache_file:
+            return json.load(cache_file)
+    except (OSError, ValueError):
+        return []
+
+
+def save_cached_devices(devices):
+    with open(os.path.join(app_data_dir(), DEVICE_CACHE_FILE), 'w') as cache_file:
+        json.dump(devices, cache_file)
+
+
+def probe_device(index):
+    cap = cv2.VideoCapture(index)
+    try:
+        if not cap.isOpened():
+            return None
+        return {
+            "index": index,
+            "fps": cap.get(cv2.CAP_PROP_FPS),
+            "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        }
+    finally:
+        cap.release()
+
+
+# Opens camera indices off the UI thread and reports each camera as soon as it answers
+class DeviceProbeThread(QThread):
+    deviceFound = pyqtSignal(dict)
+    probeFinished = pyqtSignal(list)
+
+    def __init__(self, max_devices=4, parent=None):
+        super(DeviceProbeThread, self).__init__(parent)
+        self.max_devices = max_devices
+
+    def run(self):
+        devices = []
+        for index in range(self.max_devices):
+            device = probe_device(index)
+            if device is not None:
+                devices.append(device)
+                self.deviceFound.emit(device)
+        save_cached_devices(devices)
+        self.probeFinished.emit(devices)
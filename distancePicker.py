@@ -1,9 +1,12 @@
 import sys
 import cv2
 import numpy as np
-from PyQt5.QtWidgets import QApplication, QMainWindow, QLabel, QPushButton, QVBoxLayout, QWidget, QComboBox, QLineEdit, QHBoxLayout, QErrorMessage, QDesktopWidget, QSizePolicy 
-from PyQt5.QtGui import QImage, QPixmap, QIntValidator
+from PyQt5.QtWidgets import QApplication, QMainWindow, QPushButton, QVBoxLayout, QWidget, QComboBox, QLineEdit, QHBoxLayout, QErrorMessage, QDesktopWidget, QSizePolicy 
+from PyQt5.QtGui import QIntValidator
 from PyQt5.QtCore import QTimer, pyqtSignal, Qt
+from calibration import ARUCO, ARUCO_DICTIONARY, CHECKERBOARD, MANUAL, Calibration, diagonal_percentage, find_aruco_marker, find_checkerboard, reference_scale, save_calibration
+from video_capture import ThreadedVideoCapture
+from video_display import VideoDisplayWidget, display_refresh_interval
 
 class PointSelectorApp(QMainWindow):
     DistanceChanged = pyqtSignal(float)
@@ -17,12 +20,19 @@ class PointSelectorApp(QMainWindow):
         self.dragging_point = None
         self.measurement_unit = measurement_unit
         self.window_name = 'Webcam Point Selector'
+        self.last_frame = None
+        # Set by the Auto button: reference length found in the frame, until a point is moved
+        self.auto_length = None
+        self.method = MANUAL
 
         self.central_widget = QWidget()
         self.setCentralWidget(self.central_widget)
 
-        self.image_label = QLabel()
+        self.video_display = VideoDisplayWidget()
+        self.video_display.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
         self.finish_button = QPushButton('Finish')
+        self.auto_button = QPushButton('Auto')
+        self.auto_button.setToolTip(f"Find a 9x6 checkerboard or an ArUco marker ({ARUCO_DICTIONARY}) in the frame")
         self.unit_combobox = QComboBox()
         self.unit_combobox.addItems(["cm", "inch"])
         self.unit_combobox.setCurrentText(self.measurement_unit)
@@ -30,9 +40,9 @@ class PointSelectorApp(QMainWindow):
 
         self.setup_ui()
 
+        # Picks up camera frames once per display refresh, the widget scales them while painting
         self.timer = QTimer(self)
         self.timer.timeout.connect(self.update_frame)
-        self.timer.start(30)  # Adjust the interval based on your needs
 
         # Set the initial window size to be half the size of the screen
         screen_geometry = QDesktopWidget().screenGeometry()
@@ -43,33 +53,25 @@ class PointSelectorApp(QMainWindow):
 
     def init_video_capture(self):
         if isinstance(self.video_source, int):  # Check if video_source is a camera index
-            self.cap = cv2.VideoCapture(self.video_source)
+            # Frames are grabbed on a background thread, the UI timer only picks up the newest one
+            self.cap = ThreadedVideoCapture(self.video_source)
             if not self.cap.isOpened():
                 raise ValueError("Error opening camera")
+            self.timer.start(display_refresh_interval())
         else:
             print(self.video_source)
             image = cv2.imread(self.video_source)
             if image is None:
                 raise ValueError("Error loading image")
-            # Convert the image to RGB format
-            image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-
-            # Display the initial image
-            self.display_image(image_rgb)
-
-    def display_image(self, image):
-        # Convert the image to QImage format
-        q_image = QImage(image.data, image.shape[1], image.shape[0], QImage.Format_RGB888)
-        
-        # Set the image to the QLabel
-        self.image_label.setPixmap(QPixmap.fromImage(q_image))
+            self.last_frame = image
+            self.video_display.set_frame(image)
 
 
     def setup_ui(self):
         layout = QVBoxLayout()
 
-        # Image label
-        layout.addWidget(self.image_label)
+        # Video display
+        layout.addWidget(self.video_display)
 
         # Entry box and drop-down menu layout
         entry_layout = QHBoxLayout()
@@ -88,6 +90,7 @@ class PointSelectorApp(QMainWindow):
         entry_layout.addStretch()
         entry_layout.addWidget(self.distance_input, alignment=Qt.AlignCenter)
         entry_layout.addWidget(self.unit_combobox, alignment=Qt.AlignCenter)
+        entry_layout.addWidget(self.auto_button, alignment=Qt.AlignCenter)
         entry_layout.addStretch()
 
         layout.addLayout(entry_layout)
@@ -99,53 +102,63 @@ class PointSelectorApp(QMainWindow):
         self.central_widget.setLayout(layout)
 
         self.finish_button.clicked.connect(self.on_finish_button_clicked)
+        self.auto_button.clicked.connect(self.on_auto_button_clicked)
         
-    def resizeEvent(self, event):
-        # Call the base class resizeEvent method
-        super(PointSelectorApp, self).resizeEvent(event)
-        
-        # Update the frame size when the window is resized
-        self.update_frame()
-
     def update_frame(self):
-        ret, frame = self.cap.read()
+        # Only new frames are handed over, resizes are repainted by the widget itself
+        ret, frame = self.cap.read(timeout=0)
         if ret:
-            # Resize the frame to fit the window while maintaining the aspect ratio
-            aspect_ratio = frame.shape[1] / frame.shape[0]
-            new_width = self.image_label.width()
-            new_height = int(new_width / aspect_ratio)
-            frame = cv2.resize(frame, (new_width, new_height))
-            self.draw_points(frame)
-            image = self.convert_frame_to_qimage(frame)
-            self.image_label.setPixmap(QPixmap.fromImage(image))
-
-    def convert_frame_to_qimage(self, frame):
-        height, width, channel = frame.shape
-        bytes_per_line = 3 * width
-        q_image = QImage(frame.data, width, height, bytes_per_line, QImage.Format_RGB888)
-        return q_image.rgbSwapped()
-
-    def draw_points(self, frame):
-        dot_size = 2  # Adjust the dot size if needed
-        for point in self.points:
-            cv2.circle(frame, point, dot_size, (0, 255, 0), -1)
+            self.last_frame = frame
+            self.video_display.set_frame(frame)
+
+    def closeEvent(self, event):
+        self.timer.stop()
+        if isinstance(getattr(self, 'cap', None), ThreadedVideoCapture):
+            self.cap.release()
+        super(PointSelectorApp, self).closeEvent(event)
+
+    def frame_point(self, event):
+        # Mouse position in frame pixels, independent of how the frame is scaled on screen
+        return self.video_display.widget_to_frame(self.video_display.mapFrom(self, event.pos()))
 
     def mousePressEvent(self, event):
         if event.button() == 1:  # Left mouse button
-            #print("y = ", event.y(), " x =", event.x())
+            x, y = self.frame_point(event)
+            grab_radius = 10 / self.video_display.display_scale()  # 10 screen pixels
             self.dragging_point = None
             for i, point in enumerate(self.points):
-                distance = np.sqrt((point[0] - (event.x() - 10)) ** 2 + (point[1] - (event.y() - 10)) ** 2)
-                if distance < 10:
+                distance = np.sqrt((point[0] - x) ** 2 + (point[1] - y) ** 2)
+                if distance < grab_radius:
                     self.dragging_point = i
                     break
             if self.dragging_point is None:
                 if len(self.points) < 2:
-                    self.points.append((event.x()-10, event.y()-10))
+                    self.points.append((x, y))
+                    self.video_display.set_markers(self.points)
 
     def mouseMoveEvent(self, event):
         if self.dragging_point is not None:
-            self.points[self.dragging_point] = (event.x() - 10, event.y()- 10)
+            self.points[self.dragging_point] = self.frame_point(event)
+            self.video_display.set_markers(self.points)
+            self.auto_length = None
+            self.method = MANUAL
+
+    def on_auto_button_clicked(self):
+        # The points are put on the reference found, the distance box takes its real length
+        if self.last_frame is None:
+            return
+        found, self.method, reference = find_checkerboard(self.last_frame), CHECKERBOARD, "8 checkerboard squares"
+        if found is None:
+            found, self.method, reference = find_aruco_marker(self.last_frame), ARUCO, "one side of the marker"
+        if found is None:
+            self.method = MANUAL
+            error_dialog = QErrorMessage(self)
+            error_dialog.showMessage(f"No 9x6 checkerboard or ArUco marker ({ARUCO_DICTIONARY}) found, pick the two points by hand.")
+            return
+        self.auto_length, points = found
+        self.points = [(float(x), float(y)) for x, y in points]
+        self.video_display.set_markers(self.points)
+        self.statusBar().showMessage(f"Enter the real length of {reference}")
 
     def mouseReleaseEvent(self, event):
         self.dragging_point = None
@@ -156,12 +169,17 @@ class PointSelectorApp(QMainWindow):
             if result is not None:
                 percentage, unit, userdist = result
                 if percentage * 100 != 0:
-                    send = float(userdist) / float(percentage * 100)
+                    send = reference_scale(userdist, percentage)
                 else:
                     send = 0 
 
                 # Check if userdist is a non-empty integer and not 0
                 if userdist.isdigit() and int(userdist) != 0:
+                    if isinstance(self.video_source, int) and percentage > 0:
+                        # Later sessions with this camera and resolution reuse it without picking
+                        frame_height, frame_width = self.last_frame.shape[:2]
+                        save_calibration(Calibration(self.video_source, frame_width, frame_height, percentage, float(userdist), unit,
+                                                     self.method, self.points))
                     self.DistanceChanged.emit(percentage)
                     self.DistanceUser.emit(float(send))
                     self.unitChanged.emit(unit)
@@ -175,21 +193,21 @@ class PointSelectorApp(QMainWindow):
             error_dialog.showMessage("Pick Two Points")
 
     def calculate_distance_percentage(self):
-        ret, frame = self.cap.read()
-        if ret:
-            original_height, original_width, _ = frame.shape
-            displayed_width = self.image_label.width()
-            displayed_height = self.image_label.height()
+        frame = self.last_frame
+        if frame is not None:
+            frame_height, frame_width = frame.shape[:2]
 
             if len(self.points) == 2:
-                # Calculate the distance in the resized frame
-                resized_distance = np.sqrt(
-                    (self.points[1][0] - self.points[0][0]) ** 2 +
-                    (self.points[1][1] - self.points[0][1]) ** 2
-                )
-
-                # Calculate the percentage based on the adjusted frame size
-                percentage = (resized_distance / np.sqrt(displayed_width ** 2 + displayed_height ** 2)) * 100
+                # Points are stored in frame pixels, an automatic reference is averaged over the whole target
+                frame_distance = self.auto_length
+                if frame_distance is None:
+                    frame_distance = np.sqrt(
+                        (self.points[1][0] - self.points[0][0]) ** 2 +
+                        (self.points[1][1] - self.points[0][1]) ** 2
+                    )
+
+                # Percentage of the frame diagonal, the same whatever the window size
+                percentage = diagonal_percentage(frame_distance, frame_width, frame_height)
 
                 unit = self.unit_combobox.currentText()
                 userdist = self.distance_input.text()
@@ -0,0 +1,34 @@
+# frame_scheduler.py
+import math
+
+
+# Decides, before any inference is done, whether a frame will become a sample.
+# Samples are taken on a fixed grid of 1 / data_points_per_second seconds, so the
+# decision only depends on the frame timestamp: ranges of a file processed in
+# different workers agree on which frames are sampled.
+class FrameScheduler:
+    def __init__(self, data_points_per_second=None):
+        self.data_points_per_second = data_points_per_second
+        self.interval = 1 / data_points_per_second if data_points_per_second else 0.0
+        self.next_due = None
+        self.sampled = 0
+        self.skipped = 0
+
+    def should_sample(self, timestamp):
+        if not self.interval:
+            self.sampled += 1
+            return True
+
+        if self.next_due is not None and timestamp < self.next_due - 1e-9:
+            self.skipped += 1
+            return False
+
+        # Next slot on the grid after this frame, late frames do not cause a burst of samples
+        self.next_due = (math.floor(timestamp / self.interval + 1e-9) + 1) * self.interval
+        self.sampled += 1
+        return True
+
+    def reset(self):
+        self.next_due = None
+        self.sampled = 0
+        self.skipped = 0
@@ -0,0 +1,123 @@
+# inference_frontend.py
+import cv2
+import numpy as np
+
+
+# Landmarks the region of interest is fitted to: nose, shoulders, elbows, wrists, hips,
+# knees and ankles. The margin covers the head, hands and feet around them.
+ROI_LANDMARKS = [0, 11, 12, 13, 14, 15, 16, 23, 24, 25, 26, 27, 28]
+
+
+# Prepares frames for the pose model and maps its landmarks back to the full frame.
+# The frame is cropped to a region of interest around the subject found in the
+# previous frame (the whole frame when tracking is lost), downscaled so its long
+# side is at most inference_size and only then converted to RGB, so the model and
+# cvtColor never touch pixels outside the subject at full resolution. Backends with
+# a separate person detector (PoseBackend.has_detector) find the subject with it
+# when there is no region yet, their landmark model only ever sees the crop.
+# landmark_rows (an intp array) limits the landmarks the backend converts (see
+# PoseBackend), it has to include ROI_LANDMARKS.
+class InferenceFrontEnd:
+    def __init__(self, model, inference_size=640, use_roi=True, roi_margin=0.25, min_visibility=0.5, min_visible_landmarks=5):
+        self.model = model
+        self.inference_size = inference_size
+        self.use_roi = use_roi
+        self.roi_margin = roi_margin
+        self.min_visibility = min_visibility
+        self.min_visible_landmarks = min_visible_landmarks
+        self.roi = None  # (x0, y0, x1, y1) in full-frame pixels, None means full frame
+        self.landmark_rows = None
+        self.full_frame_passes = 0
+        self.roi_passes = 0
+        self.detections = 0
+
+    def reset(self):
+        self.roi = None
+
+    def process(self, frame, timestamp=None):
+        # (33, 3) landmarks in full-frame normalized coordinates, or None when no pose was found
+        return self.process_batch([frame], None if timestamp is None else [timestamp])[0]
+
+    def process_batch(self, frames, timestamps=None):
+        # One model call for several consecutive frames (see pose_backends). They are all
+        # cropped to the region found before the batch, the last result moves it on.
+        if self.roi is None and self.model.has_detector:
+            self._detect(frames[0])
+        crops = []
+        boxes = []
+        for frame in frames:
+            frame_height, frame_width = frame.shape[:2]
+            if self.roi is None:
+                x0, y0, x1, y1 = 0, 0, frame_width, frame_height
+                self.full_frame_passes += 1
+            else:
+                x0, y0, x1, y1 = self.roi
+                self.roi_passes += 1
+
+            crop = frame[y0:y1, x0:x1]  # a view, no copy
+            crop_width, crop_height = x1 - x0, y1 - y0
+            scale = min(1.0, self.inference_size / max(crop_width, crop_height)) if self.inference_size else 1.0
+            if scale < 1.0:
+                crop = cv2.resize(crop, (max(1, int(crop_width * scale)), max(1, int(crop_height * scale))), interpolation=cv2.INTER_AREA)
+            crops.append(cv2.cvtColor(crop, cv2.COLOR_BGR2RGB))
+            boxes.append((x0, y0, crop_width, crop_height, frame_width, frame_height))
+
+        # The model may be shared with an earlier session that needed other rows
+        self.model.landmark_rows = self.landmark_rows
+        results = self.model.infer_batch(crops, timestamps)
+        for landmarks, (x0, y0, crop_width, crop_height, frame_width, frame_height) in zip(results, boxes):
+            if landmarks is None:
+                continue
+            # Normalized crop coordinates -> normalized full-frame coordinates, so the
+            # displacement maths and the reference distance stay in frame units
+            landmarks[:, 0] = (x0 + landmarks[:, 0] * crop_width) / frame_width
+            landmarks[:, 1] = (y0 + landmarks[:, 1] * crop_height) / frame_height
+
+        if results[-1] is None or not self.use_roi:
+            self.roi = None
+        else:
+            self._update_roi(results[-1], boxes[-1][4], boxes[-1][5])
+        return results
+
+    def _detect(self, frame):
+        frame_height, frame_width = frame.shape[:2]
+        scale = min(1.0, self.inference_size / max(frame_width, frame_height)) if self.inference_size else 1.0
+        if scale < 1.0:
+            frame = cv2.resize(frame, (max(1, int(frame_width * scale)), max(1, int(frame_height * scale))), interpolation=cv2.INTER_AREA)
+        box = self.model.detect(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        self.detections += 1
+        if box is None:
+            return
+        x0 = int(max(0, box[0] * frame_width))
+        y0 = int(max(0, box[1] * frame_height))
+        x1 = int(min(frame_width, box[2] * frame_width))
+        y1 = int(min(frame_height, box[3] * frame_height))
+        self.roi = (x0, y0, x1, y1) if x1 - x0 > 1 and y1 - y0 > 1 else None
+
+    def _update_roi(self, landmarks, frame_width, frame_height):
+        landmarks = landmarks[ROI_LANDMARKS]
+        visible = landmarks[:, 2] >= self.min_visibility
+        if np.count_nonzero(visible) < self.min_visible_landmarks:
+            self.roi = None
+            return
+
+        xs = landmarks[visible, 0] * frame_width
+        ys = landmarks[visible, 1] * frame_height
+        box_x0, box_x1, box_y0, box_y1 = xs.min(), xs.max(), ys.min(), ys.max()
+        padding = self.roi_margin * max(box_x1 - box_x0, box_y1 - box_y0)
+
+        if self.roi is not None:
+            # Keep the crop still while the subject stays well inside it, the pose
+            # model tracks between frames and a jumping crop would disturb it
+            x0, y0, x1, y1 = self.roi
+            inner = padding / 2
+            inside = box_x0 - inner >= x0 and box_y0 - inner >= y0 and box_x1 + inner <= x1 and box_y1 + inner <= y1
+            box_area = (box_x1 - box_x0 + 2 * padding) * (box_y1 - box_y0 + 2 * padding)
+            if inside and box_area >= 0.25 * (x1 - x0) * (y1 - y0):
+                return
+
+        x0 = int(max(0, box_x0 - padding))
+        y0 = int(max(0, box_y0 - padding))
+        x1 = int(min(frame_width, box_x1 + padding))
+        y1 = int(min(frame_height, box_y1 + padding))
+        self.roi = (x0, y0, x1, y1) if x1 - x0 > 1 and y1 - y0 > 1 else None
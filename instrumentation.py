@@ -0,0 +1,134 @@
+# instrumentation.py
+# Per-stage timing for the estimation hot path. Code is instrumented with
+#
+#   start = profiler.clock()
+#   ...
+#   profiler.record("stage", start)
+#
+# and holds NULL_PROFILER unless profiling was asked for, whose methods do nothing,
+# so production runs pay one empty method call per hook.
+import json
+import time
+
+import cv2
+import numpy as np
+
+# Histogram bucket edges in milliseconds, for the machine-readable dump
+HISTOGRAM_EDGES_MS = [0, 0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 33, 66, 100, 250, 1000, float("inf")]
+
+
+# Keeps the last `window` values in a ring, percentiles are computed on demand
+class RollingHistogram:
+    def __init__(self, window=300):
+        self.values = np.zeros(window)
+        self.count = 0
+
+    def record(self, value):
+        self.values[self.count % len(self.values)] = value
+        self.count += 1
+
+    def recent(self):
+        return self.values[:min(self.count, len(self.values))]
+
+    def summary(self):
+        values = self.recent() * 1000
+        if len(values) == 0:
+            return {"count": 0}
+        p50, p90, p99 = np.percentile(values, (50, 90, 99))
+        return {
+            "count": self.count,
+            "mean_ms": float(values.mean()),
+            "p50_ms": float(p50),
+            "p90_ms": float(p90),
+            "p99_ms": float(p99),
+            "max_ms": float(values.max()),
+            "histogram": np.histogram(values, bins=HISTOGRAM_EDGES_MS)[0].tolist(),
+        }
+
+
+class Profiler:
+    enabled = True
+
+    def __init__(self, window=300, target_rate=None):
+        self.window = window
+        self.stages = {}
+        self.counters = {}
+        self.target_rate = target_rate  # samples per second asked for, None means every frame
+        self.sample_times = RollingHistogram(window)
+        self.clock = time.perf_counter
+
+    def record(self, stage, start):
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            histogram = self.stages[stage] = RollingHistogram(self.window)
+        histogram.record(time.perf_counter() - start)
+
+    def set_counter(self, name, value):
+        self.counters[name] = value
+
+    def mark_sample(self, timestamp):
+        # Capture time of every recorded sample, gives the effective sample rate
+        self.sample_times.record(timestamp)
+
+    def effective_rate(self):
+        times = np.sort(self.sample_times.recent())
+        if len(times) < 2 or times[-1] <= times[0]:
+            return None
+        return (len(times) - 1) / (times[-1] - times[0])
+
+    def to_dict(self):
+        return {
+            "stages": {stage: histogram.summary() for stage, histogram in self.stages.items()},
+            "counters": dict(self.counters),
+            "samples": self.sample_times.count,
+            "effective_rate": self.effective_rate(),
+            "target_rate": self.target_rate,
+            "histogram_edges_ms": HISTOGRAM_EDGES_MS[:-1] + ["inf"],
+        }
+
+    def dump(self, path):
+        with open(path, "w") as stats_file:
+            json.dump(self.to_dict(), stats_file, indent=2)
+
+    def draw_overlay(self, frame, origin=(10, 20), line_height=18):
+        # p50/p99 of every stage and the sample rate, top left of the frame
+        lines = []
+        for stage, histogram in self.stages.items():
+            values = histogram.recent()
+            if len(values):
+                p50, p99 = np.percentile(values, (50, 99)) * 1000
+                lines.append(f"{stage}: {p50:.1f} / {p99:.1f} ms")
+        rate = self.effective_rate()
+        if rate is not None:
+            target = f"{self.target_rate}" if self.target_rate else "max"
+            lines.append(f"samples: {rate:.1f}/s (target {target})")
+        lines.extend(f"{name}: {value}" for name, value in self.counters.items())
+
+        x, y = origin
+        for line in lines:
+            cv2.putText(frame, line, (x, y), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 3, cv2.LINE_AA)
+            cv2.putText(frame, line, (x, y), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1, cv2.LINE_AA)
+            y += line_height
+
+
+class NullProfiler:
+    enabled = False
+
+    @staticmethod
+    def clock():
+        return 0.0
+
+    def record(self, stage, start):
+        pass
+
+    def set_counter(self, name, value):
+        pass
+
+    def mark_sample(self, timestamp):
+        pass
+
+    def draw_overlay(self, frame, origin=(10, 20), line_height=18):
+        pass
+
+
+NULL_PROFILER = NullProfiler()
@@ -0,0 +1,174 @@
+# landmark_cache.py
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+
+from utils import POSE_LANDMARK_NAMES, app_data_dir
+
+# Frame status values stored next to the landmarks
+NOT_COMPUTED = 0
+POSE_FOUND = 1
+NO_POSE = 2
+
+INDEX_FILE = "index.json"
+META_FILE = "meta.json"
+
+
+def file_content_hash(file_path, chunk_size=1 << 20):
+    digest = hashlib.blake2b(digest_size=20)
+    with open(file_path, 'rb') as video_file:
+        for chunk in iter(lambda: video_file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _temp_path(path):
+    # Unique per process and thread, so concurrent writers never share a temporary file
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def _create_entry(path, frame_count, fps):
+    # The files are created under a temporary directory that is renamed into place once
+    # they are complete, an entry directory never holds half-written headers
+    temp_path = _temp_path(path)
+    os.makedirs(temp_path)
+    landmarks = np.lib.format.open_memmap(os.path.join(temp_path, "landmarks.npy"), mode='w+', dtype=np.float32,
+                                          shape=(frame_count, len(POSE_LANDMARK_NAMES), 3))
+    status = np.lib.format.open_memmap(os.path.join(temp_path, "status.npy"), mode='w+', dtype=np.uint8, shape=(frame_count,))
+    landmarks.flush()
+    status.flush()
+    del landmarks, status  # Windows cannot rename a directory with mapped files
+    with open(os.path.join(temp_path, META_FILE), 'w') as meta_file:
+        json.dump({"frame_count": frame_count, "fps": fps}, meta_file)
+    try:
+        os.rename(temp_path, path)
+    except OSError:
+        # Another process created the entry first, its files are used
+        shutil.rmtree(temp_path, ignore_errors=True)
+
+
+# Landmarks of one video for one set of model settings, stored as memory-mapped
+# .npy files so several processes can fill different frame ranges at once.
+class CacheEntry:
+    def __init__(self, path, frame_count=None, fps=None):
+        self.path = path
+        if not os.path.exists(os.path.join(path, META_FILE)):
+            # Left behind by a crash before entries were created atomically
+            shutil.rmtree(path, ignore_errors=True)
+            _create_entry(path, frame_count, fps)
+
+        self.landmarks = np.load(os.path.join(path, "landmarks.npy"), mmap_mode='r+')
+        self.status = np.load(os.path.join(path, "status.npy"), mmap_mode='r+')
+        with open(os.path.join(path, META_FILE)) as meta_file:
+            self.meta = json.load(meta_file)
+
+    @property
+    def frame_count(self):
+        return len(self.status)
+
+    @property
+    def fps(self):
+        return self.meta.get("fps")
+
+    def get(self, frame_index):
+        # (hit, landmarks), landmarks is None when the model found no pose in that frame
+        if frame_index >= self.frame_count or self.status[frame_index] == NOT_COMPUTED:
+            return False, None
+        if self.status[frame_index] == NO_POSE:
+            return True, None
+        return True, np.asarray(self.landmarks[frame_index], dtype=np.float64)
+
+    def put(self, frame_index, landmarks):
+        if frame_index >= self.frame_count:
+            return
+        if landmarks is None:
+            self.status[frame_index] = NO_POSE
+        else:
+            self.landmarks[frame_index] = landmarks
+            self.status[frame_index] = POSE_FOUND
+
+    def missing(self, frame_indices):
+        frame_indices = np.asarray(frame_indices, dtype=np.intp)
+        frame_indices = frame_indices[frame_indices < self.frame_count]
+        return frame_indices[self.status[frame_indices] == NOT_COMPUTED]
+
+    def is_complete(self):
+        return not np.any(self.status == NOT_COMPUTED)
+
+    def nbytes(self):
+        return self.landmarks.nbytes + self.status.nbytes
+
+    def flush(self):
+        self.landmarks.flush()
+        self.status.flush()
+
+
+# On-disk landmark cache keyed by video content hash, frame index and model settings.
+# Entries are evicted least recently used first once the cache grows past max_bytes.
+class LandmarkCache:
+    def __init__(self, cache_dir=None, max_bytes=4 * 1024 ** 3):
+        self.cache_dir = cache_dir or os.path.join(app_data_dir(), "landmark_cache")
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.index = self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(os.path.join(self.cache_dir, INDEX_FILE)) as index_file:
+                return json.load(index_file)
+        except (OSError, ValueError):
+            return {"entries": {}, "hashes": {}}
+
+    def _save_index(self):
+        temp_path = _temp_path(os.path.join(self.cache_dir, INDEX_FILE))
+        with open(temp_path, 'w') as index_file:
+            json.dump(self.index, index_file)
+        os.replace(temp_path, os.path.join(self.cache_dir, INDEX_FILE))
+
+    def content_hash(self, video_path):
+        # Hashing an hour of video takes a while, so it is only redone when the file changes
+        video_path = os.path.abspath(video_path)
+        stat = os.stat(video_path)
+        known = self.index["hashes"].get(video_path)
+        if known and known["size"] == stat.st_size and known["mtime"] == stat.st_mtime:
+            return known["hash"]
+        content_hash = file_content_hash(video_path)
+        self.index["hashes"][video_path] = {"size": stat.st_size, "mtime": stat.st_mtime, "hash": content_hash}
+        return content_hash
+
+    def key(self, video_path, model_settings):
+        settings = json.dumps(model_settings, sort_keys=True)
+        return hashlib.blake2b((self.content_hash(video_path) + settings).encode(), digest_size=20).hexdigest()
+
+    def open(self, video_path, model_settings, frame_count, fps):
+        with self.lock:
+            key = self.key(video_path, model_settings)
+            entry = CacheEntry(os.path.join(self.cache_dir, key), frame_count, fps)
+            self.index["entries"][key] = {"last_access": time.time(), "bytes": entry.nbytes(), "video": os.path.abspath(video_path)}
+            self._evict(keep=key)
+            self._save_index()
+        return entry
+
+    def _evict(self, keep=None):
+        entries = self.index["entries"]
+        total = sum(info["bytes"] for info in entries.values())
+        for key in sorted(entries, key=lambda key: entries[key]["last_access"]):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            shutil.rmtree(os.path.join(self.cache_dir, key), ignore_errors=True)
+            total -= entries.pop(key)["bytes"]
+
+    def clear(self):
+        with self.lock:
+            for key in list(self.index["entries"]):
+                shutil.rmtree(os.path.join(self.cache_dir, key), ignore_errors=True)
+            self.index["entries"] = {}
+            self._save_index()
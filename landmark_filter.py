@@ -0,0 +1,97 @@
+# landmark_filter.py
+import math
+
+import numpy as np
+
+
+def smoothing_factor(dt, cutoff):
+    # Exponential smoothing factor of a first-order low-pass filter, cutoff in Hz (scalar or array)
+    tau = 1.0 / (2 * math.pi * cutoff)
+    return 1.0 / (1.0 + tau / dt)
+
+
+# One-Euro filter over every landmark at once (Casiez et al. 2012): a low-pass
+# filter whose cutoff rises with the landmark's speed, so slow jitter is smoothed
+# away while fast movements keep up. State is one (n, 2) array per quantity, a
+# frame costs a handful of NumPy operations whatever the number of landmarks.
+# beta is large because speeds are in normalized frame units per second.
+#
+# Landmarks below min_visibility, NaN rows and jumps faster than max_speed
+# (normalized frame units per second) are treated as outliers: the last filtered
+# position is held for up to max_hold seconds, after that the raw value is passed
+# through and the landmark starts over from it.
+class OneEuroLandmarkFilter:
+    def __init__(self, min_cutoff=1.0, beta=20.0, derivative_cutoff=1.0, min_visibility=0.5, max_speed=5.0, max_hold=0.5, num_landmarks=33):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.derivative_cutoff = derivative_cutoff
+        self.min_visibility = min_visibility
+        self.max_speed = max_speed
+        self.max_hold = max_hold
+        self.num_landmarks = num_landmarks
+        self.reset()
+
+    def settings(self):
+        # Constructor arguments, stored with a landmark log so a recompute can filter the same way
+        return {"min_cutoff": self.min_cutoff, "beta": self.beta, "derivative_cutoff": self.derivative_cutoff,
+                "min_visibility": self.min_visibility, "max_speed": self.max_speed, "max_hold": self.max_hold}
+
+    def reset(self):
+        self.position = np.full((self.num_landmarks, 2), np.nan)
+        self.velocity = np.zeros((self.num_landmarks, 2))
+        self.last_seen = np.full(self.num_landmarks, -np.inf)
+        self.last_timestamp = None
+        self.rejected = 0
+
+    def filter(self, timestamp, landmarks):
+        # (n, 3) landmarks -> new (n, 3) array with smoothed x and y, visibility is kept as is
+        raw = landmarks[:, :2]
+        out = np.array(landmarks, dtype=np.float64)
+
+        dt = timestamp - self.last_timestamp if self.last_timestamp is not None else 0.0
+        self.last_timestamp = timestamp
+
+        has_state = np.isfinite(self.position[:, 0]) & (timestamp - self.last_seen <= self.max_hold)
+        with np.errstate(invalid='ignore'):
+            valid = np.isfinite(raw).all(axis=1) & (landmarks[:, 2] >= self.min_visibility)
+
+        if dt > 0:
+            velocity = (raw - self.position) / dt
+            speed = np.hypot(velocity[:, 0], velocity[:, 1])
+            with np.errstate(invalid='ignore'):
+                outlier = valid & has_state & (speed > self.max_speed)
+            self.rejected += int(np.count_nonzero(outlier))
+            update = valid & has_state & ~outlier
+
+            alpha_velocity = smoothing_factor(dt, self.derivative_cutoff)
+            velocity_hat = alpha_velocity * velocity + (1 - alpha_velocity) * self.velocity
+            cutoff = self.min_cutoff + self.beta * np.hypot(velocity_hat[:, 0], velocity_hat[:, 1])
+            alpha = smoothing_factor(dt, cutoff)[:, None]
+            position_hat = alpha * raw + (1 - alpha) * self.position
+
+            self.position[update] = position_hat[update]
+            self.velocity[update] = velocity_hat[update]
+        else:
+            # First frame, or a repeated timestamp: nothing to filter against
+            update = np.zeros(self.num_landmarks, dtype=bool)
+
+        # Landmarks without recent state start over from their raw value
+        restart = valid & ~has_state
+        self.position[restart] = raw[restart]
+        self.velocity[restart] = 0.0
+        self.last_seen[update | restart] = timestamp
+
+        # Rejected or invisible landmarks hold the last filtered position while it is recent
+        hold = ~(update | restart) & has_state
+        self.velocity[hold] = 0.0
+        out[:, :2] = np.where((update | restart | hold)[:, None], self.position, raw)
+        return out
+
+
+def filter_landmark_sequence(timestamps, landmarks, settings):
+    # (n, 33, 3) landmarks of a whole session through a fresh filter, sample by sample as live
+    landmark_filter = OneEuroLandmarkFilter(num_landmarks=landmarks.shape[1], **settings)
+    filtered = np.empty(landmarks.shape)
+    for index, timestamp in enumerate(timestamps):
+        filtered[index] = landmark_filter.filter(timestamp, landmarks[index])
+    return filtered
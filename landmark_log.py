@@ -0,0 +1,66 @@
+# landmark_log.py
+import json
+import os
+
+import numpy as np
+
+
+def landmark_log_path(csv_path):
+    return os.path.splitext(csv_path)[0] + "_landmarks.npz"
+
+
+# The normalized (33, 3) landmarks every sample of a session was computed from,
+# kept next to the CSV so the session can be recomputed with another reference
+# scale, origin or joint (see recompute.py) instead of being recorded again.
+# landmarks are the smoothed ones the samples used; with keep_raw the landmarks
+# as the model gave them are kept too (raw_landmarks), so the One-Euro filter,
+# whose settings are in settings["landmark_filter"], can be run again with others.
+# 400 bytes per sample (800 with keep_raw), an hour at 30 samples per second is about 43 MB.
+class LandmarkLog:
+    def __init__(self, capacity=4096, num_landmarks=33, settings=None, keep_raw=False):
+        self.timestamps = np.zeros(capacity)
+        self.landmarks = np.zeros((capacity, num_landmarks, 3), dtype=np.float32)
+        self.raw_landmarks = np.zeros_like(self.landmarks) if keep_raw else None
+        self.size = 0
+        self.settings = dict(settings or {})  # how the samples were computed, e.g. joint and scale
+
+    def __len__(self):
+        return self.size
+
+    def append(self, timestamp, landmarks, raw_landmarks=None):
+        if self.size == len(self.timestamps):
+            # Grow geometrically so appends stay amortised O(1)
+            self.timestamps = np.concatenate((self.timestamps, np.zeros_like(self.timestamps)))
+            self.landmarks = np.concatenate((self.landmarks, np.zeros_like(self.landmarks)))
+            if self.raw_landmarks is not None:
+                self.raw_landmarks = np.concatenate((self.raw_landmarks, np.zeros_like(self.raw_landmarks)))
+        self.timestamps[self.size] = timestamp
+        self.landmarks[self.size] = landmarks
+        if self.raw_landmarks is not None:
+            self.raw_landmarks[self.size] = landmarks if raw_landmarks is None else raw_landmarks
+        self.size += 1
+
+    def arrays(self, raw=False):
+        # raw=True gives the landmarks before smoothing, None when they were not kept
+        if raw:
+            return self.timestamps[:self.size], self.raw_landmarks[:self.size] if self.raw_landmarks is not None else None
+        return self.timestamps[:self.size], self.landmarks[:self.size]
+
+    def save(self, path):
+        timestamps, landmarks = self.arrays()
+        arrays = {"timestamps": timestamps, "landmarks": landmarks, "settings": np.array(json.dumps(self.settings))}
+        if self.raw_landmarks is not None:
+            arrays["raw_landmarks"] = self.arrays(raw=True)[1]
+        np.savez(path, **arrays)
+        return path
+
+
+def load_landmark_log(path):
+    with np.load(path) as data:
+        log = LandmarkLog(capacity=0, num_landmarks=data["landmarks"].shape[1], settings=json.loads(str(data["settings"])))
+        log.timestamps = data["timestamps"]
+        log.landmarks = data["landmarks"]
+        if "raw_landmarks" in data:
+            log.raw_landmarks = data["raw_landmarks"]
+    log.size = len(log.timestamps)
+    return log
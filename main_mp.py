@@ -1,89 +1,143 @@
 # main_mp.py
 import os
-import cv2
-import mediapipe as mp
-import time
-import sys
-from pose_estimator_mp import PoseEstimatorMP
+import threading
+from pose_estimator_mp import PoseEstimatorMP, warm_up_pose_model
+from quality_controller import QualityController
+from calibration import load_calibration
+from device_probe import DeviceProbeThread, device_label, device_index, load_cached_devices
 from distancePicker import PointSelectorApp
+from instrumentation import Profiler
+from landmark_cache import LandmarkCache
+from segments import parse_segments
+from session import EstimationSession
+from spool import SpoolRecorder, SPOOL_EXTENSION, is_spool
+from video_capture import is_live_source
+from video_display import VideoDisplayWidget
 
 from PyQt5.QtWidgets import QApplication,QFileDialog, QWidget, QLabel, QVBoxLayout, QComboBox, QPushButton, QCheckBox, QLineEdit, QErrorMessage, QGroupBox, QMainWindow, QGraphicsScene, QGraphicsView, QGraphicsPixmapItem
-from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtCore import Qt, QTimer, QObject, pyqtSignal
 from PyQt5.QtGui import QImage, QPixmap
 
-class VideoImgManager:
-    def __init__(self):
-        self.POSE_ESTIMATOR = PoseEstimatorMP()
-        
-    def show_frame_fullscreen(self, frame):
-        # Get the screen resolution
-        screen_width, screen_height = 1920, 1080  # You can replace these values with the actual screen resolution
-
-        # Get the frame dimensions
-        frame_width, frame_height = frame.shape[1], frame.shape[0]
-
-        # Calculate the scaling factors for width and height
-        scale_width = screen_width / frame_width
-        scale_height = screen_height / frame_height
+# JSON file the stage timings of every GUI session are written to, like cli_mp.py --stats
+STATS_ENV = "MOTION_CAPTURE_STATS"
 
-        # Choose the minimum scaling factor to maintain the aspect ratio
-        min_scale = min(scale_width, scale_height)
+# Fullscreen window the estimation session draws into, created once and reused
+class VideoWindow(QWidget):
+    def __init__(self, on_escape):
+        super().__init__()
+        self.on_escape = on_escape
+        self.setWindowTitle('Pose Landmarker')
+        self.display = VideoDisplayWidget(self)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.display)
+
+    def keyPressEvent(self, event):
+        if event.key() == Qt.Key_Escape:
+            self.on_escape()
+        else:
+            super().keyPressEvent(event)
 
-        # Calculate the new dimensions
-        new_width = int(frame_width * min_scale)
-        new_height = int(frame_height * min_scale)
+    def closeEvent(self, event):
+        self.on_escape()
+        super().closeEvent(event)
 
-        # Resize the frame to fit the screen
-        resized_frame = cv2.resize(frame, (new_width, new_height))
 
-        # Create a full-screen window
-        cv2.namedWindow('Pose Landmarker', cv2.WND_PROP_FULLSCREEN)
-        cv2.setWindowProperty('Pose Landmarker', cv2.WND_PROP_FULLSCREEN, cv2.WINDOW_FULLSCREEN)
+class VideoImgManager(QObject):
+    sessionFinished = pyqtSignal()
 
-        # Show the resized frame in the full-screen window
-        cv2.imshow('Pose Landmarker', resized_frame)
-        
-    def start_video_recording(self, pose_estimator, videoType, save_data, data_points_per_second=None):
-        cap = cv2.VideoCapture(videoType)
+    def __init__(self):
+        super().__init__()
+        self.landmark_cache = None
+        self.video_window = None
+        self.session = None
+        self.session_thread = None
+        self.sessionFinished.connect(self.finish_video_recording)
+
+    # Display interface used by EstimationSession, called from the session thread.
+    # The frame is only handed to the widget, which paints it at the display refresh rate.
+    def show(self, frame):
+        self.video_window.display.set_frame(frame)
+        return True
+
+    def close(self):
+        pass  # the window is hidden on the UI thread in finish_video_recording
+
+    def stop_video_recording(self):
+        if self.session is not None:
+            self.session.stop()
+
+    def start_video_recording(self, pose_estimator, videoType, save_data, data_points_per_second=None, drop_policy=None, use_cache=True, segments=None,
+                              quality=None, overlay=False):
+        if self.session is not None:
+            print("An estimation session is already running")
+            return
 
         if data_points_per_second:
             pose_estimator.data_points_per_second = data_points_per_second
-            
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
-
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            results = pose_estimator.pose_landmarker.process(rgb_frame)
-            pose_estimator.results = results
-
-            if data_points_per_second:
-                current_time = time.time()
-                elapsed_time = current_time - last_time
-
-                if elapsed_time < time_interval:
-                    continue  # Skip processing this frame
 
-                last_time = current_time
+        if use_cache and not is_live_source(videoType) and self.landmark_cache is None:
+            self.landmark_cache = LandmarkCache()
 
-            # Pass chosen_joint to process_landmarks
-            pose_estimator.process_landmarks(frame, pose_estimator.chosen_joint)
-
-            # Draw the landmarks on the frame
-            mp.solutions.drawing_utils.draw_landmarks(frame, results.pose_landmarks, mp.solutions.pose.POSE_CONNECTIONS)
-
-            self.show_frame_fullscreen(frame)
-
-            if cv2.waitKey(1) & 0xFF == 27:  # 'Esc' key
-                break
-
-        cap.release()
-        cv2.destroyAllWindows()
+        if save_data:
+            # Samples go to disk while the session runs instead of piling up in memory
+            pose_estimator.start_streaming()
+
+        if self.video_window is None:
+            self.video_window = VideoWindow(self.stop_video_recording)
+        self.video_window.showFullScreen()
+
+        # The session runs off the UI thread so painting never holds up capture or inference
+        self.session = EstimationSession(pose_estimator, videoType, drop_policy, self.landmark_cache if use_cache else None, display=self,
+                                         segments=segments, quality=quality, overlay=overlay)
+        self.save_data = save_data
+        self.session_thread = threading.Thread(target=self.run_session, name="session", daemon=True)
+        self.session_thread.start()
+
+    def start_spool_recording(self, video_device, spool_path):
+        # Capture only, the spool is analysed later by choosing it as the video file
+        if self.session is not None:
+            print("An estimation session is already running")
+            return
+
+        if self.video_window is None:
+            self.video_window = VideoWindow(self.stop_video_recording)
+        self.video_window.showFullScreen()
+
+        self.session = SpoolRecorder(video_device, spool_path, display=self)
+        self.save_data = False
+        self.session_thread = threading.Thread(target=self.run_session, name="session", daemon=True)
+        self.session_thread.start()
+
+    def run_session(self):
+        try:
+            self.session.run()
+        finally:
+            self.sessionFinished.emit()
+
+    def finish_video_recording(self):
+        session = self.session
+        self.session_thread.join()
+        self.session = None
+        self.video_window.hide()
+
+        if isinstance(session, SpoolRecorder):
+            session.print_report()
+            return
+
+        # Per-stage throughput, shows which stage holds the session back
+        if session.pipeline is not None:
+            session.pipeline.print_report()
+        if session.pose_estimator.analytics is not None:
+            session.pose_estimator.analytics.print_summary()
+        stats_path = os.environ.get(STATS_ENV)
+        if stats_path and session.pose_estimator.profiler.enabled:
+            session.pose_estimator.profiler.dump(stats_path)
+            print(f"Stage statistics written to {stats_path}")
 
         # Export data to CSV file if save_data is True
-        if save_data:
-            pose_estimator.save_data_after_estimation()
+        if self.save_data:
+            session.pose_estimator.save_data_after_estimation()
 
 
 class GUI(QWidget):
@@ -127,10 +181,11 @@ class GUI(QWidget):
         self.device_combobox = QComboBox()
         video_devices = self.list_video_devices()
         self.device_combobox.addItems(video_devices)
+        self.start_device_probe()
 
         self.label_joint = QLabel("Select Joint:")
         self.joint_combobox = QComboBox()
-        self.joint_combobox.addItems(["SKELETON", "LEFT_SHOULDER", "RIGHT_SHOULDER", "LEFT_ELBOW", "RIGHT_ELBOW", "RIGHT_WRIST", "LEFT_WRIST", "RIGHT_HIP", "LEFT_HIP", "RIGHT_KNEE", "LEFT_KNEE", "RIGHT_ANKLE", "LEFT_ANKLE"])
+        self.joint_combobox.addItems(["SKELETON", "ALL_JOINTS", "LEFT_SHOULDER", "RIGHT_SHOULDER", "LEFT_ELBOW", "RIGHT_ELBOW", "RIGHT_WRIST", "LEFT_WRIST", "RIGHT_HIP", "LEFT_HIP", "RIGHT_KNEE", "LEFT_KNEE", "RIGHT_ANKLE", "LEFT_ANKLE"])
 
         #self.label_axis = QLabel("Select Axis:")
         #self.axis_combobox = QComboBox()
@@ -140,12 +195,19 @@ class GUI(QWidget):
 
         # Additional widgets (add more as needed)
         self.save_data_checkbox = QCheckBox("Save Data")
+        self.keep_landmarks_checkbox = QCheckBox("Keep Landmarks (recompute later)")
+        self.record_only_checkbox = QCheckBox("Record Only (analyse the spool later)")
+        self.adaptive_quality_checkbox = QCheckBox("Adaptive Quality (hold the rate under load)")
+        self.reps_checkbox = QCheckBox("Count Repetitions and Holds")
+        self.profile_checkbox = QCheckBox("Show Stage Timings")
         self.label_data_points = QLabel("Data Points Per Second:")
         self.entry_data_points = QLineEdit()
         
         self.label_video_file = QLabel("Select Video File:")
         self.label_selected_file = QLabel("")
-        self.button_browse_video = QPushButton("Browse .mp4, .avi and .mkv")
+        self.label_segments = QLabel("Segments (optional, e.g. 1:30-2:00, 45:00-46:30):")
+        self.entry_segments = QLineEdit()
+        self.button_browse_video = QPushButton("Browse .mp4, .avi, .mkv and .spool")
         self.button_browse_video.clicked.connect(self.browse_video_file)
 
         # Add widgets to the layout
@@ -155,12 +217,15 @@ class GUI(QWidget):
         
         self.button_distance = QPushButton("Set Distance Reference")
         self.button_distance.clicked.connect(self.start_distance_picker)
+        self.label_calibration = QLabel("")
         
         # Layout for the inner box
         inner_layout = QVBoxLayout(inner_box)
         inner_layout.addWidget(self.label_video_file)
         inner_layout.addWidget(self.button_browse_video)
         inner_layout.addWidget(self.label_selected_file)
+        inner_layout.addWidget(self.label_segments)
+        inner_layout.addWidget(self.entry_segments)
         inner_layout.addWidget(self.label_device)
         inner_layout.addWidget(self.device_combobox)
         inner_layout.addWidget(self.label_joint)
@@ -169,9 +234,15 @@ class GUI(QWidget):
         #inner_layout.addWidget(self.axis_combobox)
         #inner_layout.addWidget(self.remove_background_checkbox)
         inner_layout.addWidget(self.save_data_checkbox)
+        inner_layout.addWidget(self.keep_landmarks_checkbox)
+        inner_layout.addWidget(self.record_only_checkbox)
+        inner_layout.addWidget(self.adaptive_quality_checkbox)
+        inner_layout.addWidget(self.reps_checkbox)
+        inner_layout.addWidget(self.profile_checkbox)
         inner_layout.addWidget(self.label_data_points)
         inner_layout.addWidget(self.entry_data_points)
         inner_layout.addWidget(self.button_distance)
+        inner_layout.addWidget(self.label_calibration)
         inner_layout.addWidget(self.button_start)
 
         # Layout for the outer box
@@ -217,17 +288,38 @@ class GUI(QWidget):
 
         
     def list_video_devices(self):
-        devices = []
-        for i in range(4):
-            cap = cv2.VideoCapture(i)
-            if cap.isOpened():
-                devices.append(f"Device {i}: {cap.get(cv2.CAP_PROP_FPS)} FPS")
-            cap.release()
-        return devices
-    
+        # Devices found by the last probe, shown straight away while the cameras are probed again
+        return [device_label(device) for device in load_cached_devices()]
+
+    def start_device_probe(self):
+        self.device_probe = DeviceProbeThread(parent=self)
+        self.device_probe.deviceFound.connect(self.handle_device_found)
+        self.device_probe.probeFinished.connect(self.handle_probe_finished)
+        self.device_probe.start()
+
+    def find_device_item(self, index):
+        for item in range(self.device_combobox.count()):
+            if device_index(self.device_combobox.itemText(item)) == index:
+                return item
+        return -1
+
+    def handle_device_found(self, device):
+        item = self.find_device_item(device["index"])
+        if item == -1:
+            self.device_combobox.addItem(device_label(device))
+        else:
+            self.device_combobox.setItemText(item, device_label(device))
+
+    def handle_probe_finished(self, devices):
+        # Drop cached devices that did not answer this time
+        found = {device["index"] for device in devices}
+        for item in reversed(range(self.device_combobox.count())):
+            if device_index(self.device_combobox.itemText(item)) not in found:
+                self.device_combobox.removeItem(item)
+
     def start_distance_picker(self):
 
-        video_device = int(self.device_combobox.currentText().split(":")[0].split(" ")[-1])
+        video_device = device_index(self.device_combobox.currentText())
         self.distance_picker_dialog = PointSelectorApp(video_device)
         
         self.distance_picker_dialog.DistanceChanged.connect(self.handle_distance_changed)
@@ -235,6 +327,20 @@ class GUI(QWidget):
         self.distance_picker_dialog.unitChanged.connect(self.handle_unit_changed)
         self.distance_picker_dialog.show()
 
+    def apply_saved_calibration(self, video_device):
+        # Calibration saved by the distance picker or calibration.py for this camera at the
+        # resolution it opened with last time, so repeat sessions need no picking
+        for device in load_cached_devices():
+            if device["index"] == video_device:
+                calibration = load_calibration(video_device, device["width"], device["height"])
+                if calibration is not None:
+                    self.percentage = calibration.percentage
+                    self.user_distance = calibration.scale
+                    self.unit = calibration.unit
+                    self.label_calibration.setText(f"Saved calibration: {calibration.describe()}")
+                    return True
+        return False
+
     def handle_distance_changed(self, percentage):
         #print(percentage)
         self.percentage = percentage
@@ -249,21 +355,37 @@ class GUI(QWidget):
     
     def browse_video_file(self):
         options = QFileDialog.Options()
-        file_path, _ = QFileDialog.getOpenFileName(self, "Select Video File", "", "Video Files (*.mp4 *.avi *.mkv)", options=options)
+        file_path, _ = QFileDialog.getOpenFileName(self, "Select Video File", "", f"Video Files (*.mp4 *.avi *.mkv *{SPOOL_EXTENSION})", options=options)
         if file_path:
             self.video_file_path = file_path
             self.label_selected_file.setText(os.path.basename(file_path))  # Display only the file name
             
+    def start_spool_recording(self):
+        spool_path, _ = QFileDialog.getSaveFileName(self, "Record Camera To", "", f"Frame Spool (*{SPOOL_EXTENSION})")
+        if not spool_path:
+            return
+        if not is_spool(spool_path):
+            spool_path += SPOOL_EXTENSION
+        self.main_app.VI_M.start_spool_recording(device_index(self.device_combobox.currentText()), spool_path)
+
     def start_estimation(self):
-        if self.percentage == -1:
+        if self.percentage == -1 and self.device_combobox.count():
+            self.apply_saved_calibration(device_index(self.device_combobox.currentText()))
+        if self.record_only_checkbox.isChecked() and not self.video_file_path:
+            # No pose model runs while recording, so no reference distance is needed yet
+            self.start_spool_recording()
+        elif self.percentage == -1:
             self.has_not_happend = False
             self.start_distance_picker()
             self.show_error("Must Pick Refrence Distance")
         else:
             chosen_joint = self.joint_combobox.currentText()
             chosen_axis = None #self.axis_combobox.currentText().lower()
-            video_device = int(self.device_combobox.currentText().split(":")[0].split(" ")[-1])
+            video_device = device_index(self.device_combobox.currentText())
             save_data = self.save_data_checkbox.isChecked()
+            keep_landmarks = save_data and self.keep_landmarks_checkbox.isChecked()
+            analytics = self.reps_checkbox.isChecked()
+            profile = self.profile_checkbox.isChecked()
             data_points_input = self.entry_data_points.text()
             data_points_per_second = int(data_points_input) if data_points_input.isdigit() and 1 <= int(
                 data_points_input) <= 30 else None
@@ -281,10 +403,20 @@ class GUI(QWidget):
             if self.video_file_path:
                 # Get the selected video file path
                 video_type = self.video_file_path
+                try:
+                    segments = parse_segments(self.entry_segments.text())
+                except ValueError as e:
+                    self.show_error(str(e))
+                    return
+                if segments and is_spool(video_type):
+                    self.show_error("Segments can only be used with video files, not spools.")
+                    return
                 # Start estimation with the selected video file
-                self.main_app.start_estimation(chosen_joint, chosen_axis, video_type, save_data, save_location, file_name, percentage, userDistance, unit, data_points_per_second=None)
+                self.main_app.start_estimation(chosen_joint, chosen_axis, video_type, save_data, save_location, file_name, percentage, userDistance, unit, data_points_per_second=None, keep_landmarks=keep_landmarks, segments=segments,
+                                               analytics=analytics, profile=profile)
             else:
-                self.main_app.start_estimation(chosen_joint, chosen_axis, video_device, save_data, save_location, file_name,percentage,userDistance,unit, data_points_per_second)
+                self.main_app.start_estimation(chosen_joint, chosen_axis, video_device, save_data, save_location, file_name,percentage,userDistance,unit, data_points_per_second, keep_landmarks=keep_landmarks,
+                                               adaptive_quality=self.adaptive_quality_checkbox.isChecked(), analytics=analytics, profile=profile)
 
     def show_error(self, message):
         error_dialog = QErrorMessage(self)
@@ -293,13 +425,29 @@ class GUI(QWidget):
 class Main:
     def __init__(self):
         self.VI_M = VideoImgManager()
+        # Load the pose model while the user sets up the session, every run reuses it
+        warm_up_pose_model()
 
-    def start_estimation(self, chosen_joint, chosen_axis, video_type, save_data, save_location, file_name,percentage,userDistance,unit, data_points_per_second=None):
+    def start_estimation(self, chosen_joint, chosen_axis, video_type, save_data, save_location, file_name,percentage,userDistance,unit, data_points_per_second=None, keep_landmarks=False, segments=None,
+                         adaptive_quality=False, analytics=False, profile=False):
         if not file_name:
             file_name = "output.csv"  # Default file name if not provided
 
         pose_estimator = PoseEstimatorMP(chosen_joint, chosen_axis, save_location, file_name,percentage,userDistance,unit,data_points_per_second)
-        self.VI_M.start_video_recording(pose_estimator, video_type, save_data)
+        if keep_landmarks:
+            # Saved next to the CSV, recompute.py redoes the session with another scale or joint
+            pose_estimator.keep_landmarks()
+        quality = None
+        if adaptive_quality and is_live_source(video_type):
+            # Before start_video_recording starts streaming, the level becomes a CSV column
+            quality = QualityController(data_points_per_second)
+            quality.attach(pose_estimator)
+        if analytics:
+            pose_estimator.start_analytics()
+        if profile or os.environ.get(STATS_ENV):
+            # Times every stage, shown on the video with profile and dumped to STATS_ENV when it is set
+            pose_estimator.profiler = Profiler(target_rate=data_points_per_second)
+        self.VI_M.start_video_recording(pose_estimator, video_type, save_data, segments=segments, quality=quality, overlay=profile)
 
 
 if __name__ == '__main__':
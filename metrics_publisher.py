@@ -0,0 +1,234 @@
+# metrics_publisher.py
+# Streams samples to other local processes through a shared-memory ring buffer.
+#
+# Layout: a HEADER_SIZE byte header followed by `capacity` fixed-size records.
+#   0   magic (4s), version (H), reserved (H), capacity (I), fieldnames length (I)
+#   16  write count (Q)   records written so far
+#   24  state (Q)         1 while the publisher is running, 0 once it has closed
+#   32  sequence (Q)      odd while the publisher writes records and the write count (a seqlock)
+#   40  publisher pid (Q)
+#   48  fieldnames as UTF-8 JSON
+# A record is the row as float64 values, the same type SampleStore keeps. The
+# publisher never waits for subscribers: a reader that falls more than `capacity`
+# records behind skips ahead and counts what it lost.
+import argparse
+import json
+import os
+import struct
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+DEFAULT_CHANNEL = "motion_capture_metrics"
+MAGIC = b"MCAP"
+VERSION = 3
+HEADER_SIZE = 4096
+_HEADER = struct.Struct("<4sHHII")
+_COUNTERS_OFFSET = 16
+_FIELDNAMES_OFFSET = 48
+# Indices into the counters view
+WRITE_COUNT, STATE, SEQUENCE, PID = range(4)
+
+# Channels published by this process, their tracker registration must survive local subscribers
+_published_channels = set()
+
+
+def record_dtype(fieldnames):
+    return np.dtype([(name, "<f8") for name in fieldnames])
+
+
+def _counters(buffer):
+    # uint64 views of the write count, state, sequence and pid, aligned 8-byte stores
+    return np.ndarray((4,), dtype="<u8", buffer=buffer, offset=_COUNTERS_OFFSET)
+
+
+def _process_alive(pid):
+    if os.name == "nt":
+        return True  # Windows drops a segment with the last process that has it open, so its owner is running
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # running under another user
+    return True
+
+
+class MetricsPublisher:
+    def __init__(self, fieldnames, channel=DEFAULT_CHANNEL, capacity=4096, batch_size=1):
+        self.fieldnames = list(fieldnames)
+        self.channel = channel
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.dtype = record_dtype(self.fieldnames)
+
+        encoded_fieldnames = json.dumps(self.fieldnames).encode("utf-8")
+        if _FIELDNAMES_OFFSET + len(encoded_fieldnames) > HEADER_SIZE:
+            raise ValueError("Too many fields for the metrics header")
+
+        try:
+            self.shm = shared_memory.SharedMemory(channel, create=True, size=HEADER_SIZE + capacity * self.dtype.itemsize)
+        except FileExistsError:
+            # Only a segment left behind by a publisher that died is taken over
+            _unlink_stale(channel)
+            self.shm = shared_memory.SharedMemory(channel, create=True, size=HEADER_SIZE + capacity * self.dtype.itemsize)
+
+        _published_channels.add(channel)
+        _HEADER.pack_into(self.shm.buf, 0, MAGIC, VERSION, 0, capacity, len(encoded_fieldnames))
+        self.shm.buf[_FIELDNAMES_OFFSET:_FIELDNAMES_OFFSET + len(encoded_fieldnames)] = encoded_fieldnames
+        self.counters = _counters(self.shm.buf)
+        self.counters[:] = (0, 1, 0, os.getpid())
+        self.records = np.ndarray((capacity,), dtype=self.dtype, buffer=self.shm.buf, offset=HEADER_SIZE)
+
+        self.pending = np.zeros(batch_size, dtype=self.dtype)
+        self.pending_count = 0
+        self.write_count = 0
+
+    def publish(self, row):
+        self.pending[self.pending_count] = tuple(row)
+        self.pending_count += 1
+        if self.pending_count >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.pending_count == 0 or self.records is None:
+            return
+        count = self.pending_count
+        start = self.write_count % self.capacity
+        first = min(count, self.capacity - start)
+
+        # Readers retry a copy made while the sequence was odd or has moved on since
+        self.counters[SEQUENCE] += 1
+        self.records[start:start + first] = self.pending[:first]
+        if first < count:
+            self.records[:count - first] = self.pending[first:count]
+        self.write_count += count
+        self.counters[WRITE_COUNT] = self.write_count
+        self.counters[SEQUENCE] += 1
+        self.pending_count = 0
+
+    def close(self):
+        if self.records is None:
+            return
+        self.flush()
+        self.counters[STATE] = 0
+        del self.records, self.counters
+        self.records = None
+        self.shm.close()
+        self.shm.unlink()
+        _published_channels.discard(self.channel)
+
+
+class MetricsSubscriber:
+    def __init__(self, channel=DEFAULT_CHANNEL):
+        self.shm = _attach(channel)
+        magic, version, _, self.capacity, fieldnames_length = _HEADER.unpack_from(self.shm.buf, 0)
+        if magic != MAGIC or version != VERSION:
+            self.shm.close()
+            raise ValueError(f"{channel} is not a metrics channel")
+
+        self.fieldnames = json.loads(bytes(self.shm.buf[_FIELDNAMES_OFFSET:_FIELDNAMES_OFFSET + fieldnames_length]).decode("utf-8"))
+        self.dtype = record_dtype(self.fieldnames)
+        self.counters = _counters(self.shm.buf)
+        self.records = np.ndarray((self.capacity,), dtype=self.dtype, buffer=self.shm.buf, offset=HEADER_SIZE)
+        self.read_count = int(self.counters[WRITE_COUNT])  # start with what is published from now on
+        self.lost = 0
+
+    @property
+    def publisher_running(self):
+        return bool(self.counters[STATE])
+
+    def read(self):
+        # Records published since the last call, as a structured array (may be empty)
+        while True:
+            sequence = int(self.counters[SEQUENCE])
+            if sequence & 1:
+                time.sleep(0)  # the publisher is in the middle of a flush
+                continue
+            write_count = int(self.counters[WRITE_COUNT])
+            read_count = max(self.read_count, write_count - self.capacity)
+            indices = np.arange(read_count, write_count) % self.capacity
+            batch = self.records[indices]  # fancy indexing copies out of the ring
+            if int(self.counters[SEQUENCE]) == sequence:
+                break
+
+        # Records overwritten before this read are skipped
+        self.lost += read_count - self.read_count
+        self.read_count = write_count
+        return batch
+
+    def poll(self, timeout=1.0, interval=0.0005):
+        # Waits up to `timeout` seconds for new records
+        deadline = time.monotonic() + timeout
+        while True:
+            batch = self.read()
+            if len(batch) or not self.publisher_running or time.monotonic() >= deadline:
+                return batch
+            time.sleep(interval)
+
+    def close(self):
+        del self.records, self.counters
+        self.shm.close()
+
+
+def _attach(channel):
+    try:
+        return shared_memory.SharedMemory(channel, track=False)
+    except TypeError:
+        # Before Python 3.13 attaching registers the segment with this process's
+        # resource tracker, which would unlink it under the publisher on exit
+        shm = shared_memory.SharedMemory(channel)
+        if channel in _published_channels:
+            return shm
+        try:
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+        return shm
+
+
+def _unlink_stale(channel):
+    # Removes a segment whose publisher is no longer running, raises if it is still in use
+    shm = _attach(channel)
+    try:
+        magic, version = _HEADER.unpack_from(shm.buf, 0)[:2]
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Shared memory {channel} exists and is not a metrics channel of this version")
+        counters = _counters(shm.buf)
+        running = bool(counters[STATE]) and _process_alive(int(counters[PID]))
+        del counters
+        if running:
+            raise ValueError(f"Metrics channel {channel} is in use by a running publisher")
+    finally:
+        shm.close()
+    stale = shared_memory.SharedMemory(channel)
+    stale.close()
+    stale.unlink()
+
+
+def print_records(records):
+    for record in records:
+        print(",".join(f"{value:.2f}" for value in record.tolist()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print the samples of a running session as they are published.")
+    parser.add_argument("channel", nargs="?", default=DEFAULT_CHANNEL, help="Shared memory name given to the publisher")
+    args = parser.parse_args()
+
+    subscriber = MetricsSubscriber(args.channel)
+    print(",".join(subscriber.fieldnames))
+    try:
+        while subscriber.publisher_running:
+            print_records(subscriber.poll())
+        print_records(subscriber.read())  # flushed just before the publisher closed
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"{subscriber.lost} records lost")
+        subscriber.close()
+
+
+if __name__ == '__main__':
+    main()
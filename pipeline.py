@@ -0,0 +1,222 @@
+# pipeline.py
+import queue
+import threading
+import time
+
+from video_capture import read_timestamped
+
+# Drop policies for the queues between stages
+DROP_LATEST = "latest"  # live cameras: a slow consumer only ever sees the newest frame
+DROP_NEVER = "never"    # video files: producers block so that no frame is lost
+
+_END = object()  # end-of-stream marker passed down the pipeline
+
+
+class FramePacket:
+    __slots__ = ("index", "frame", "captured_at", "landmarks")
+
+    # captured_at is the frame's capture time in seconds (see video_capture.read_timestamped)
+
+    def __init__(self, index, frame, captured_at):
+        self.index = index
+        self.frame = frame
+        self.captured_at = captured_at
+        self.landmarks = None
+
+
+class StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.dropped = 0
+        self.busy_time = 0.0
+        self.start_time = None
+        self.end_time = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        self.start_time = time.perf_counter()
+
+    def stop(self):
+        self.end_time = time.perf_counter()
+
+    def record(self, duration):
+        with self.lock:
+            self.count += 1
+            self.busy_time += duration
+
+    def record_drop(self):
+        with self.lock:
+            self.dropped += 1
+
+    def elapsed(self):
+        if self.start_time is None:
+            return 0.0
+        end_time = self.end_time if self.end_time is not None else time.perf_counter()
+        return end_time - self.start_time
+
+    def summary(self):
+        elapsed = self.elapsed()
+        return {
+            "stage": self.name,
+            "frames": self.count,
+            "dropped": self.dropped,
+            "fps": self.count / elapsed if elapsed > 0 else 0.0,
+            "mean_ms": (self.busy_time / self.count) * 1000 if self.count else 0.0,
+            "utilisation": self.busy_time / elapsed if elapsed > 0 else 0.0,
+        }
+
+
+class StageQueue:
+    def __init__(self, maxsize, drop_policy, stats):
+        if drop_policy not in (DROP_LATEST, DROP_NEVER):
+            raise ValueError(f"Unknown drop policy: {drop_policy}")
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.drop_policy = drop_policy
+        self.stats = stats  # the stage whose output is being dropped
+
+    def put(self, item, stop_event):
+        if item is _END:
+            # The end marker is never dropped, make room for it if needed
+            while not stop_event.is_set():
+                try:
+                    self.queue.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    if self.drop_policy == DROP_LATEST:
+                        self._drop_oldest()
+            return
+
+        if self.drop_policy == DROP_LATEST:
+            while True:
+                try:
+                    self.queue.put_nowait(item)
+                    return
+                except queue.Full:
+                    self._drop_oldest()
+        else:
+            while not stop_event.is_set():
+                try:
+                    self.queue.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+
+    def get(self, stop_event):
+        while not stop_event.is_set():
+            try:
+                return self.queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _END
+
+    def _drop_oldest(self):
+        try:
+            self.queue.get_nowait()
+            self.stats.record_drop()
+        except queue.Empty:
+            pass
+
+
+# Capture -> inference -> render, each stage in its own thread joined by bounded queues.
+# infer(packet) runs on the inference worker and fills packet.landmarks.
+# render(packet) runs on the calling thread (OpenCV/Qt windows must stay there)
+# and returns False to stop the pipeline.
+class FramePipeline:
+    def __init__(self, cap, infer, drop_policy=DROP_LATEST, queue_size=2, live=False):
+        self.cap = cap
+        self.live = live
+        self.infer = infer
+        self.drop_policy = drop_policy
+        self.stop_event = threading.Event()
+
+        self.capture_stats = StageStats("capture")
+        self.inference_stats = StageStats("inference")
+        self.render_stats = StageStats("render")
+
+        self.capture_queue = StageQueue(queue_size, drop_policy, self.capture_stats)
+        self.render_queue = StageQueue(queue_size, drop_policy, self.inference_stats)
+
+        self.capture_thread = threading.Thread(target=self._capture_loop, name="capture", daemon=True)
+        self.inference_thread = threading.Thread(target=self._inference_loop, name="inference", daemon=True)
+        self.error = None
+
+    def _capture_loop(self):
+        self.capture_stats.start()
+        index = 0
+        try:
+            while not self.stop_event.is_set() and self.cap.isOpened():
+                start = time.perf_counter()
+                if hasattr(self.cap, "read_timestamped"):
+                    # ThreadedVideoCapture (the grabber thread already timestamped the frame and
+                    # dropped stale ones) or SegmentCapture (which knows each frame's index in the file)
+                    ret, frame, captured_at, index = self.cap.read_timestamped()
+                    if not ret:
+                        continue  # no new frame yet, isOpened() tells whether the camera is gone
+                else:
+                    ret, frame, captured_at = read_timestamped(self.cap, self.live)
+                    if not ret:
+                        break
+                self.capture_stats.record(time.perf_counter() - start)
+                self.capture_queue.put(FramePacket(index, frame, captured_at), self.stop_event)
+                index += 1
+        except Exception as e:
+            self.error = e
+        finally:
+            self.capture_stats.stop()
+            self.capture_queue.put(_END, self.stop_event)
+
+    def _inference_loop(self):
+        self.inference_stats.start()
+        try:
+            while True:
+                packet = self.capture_queue.get(self.stop_event)
+                if packet is _END:
+                    break
+                start = time.perf_counter()
+                self.infer(packet)
+                self.inference_stats.record(time.perf_counter() - start)
+                self.render_queue.put(packet, self.stop_event)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.inference_stats.stop()
+            self.render_queue.put(_END, self.stop_event)
+
+    def run(self, render):
+        self.capture_thread.start()
+        self.inference_thread.start()
+        self.render_stats.start()
+        try:
+            while True:
+                packet = self.render_queue.get(self.stop_event)
+                if packet is _END:
+                    break
+                start = time.perf_counter()
+                keep_going = render(packet)
+                self.render_stats.record(time.perf_counter() - start)
+                if keep_going is False:
+                    break
+        finally:
+            self.render_stats.stop()
+            self.stop()
+
+        if self.error is not None:
+            raise self.error
+
+    def stop(self):
+        self.stop_event.set()
+        self.capture_thread.join()
+        self.inference_thread.join()
+
+    def report(self):
+        return [self.capture_stats.summary(), self.inference_stats.summary(), self.render_stats.summary()]
+
+    def print_report(self):
+        report = self.report()
+        for stage in report:
+            print(f"{stage['stage']:>10}: {stage['frames']} frames, {stage['fps']:.1f} FPS, "
+                  f"{stage['mean_ms']:.1f} ms/frame, {stage['utilisation'] * 100:.0f}% busy, "
+                  f"{stage['dropped']} dropped")
+        bottleneck = max(report, key=lambda stage: stage['mean_ms'])
+        print(f"Bottleneck stage: {bottleneck['stage']}")
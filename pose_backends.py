@@ -0,0 +1,286 @@
+# pose_backends.py
+# Pose models behind one interface, so sessions and batch runs can switch between
+# CPU runtimes without touching the landmark maths or the export code.
+#
+#   backend = create_backend("onnx", model_path="pose_landmark_full.onnx")
+#   landmarks = backend.infer_batch(rgb_frames, timestamps)
+#
+# infer_batch takes a list of RGB frames (and optionally their capture times in
+# seconds) and returns one (33, 3) array of normalized x, y and visibility per
+# frame, or None where no pose was found. Backends that cannot batch run the
+# frames one by one; the ONNX backend stacks them into one tensor.
+#
+# The runtimes are imported by the backend that needs them, so only the chosen
+# one has to be installed.
+import math
+from abc import ABC, abstractmethod
+
+import cv2
+import numpy as np
+
+from utils import POSE_LANDMARK_NAMES, landmarks_to_array
+
+DEFAULT_BACKEND = "mediapipe"
+
+
+class PoseBackend(ABC):
+    name = None
+    model_name = None  # recorded in the landmark cache key
+    # Backends whose landmark model needs the person found first (see detect). The
+    # MediaPipe graphs run their own detector and only take whole frames.
+    has_detector = False
+    # Landmark rows infer has to fill, None is all of them. Set by InferenceFrontEnd before
+    # every call; backends that convert landmark by landmark skip the others (left NaN).
+    landmark_rows = None
+
+    @abstractmethod
+    def infer(self, frame, timestamp=None):
+        # (33, 3) landmarks of one RGB frame, None when no pose was found
+        pass
+
+    def infer_batch(self, frames, timestamps=None):
+        if timestamps is None:
+            timestamps = [None] * len(frames)
+        return [self.infer(frame, timestamp) for frame, timestamp in zip(frames, timestamps)]
+
+    def detect(self, frame):
+        # (x0, y0, x1, y1) normalized box around the person in an RGB frame, None when there is none
+        return None
+
+    def reset(self):
+        # Forget the subject tracked across frames, called before a new session reuses the model
+        pass
+
+    def close(self):
+        pass
+
+
+# mp.solutions.pose.Pose, one frame per call, tracks the subject between frames
+class MediaPipeSolutionBackend(PoseBackend):
+    name = "mediapipe"
+    model_name = "mediapipe.solutions.pose"
+
+    def __init__(self, model_complexity=1):
+        import mediapipe as mp
+        self.model = mp.solutions.pose.Pose(model_complexity=model_complexity)
+
+    def infer(self, frame, timestamp=None):
+        results = self.model.process(frame)
+        if not results.pose_landmarks:
+            return None
+        return landmarks_to_array(results.pose_landmarks, self.landmark_rows)
+
+    def reset(self):
+        self.model.reset()
+
+    def close(self):
+        self.model.close()
+
+
+# MediaPipe Tasks PoseLandmarker in VIDEO mode (a .task model file). VIDEO mode needs
+# strictly increasing millisecond timestamps; frames without a capture time are
+# spaced one frame at 30 FPS apart.
+class MediaPipeTasksBackend(PoseBackend):
+    name = "mediapipe-tasks"
+    model_name = "mediapipe.tasks.PoseLandmarker"
+
+    def __init__(self, model_path, min_detection_confidence=0.5, min_tracking_confidence=0.5):
+        import mediapipe as mp
+        self.mp = mp
+        self.model_path = model_path
+        self.min_detection_confidence = min_detection_confidence
+        self.min_tracking_confidence = min_tracking_confidence
+        self.last_timestamp_ms = -1
+        self.landmarker = self._create()
+
+    def _create(self):
+        vision = self.mp.tasks.vision
+        options = vision.PoseLandmarkerOptions(
+            base_options=self.mp.tasks.BaseOptions(model_asset_path=self.model_path),
+            running_mode=vision.RunningMode.VIDEO,
+            num_poses=1,
+            min_pose_detection_confidence=self.min_detection_confidence,
+            min_tracking_confidence=self.min_tracking_confidence,
+        )
+        return vision.PoseLandmarker.create_from_options(options)
+
+    def infer(self, frame, timestamp=None):
+        timestamp_ms = self.last_timestamp_ms + 33 if timestamp is None else int(timestamp * 1000)
+        timestamp_ms = max(timestamp_ms, self.last_timestamp_ms + 1)
+        self.last_timestamp_ms = timestamp_ms
+
+        image = self.mp.Image(image_format=self.mp.ImageFormat.SRGB, data=np.ascontiguousarray(frame))
+        result = self.landmarker.detect_for_video(image, timestamp_ms)
+        if not result.pose_landmarks:
+            return None
+        return np.array([(landmark.x, landmark.y, landmark.visibility) for landmark in result.pose_landmarks[0]], dtype=np.float64)
+
+    def reset(self):
+        # A VIDEO mode landmarker cannot be rewound, a new one starts without a tracked subject
+        self.landmarker.close()
+        self.landmarker = self._create()
+        self.last_timestamp_ms = -1
+
+    def close(self):
+        self.landmarker.close()
+
+
+def letterbox(frame, size, channels_first=False):
+    # Frame scaled into the top left of a square float input in [0, 1], returns the tensor and the scale
+    height, width = frame.shape[:2]
+    scale = size / max(height, width)
+    resized = cv2.resize(frame, (max(1, round(width * scale)), max(1, round(height * scale))), interpolation=cv2.INTER_AREA)
+    tensor = np.zeros((size, size, 3), dtype=np.float32)
+    tensor[:resized.shape[0], :resized.shape[1]] = resized
+    tensor *= 1 / 255
+    return (tensor.transpose(2, 0, 1) if channels_first else tensor), scale
+
+
+def onnx_session(model_path, num_threads=None):
+    import onnxruntime as ort
+    options = ort.SessionOptions()
+    if num_threads:
+        options.intra_op_num_threads = num_threads
+    session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+    model_input = session.get_inputs()[0]
+    shape = model_input.shape  # e.g. [1, 256, 256, 3] or ['batch', 3, 256, 256]
+    channels_first = shape[1] == 3
+    return session, model_input.name, shape, channels_first
+
+
+def ssd_anchor_centers(input_size=224, strides=(8, 16, 32, 32, 32)):
+    # Anchor centres of the BlazePose detector, as MediaPipe's SsdAnchorsCalculator makes them
+    # with fixed_anchor_size: two anchors per cell and layer, layers of equal stride share a grid
+    centers = []
+    layer = 0
+    while layer < len(strides):
+        stride, anchors_per_cell = strides[layer], 0
+        while layer < len(strides) and strides[layer] == stride:
+            anchors_per_cell += 2
+            layer += 1
+        cells = math.ceil(input_size / stride)
+        ys, xs = np.mgrid[0:cells, 0:cells]
+        grid = np.column_stack(((xs.ravel() + 0.5) / cells, (ys.ravel() + 0.5) / cells))
+        centers.append(np.repeat(grid, anchors_per_cell, axis=0))
+    return np.concatenate(centers)
+
+
+# The BlazePose person detector (pose_detection.tflite converted to ONNX), which the
+# MediaPipe graph runs before the landmark model whenever it has lost the subject.
+# Of its detections only the best one is used. Its first two keypoints are the hip
+# centre and a point on the circle around the whole body; the box around that
+# circle, enlarged by box_scale, is where the landmark model should look.
+class BlazePoseDetector:
+    def __init__(self, model_path, num_threads=None, score_threshold=0.5, box_scale=1.25):
+        self.session, self.input_name, shape, self.channels_first = onnx_session(model_path, num_threads)
+        spatial = shape[2] if self.channels_first else shape[1]
+        self.input_size = spatial if isinstance(spatial, int) else 224
+        self.anchors = ssd_anchor_centers(self.input_size)
+        self.score_threshold = score_threshold
+        self.box_scale = box_scale
+
+    def detect(self, frame):
+        tensor, scale = letterbox(frame, self.input_size, self.channels_first)
+        outputs = self.session.run(None, {self.input_name: (tensor * 2 - 1)[None]})  # the detector takes [-1, 1]
+        regressors = scores = None
+        for output in outputs:
+            output = output.reshape(len(self.anchors), -1)
+            if output.shape[1] == 1:
+                scores = output[:, 0]
+            else:
+                regressors = output
+        if regressors is None or scores is None:
+            raise ValueError("The ONNX detector has no outputs shaped like the BlazePose detector's")
+
+        best = int(np.argmax(scores))
+        if 1 / (1 + np.exp(-np.clip(scores[best], -100, 100))) < self.score_threshold:
+            return None
+        # Keypoints are offsets in input pixels from the anchor centre
+        hip = regressors[best, 4:6] / self.input_size + self.anchors[best]
+        body = regressors[best, 6:8] / self.input_size + self.anchors[best]
+        radius = np.hypot(*(body - hip)) * self.box_scale
+
+        # Letterboxed input -> normalized frame coordinates
+        height, width = frame.shape[:2]
+        to_frame = np.array([self.input_size / (scale * width), self.input_size / (scale * height)])
+        x0, y0 = (hip - radius) * to_frame
+        x1, y1 = (hip + radius) * to_frame
+        return float(x0), float(y0), float(x1), float(y1)
+
+
+# A BlazePose landmark model exported to ONNX (e.g. pose_landmark_full converted with
+# tf2onnx), run by ONNX Runtime on the CPU. The model sees one person per image: with
+# detector_path, the BlazePose detector finds the person whenever InferenceFrontEnd
+# has no region of interest yet (see detect), without it the first frames go to the
+# landmark model whole, which only works when the person fills most of the frame.
+# Frames are letterboxed to the model's square input and stacked into batches of up
+# to batch_size (one at a time when the exported model has a fixed batch of 1).
+# Outputs used: the landmark tensor, 33 or 39 keypoints (the 33 landmarks plus
+# BlazePose's auxiliary points) of KEYPOINT_VALUES values each: x, y, z in input
+# pixels, visibility and presence logits; and the pose flag logit.
+class OnnxPoseBackend(PoseBackend):
+    name = "onnx"
+    model_name = "onnxruntime"
+    KEYPOINT_VALUES = 5
+    KEYPOINT_COUNTS = (33, 39)
+
+    def __init__(self, model_path, detector_path=None, input_size=256, batch_size=8, num_threads=None, pose_threshold=0.5):
+        self.session, self.input_name, shape, self.channels_first = onnx_session(model_path, num_threads)
+        spatial = shape[2] if self.channels_first else shape[1]
+        self.input_size = spatial if isinstance(spatial, int) else input_size
+        self.batch_size = 1 if shape[0] == 1 else max(1, batch_size)
+        self.pose_threshold = pose_threshold
+        self.detector = BlazePoseDetector(detector_path, num_threads) if detector_path else None
+        if self.detector is None:
+            print("ONNX pose backend without a detector (detector_path): frames without a tracked subject are passed whole")
+
+    @property
+    def has_detector(self):
+        return self.detector is not None
+
+    def detect(self, frame):
+        return self.detector.detect(frame) if self.detector is not None else None
+
+    def _split_outputs(self, outputs, count):
+        keypoint_sizes = [keypoint_count * self.KEYPOINT_VALUES for keypoint_count in self.KEYPOINT_COUNTS]
+        keypoints = flags = None
+        for output in outputs:
+            per_frame = output.reshape(count, -1)
+            if keypoints is None and per_frame.shape[1] in keypoint_sizes:
+                keypoints = per_frame.reshape(count, -1, self.KEYPOINT_VALUES)[:, :len(POSE_LANDMARK_NAMES)]
+            elif flags is None and per_frame.shape[1] == 1:
+                flags = per_frame[:, 0]
+        if keypoints is None:
+            raise ValueError("The ONNX model has no output shaped like BlazePose landmarks")
+        return keypoints, flags
+
+    def infer_batch(self, frames, timestamps=None):
+        results = []
+        for start in range(0, len(frames), self.batch_size):
+            prepared = [letterbox(frame, self.input_size, self.channels_first) for frame in frames[start:start + self.batch_size]]
+            batch = np.stack([tensor for tensor, _ in prepared])
+            keypoints, flags = self._split_outputs(self.session.run(None, {self.input_name: batch}), len(prepared))
+
+            for index, (frame, (_, scale)) in enumerate(zip(frames[start:], prepared)):
+                if flags is not None and 1 / (1 + np.exp(-flags[index])) < self.pose_threshold:
+                    results.append(None)
+                    continue
+                height, width = frame.shape[:2]
+                landmarks = np.empty((len(POSE_LANDMARK_NAMES), 3))
+                landmarks[:, 0] = keypoints[index, :, 0] / (scale * width)
+                landmarks[:, 1] = keypoints[index, :, 1] / (scale * height)
+                landmarks[:, 2] = 1 / (1 + np.exp(-keypoints[index, :, 3]))
+                results.append(landmarks)
+        return results
+
+    def infer(self, frame, timestamp=None):
+        return self.infer_batch([frame])[0]
+
+
+BACKENDS = {backend.name: backend for backend in (MediaPipeSolutionBackend, MediaPipeTasksBackend, OnnxPoseBackend)}
+
+
+def create_backend(name=DEFAULT_BACKEND, **options):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown pose backend {name!r}, choose one of {', '.join(BACKENDS)}")
+    return BACKENDS[name](**options)
@@ -1,14 +1,66 @@
 # pose_estimator_mp.py
 import cv2
-import mediapipe as mp
 import math
 import csv
 import time
 import os
-import psutil
-from utils import get_joint_combinations
-from tkinter import filedialog
-from PyQt5.QtWidgets import QFileDialog, QMessageBox
+import threading
+from data_writer import StreamingDataWriter
+from sample_store import SampleStore
+from inference_frontend import ROI_LANDMARKS, InferenceFrontEnd
+from landmark_filter import OneEuroLandmarkFilter
+from metrics_publisher import MetricsPublisher, DEFAULT_CHANNEL
+from instrumentation import NULL_PROFILER
+from landmark_log import LandmarkLog, landmark_log_path
+from quality_controller import quality_log_path
+from rep_detector import MotionAnalytics, summary_path
+from pose_backends import BACKENDS, DEFAULT_BACKEND, MediaPipeSolutionBackend, create_backend
+import numpy as np
+from utils import ALL_JOINTS, TRACKED_JOINTS, joint_index_triples, wide_fieldnames, calculate_angles
+
+# MediaPipe, psutil, tkinter and PyQt5 are imported where they are used, so headless
+# runs (cli_mp.py, batch_mp.py, recomputing from the landmark cache) never load the GUI stack
+
+CSV_FIELDNAMES = ['Timestamp', 'Adjusted Distance X', 'Adjusted Distance Y', 'Angle']
+
+
+def write_data_csv(file_path, data):
+    with open(file_path, mode='w', newline='') as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(data.fieldnames)
+
+        writer.writerows(data.rounded(2).tolist())
+
+
+# One pose model per backend and setting, loaded on first use (or warmed up in the
+# background) and reused by every later estimation run in the process
+_pose_models = {}
+_pose_models_lock = threading.Lock()
+
+
+def create_pose_model(model_complexity=1, backend=DEFAULT_BACKEND, backend_options=None):
+    # See pose_backends; model_complexity applies to the MediaPipe solution backend
+    options = dict(backend_options or {})
+    if backend == MediaPipeSolutionBackend.name:
+        options.setdefault("model_complexity", model_complexity)
+    return create_backend(backend, **options)
+
+
+def get_pose_model(model_complexity=1, backend=DEFAULT_BACKEND, backend_options=None):
+    key = (backend, model_complexity, tuple(sorted((backend_options or {}).items())))
+    with _pose_models_lock:
+        model = _pose_models.get(key)
+        if model is None:
+            model = create_pose_model(model_complexity, backend, backend_options)
+            _pose_models[key] = model
+        return model
+
+
+def warm_up_pose_model(model_complexity=1, backend=DEFAULT_BACKEND, backend_options=None):
+    thread = threading.Thread(target=get_pose_model, args=(model_complexity, backend, backend_options), name="model-warm-up", daemon=True)
+    thread.start()
+    return thread
+
 
 class PointTracker:
     def __init__(self, screen_diagonal_percentage, distance_that_persentage_represents):
@@ -29,21 +81,95 @@ class PointTracker:
 
 class PoseEstimatorMP:
     def __init__(self, chosen_joint="LEFT_SHOULDER", chosen_axis="x", save_location="", file_name="motion_data.csv", distance_percentage=0, user_distance=100, unit=0, data_points_per_second=None):
-        self.mp_pose = mp.solutions.pose
-        self.pose_landmarker = self.mp_pose.Pose()
-        self.results = None
-        self.data = []
-        self.start_time = None
+        self.model_complexity = 1
+        # Pose runtime (see pose_backends.BACKENDS) and its options, e.g. {"model_path": ...}
+        self.backend = DEFAULT_BACKEND
+        self.backend_options = {}
+        self._pose_landmarker = None  # loaded on first use, see pose_landmarker
+        # Concurrent sessions need a graph each, the model tracks the subject between frames
+        self.shared_model = True
+        # Own graph of another complexity loaded in the background by set_quality, swapped in between frames
+        self._model_lock = threading.Lock()
+        self._model_loader = None
+        self._loaded_model = None
+        self._model_in_use = None  # complexity of _pose_landmarker
+        # Inference front end: frames are cropped around the subject and downscaled before the model
+        self.inference_size = 640
+        self.use_roi = True
+        self._front_end = None
         self.chosen_joint = chosen_joint
+        # Joints recorded per sample, ALL_JOINTS writes one wide row covering every tracked joint
+        self.tracked_joints = TRACKED_JOINTS if chosen_joint == ALL_JOINTS else [chosen_joint]
+        self.joint_triples = joint_index_triples(self.tracked_joints)
+        self.joint_rows = tuple(int(index) for index in self.joint_triples[0])  # the chosen joint's rows as plain ints
+        self.fieldnames = wide_fieldnames(self.tracked_joints) if chosen_joint == ALL_JOINTS else CSV_FIELDNAMES
+        self.initial_positions = None
+        # Streaming One-Euro smoothing between inference and the angle/displacement maths, None disables it
+        self.landmark_filter = OneEuroLandmarkFilter()
+        self.data = SampleStore(self.fieldnames)
+        self.writer = None
+        self.publisher = None  # live subscribers, see start_publishing
+        self.profiler = NULL_PROFILER  # an instrumentation.Profiler times the hot path
+        self.landmark_log = None  # see keep_landmarks
+        self.saved_rows = None  # rows the last save_data wrote, data only keeps the newest ones while streaming
+        self.quality_controller = None  # see quality_controller.QualityController.attach
+        self.quality_level = None  # level recorded with every sample while a controller is attached
+        self.analytics = None  # see start_analytics
+        self.start_time = None
         self.chosen_axis = None#chosen_axis.lower()
         self.save_location = save_location
         self.file_name = file_name
         self.data_points_per_second = data_points_per_second
-        self.last_frame_time = time.time()
+        self.last_angle = None
+        self.last_joint_position = None
         self.userDistance = user_distance
         self.unit = unit
         self.tracker = PointTracker(distance_percentage, user_distance)  # Change the percentage accordingly
 
+    @property
+    def pose_landmarker(self):
+        if self._pose_landmarker is None:
+            self._model_in_use = self.model_complexity
+            if not self.shared_model:
+                self._pose_landmarker = create_pose_model(self.model_complexity, self.backend, self.backend_options)
+                return self._pose_landmarker
+            self._pose_landmarker = get_pose_model(self.model_complexity, self.backend, self.backend_options)
+            # The shared model may still be tracking the subject of the previous run
+            self._pose_landmarker.reset()
+        return self._pose_landmarker
+
+    @property
+    def front_end(self):
+        if self._front_end is None:
+            self._front_end = InferenceFrontEnd(self.pose_landmarker, self.inference_size, self.use_roi)
+        return self._front_end
+
+    def convert_needed_landmarks_only(self):
+        # For sessions where nothing but the samples uses the landmarks (no display, cache or
+        # landmark log): a single joint only needs its three rows and the ones the front end
+        # follows the subject with, reading the other landmarks out of the model's results
+        # costs more than the angle maths
+        if self.chosen_joint != ALL_JOINTS and self.landmark_log is None:
+            self.front_end.landmark_rows = np.array(sorted(set(ROI_LANDMARKS).union(self.joint_rows)), dtype=np.intp)
+
+    def infer_landmarks(self, frame, timestamp=None):
+        # (33, 3) full-frame normalized landmarks of a BGR frame, None when no pose was found
+        if self._loaded_model is not None:
+            self._swap_loaded_model()
+        start = self.profiler.clock()
+        landmarks = self.front_end.process(frame, timestamp)
+        self.profiler.record("inference", start)
+        return landmarks
+
+    def infer_landmark_batch(self, frames, timestamps=None):
+        # infer_landmarks for consecutive frames of one video in a single backend call
+        if self._loaded_model is not None:
+            self._swap_loaded_model()
+        start = self.profiler.clock()
+        landmarks = self.front_end.process_batch(frames, timestamps)
+        self.profiler.record("inference", start)
+        return landmarks
+
     def calculate_angle(self, joint1, joint2, joint_common):
         vector1 = (joint1[0] - joint_common[0], joint1[1] - joint_common[1])
         vector2 = (joint2[0] - joint_common[0], joint2[1] - joint_common[1])
@@ -52,7 +178,10 @@ class PoseEstimatorMP:
         magnitude1 = math.sqrt(vector1[0] ** 2 + vector1[1] ** 2)
         magnitude2 = math.sqrt(vector2[0] ** 2 + vector2[1] ** 2)
 
-        cos_theta = dot_product / (magnitude1 * magnitude2)
+        # Coincident joints have no angle, rounding can push cos_theta just outside [-1, 1]
+        if magnitude1 * magnitude2 == 0 or not math.isfinite(dot_product):
+            return math.nan
+        cos_theta = max(-1.0, min(1.0, dot_product / (magnitude1 * magnitude2)))
         angle_rad = math.acos(cos_theta)
 
         angle_deg = math.degrees(angle_rad)
@@ -78,94 +207,228 @@ class PoseEstimatorMP:
 
         return angle, adjusted_distance_x, adjusted_distance_y
 
-    def process_landmarks(self, frame, chosen_joint):
-        current_time = time.time()
-        elapsed_time = current_time - self.last_frame_time
-        if self.data_points_per_second and elapsed_time < 1 / self.data_points_per_second:
-
-            if self.results.pose_landmarks:
-                joint1, joint2, joint_elbow = get_joint_combinations(chosen_joint)
-                
-                joint1_position = (
-                    self.results.pose_landmarks.landmark[self.mp_pose.PoseLandmark[joint1].value].x,
-                    self.results.pose_landmarks.landmark[self.mp_pose.PoseLandmark[joint1].value].y
-                )
-
-                joint2_position = (
-                    self.results.pose_landmarks.landmark[self.mp_pose.PoseLandmark[joint2].value].x,
-                    self.results.pose_landmarks.landmark[self.mp_pose.PoseLandmark[joint2].value].y
-                )
-
-                joint_elbow_position = (
-                    self.results.pose_landmarks.landmark[self.mp_pose.PoseLandmark[joint_elbow].value].x,
-                    self.results.pose_landmarks.landmark[self.mp_pose.PoseLandmark[joint_elbow].value].y
-                )
-                #print("joint center = %", int(joint_elbow_position[0] * 100),", ", int(joint_elbow_position[1] * 100) )
-                if self.start_time is None:
-                    self.start_time = time.time()
-
-                    # Set the initial point for the first frame
-                    self.tracker.set_initial_point(joint_elbow_position)
-
-                timestamp = time.time() - self.start_time  # Adjust timestamp to start from 0
-
-                # Calculate angle and displacement
-                angle, adjusted_distance_x, adjusted_distance_y = self.calculate_angle_and_displacement(joint1_position, joint2_position, joint_elbow_position)
-
-                # Include angle and adjusted distance in the CSV output
-                if self.data_points_per_second == None:
-                    self.data.append([timestamp, adjusted_distance_x, adjusted_distance_y, angle,])
-
-                # Draw the chosen joint and adjusted distance on the frame
-                joint_x, joint_y = int(joint_elbow_position[0] * frame.shape[1]), int(joint_elbow_position[1] * frame.shape[0])
-                cv2.putText(frame, f'Angle: {angle:.2f}',
-                        (joint_x, joint_y), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 1, cv2.LINE_AA)
-            return  # Skip processing this frame
-
-        self.last_frame_time = current_time
-
-
-
-        if self.results.pose_landmarks:
-            joint1, joint2, joint_elbow = get_joint_combinations(chosen_joint)
-            
-            joint1_position = (
-                self.results.pose_landmarks.landmark[self.mp_pose.PoseLandmark[joint1].value].x,
-                self.results.pose_landmarks.landmark[self.mp_pose.PoseLandmark[joint1].value].y
-            )
-
-            joint2_position = (
-                self.results.pose_landmarks.landmark[self.mp_pose.PoseLandmark[joint2].value].x,
-                self.results.pose_landmarks.landmark[self.mp_pose.PoseLandmark[joint2].value].y
-            )
-
-            joint_elbow_position = (
-                self.results.pose_landmarks.landmark[self.mp_pose.PoseLandmark[joint_elbow].value].x,
-                self.results.pose_landmarks.landmark[self.mp_pose.PoseLandmark[joint_elbow].value].y
-            )
-            #print("joint center = %", int(joint_elbow_position[0] * 100),", ", int(joint_elbow_position[1] * 100) )
+    def add_sample(self, timestamp, joint1_position, joint2_position, joint_elbow_position):
+        # Record a sample whose timestamp is already known (e.g. taken from the video file)
+        if self.tracker.initial_point_x is None:
+            self.tracker.set_initial_point(joint_elbow_position)
+
+        angle, adjusted_distance_x, adjusted_distance_y = self.calculate_angle_and_displacement(joint1_position, joint2_position, joint_elbow_position)
+        row = [timestamp, adjusted_distance_x, adjusted_distance_y, angle,]
+        if self.quality_level is not None:
+            row.append(self.quality_level)
+        self.record_sample(row)
+
+        self.last_angle = angle
+        self.last_joint_position = joint_elbow_position
+        return angle
+
+    def calculate_all_joints(self, landmarks):
+        # Angles and displacements of every tracked joint in one vectorized call
+        vertices = landmarks[self.joint_triples[:, 2], :2]
+        if self.initial_positions is None:
+            self.initial_positions = vertices.copy()
+
+        angles = calculate_angles(landmarks, self.joint_triples)
+        adjusted_distances = (self.userDistance * ((vertices - self.initial_positions) * 100)) * 100
+        return angles, adjusted_distances
+
+    def add_all_joints_sample(self, timestamp, landmarks):
+        angles, adjusted_distances = self.calculate_all_joints(landmarks)
+
+        # Wide row: timestamp followed by X, Y and angle for each joint
+        row = np.empty(len(self.fieldnames))
+        row[0] = timestamp
+        row[1:1 + 3 * len(angles)] = np.column_stack((adjusted_distances, angles)).ravel()
+        if self.quality_level is not None:
+            row[-1] = self.quality_level
+        self.record_sample(row)
+
+        self.last_angle = angles
+        self.last_joint_position = landmarks[self.joint_triples[:, 2], :2]
+        return angles
+
+    def add_landmark_sample(self, timestamp, landmarks):
+        # Record a sample from a (33, 3) landmark array, in either single or all-joint mode.
+        # Raw landmarks go in (they are what the cache stores), smoothing happens here.
+        raw_landmarks = landmarks
+        if self.landmark_filter is not None:
+            start = self.profiler.clock()
+            landmarks = self.landmark_filter.filter(timestamp, landmarks)
+            self.profiler.record("landmark_filter", start)
+
+        if self.landmark_log is not None:
+            self.landmark_log.append(timestamp, landmarks, raw_landmarks)
+
+        if self.chosen_joint == ALL_JOINTS:
+            return self.add_all_joints_sample(timestamp, landmarks)
+
+        return self.add_sample(timestamp, *self.joint_positions(landmarks))
+
+    def joint_positions(self, landmarks):
+        # (joint1, joint2, vertex) positions of the chosen joint as plain floats for the scalar math.
+        # ndarray.item per value is about three times faster than fancy indexing plus tolist for six values.
+        return [(landmarks.item(row, 0), landmarks.item(row, 1)) for row in self.joint_rows]
+
+    def keep_landmarks(self):
+        # Keep the landmarks of every sample, save_data writes them next to the CSV for recompute.py
+        # The log holds the smoothed landmarks the samples used, and the raw ones so recompute.py --refilter
+        # can run the filter again with these settings (or others)
+        filter_settings = self.landmark_filter.settings() if self.landmark_filter is not None else None
+        self.landmark_log = LandmarkLog(settings={"chosen_joint": self.chosen_joint, "user_distance": self.userDistance,
+                                                  "landmark_filter": filter_settings}, keep_raw=filter_settings is not None)
+        return self.landmark_log
+
+    def add_quality_column(self):
+        self.quality_level = 0
+        self.fieldnames = self.fieldnames + ["Quality Level"]
+        self.data = SampleStore(self.fieldnames)
+
+    def set_quality(self, level, model_complexity, inference_size):
+        # Called by the quality controller between frames on the inference thread
+        self.quality_level = level
+        if model_complexity != self.model_complexity and self.backend == MediaPipeSolutionBackend.name:
+            with self._model_lock:
+                self.model_complexity = model_complexity
+            # A model not loaded yet is loaded with the new complexity on first use
+            if self._pose_landmarker is not None and self.shared_model:
+                # Warmed up by EstimationSession.prepare_quality, so this is a dictionary lookup
+                self._pose_landmarker = None
+                if self._front_end is not None:
+                    self._front_end.model = self.pose_landmarker
+            elif self._pose_landmarker is not None and model_complexity != self._model_in_use:
+                # Building a graph stalls inference for a while, the current one keeps running until the new one is ready
+                self._model_loader = threading.Thread(target=self._load_model, args=(model_complexity,), name="model-load", daemon=True)
+                self._model_loader.start()
+        self.inference_size = inference_size
+        if self._front_end is not None:
+            self._front_end.inference_size = inference_size
+
+    def _load_model(self, model_complexity):
+        model = create_pose_model(model_complexity, self.backend, self.backend_options)
+        with self._model_lock:
+            if model_complexity != self.model_complexity:
+                model.close()  # the level changed again while it loaded
+                return
+            if self._loaded_model is not None:
+                self._loaded_model[1].close()
+            self._loaded_model = (model_complexity, model)
+
+    def _swap_loaded_model(self):
+        # On the inference thread: the model set_quality loaded replaces the current one, which is closed
+        with self._model_lock:
+            model_complexity, model = self._loaded_model
+            self._loaded_model = None
+            if model_complexity != self.model_complexity or model_complexity == self._model_in_use:
+                model.close()
+                return
+        replaced = self._pose_landmarker
+        self._pose_landmarker = model
+        self._model_in_use = model_complexity
+        if self._front_end is not None:
+            self._front_end.model = model
+        if replaced is not None:
+            replaced.close()
+
+    def close_pose_model(self):
+        # Releases the graph of an estimator with its own model (shared_model False), shared models stay loaded
+        if self._model_loader is not None:
+            self._model_loader.join()
+        with self._model_lock:
+            if self._loaded_model is not None:
+                self._loaded_model[1].close()
+                self._loaded_model = None
+        if not self.shared_model and self._pose_landmarker is not None:
+            self._pose_landmarker.close()
+        self._pose_landmarker = None
+        self._front_end = None
+
+    def model_settings(self):
+        # Everything that changes the landmarks the model produces, used to key the landmark cache.
+        # The sample rate is part of it: the model and the crop follow the subject from one
+        # sampled frame to the next, so another frame grid gives other landmarks.
+        settings = {"model": BACKENDS[self.backend].model_name, "model_complexity": self.model_complexity, "static_image_mode": False,
+                    "inference_size": self.inference_size, "use_roi": self.use_roi, "data_points_per_second": self.data_points_per_second}
+        if self.backend_options:
+            settings["backend_options"] = self.backend_options
+        return settings
+
+    def record_sample(self, row):
+        start = self.profiler.clock()
+        self.data.append(row)
+        if self.analytics is not None:
+            self.analytics.update(row)
+        if self.writer is not None:
+            self.writer.append(row)
+        if self.publisher is not None:
+            self.publisher.publish(row)
+        self.profiler.record("record_sample", start)
+
+    def start_streaming(self, base_path=None, recent_samples=4096):
+        if base_path is None:
+            base_path = os.path.join(self.save_location or os.getcwd(), time.strftime("motion_data_%Y%m%d_%H%M%S"))
+        self.writer = StreamingDataWriter(base_path, self.fieldnames)
+        # The writer holds the full session, memory only keeps the most recent samples
+        self.data = SampleStore(self.fieldnames, capacity=recent_samples, ring=True)
+        return self.writer
+
+    def start_analytics(self, **options):
+        # Repetitions, range of motion and holds counted as samples are recorded (see rep_detector),
+        # save_data writes the summary next to the CSV. After add_quality_column, which changes the columns.
+        self.analytics = MotionAnalytics(self.fieldnames, **options)
+        return self.analytics
+
+    def start_publishing(self, channel=DEFAULT_CHANNEL, batch_size=1):
+        # Samples are also copied into a shared-memory ring that MetricsSubscriber reads while the session runs
+        self.publisher = MetricsPublisher(self.fieldnames, channel, batch_size=batch_size)
+        return self.publisher
+
+    def stop_publishing(self):
+        if self.publisher is not None:
+            self.publisher.close()
+            self.publisher = None
+
+    def discard_streamed_data(self):
+        if self.writer is not None:
+            self.writer.discard()
+            self.writer = None
+
+    def process_landmark_array(self, frame, chosen_joint, landmarks, timestamp=None):
+        # landmarks are the (33, 3) array of infer_landmarks or the landmark cache, None when no pose was found.
+        # Sample-rate limiting happens before inference (see FrameScheduler), every frame that reaches this point becomes a sample.
+        # timestamp is the frame's capture time, without it the sample is timed when it is processed.
+        start = self.profiler.clock()
+        if landmarks is not None:
+            if timestamp is None:
+                timestamp = time.time()
+            self.profiler.mark_sample(timestamp)
             if self.start_time is None:
-                self.start_time = time.time()
+                self.start_time = timestamp
+            timestamp = timestamp - self.start_time  # Adjust timestamp to start from 0
 
-                # Set the initial point for the first frame
-                self.tracker.set_initial_point(joint_elbow_position)
-
-            timestamp = time.time() - self.start_time  # Adjust timestamp to start from 0
-
-            # Calculate angle and displacement
-            angle, adjusted_distance_x, adjusted_distance_y = self.calculate_angle_and_displacement(joint1_position, joint2_position, joint_elbow_position)
-
-            # Include angle and adjusted distance in the CSV output
+            # Calculate angle and displacement, the first sample sets the initial point
+            self.add_landmark_sample(timestamp, landmarks)
+        else:
+            self.last_angle = None
 
-            self.data.append([timestamp, adjusted_distance_x, adjusted_distance_y, angle,])
+        self.annotate_frame(frame, chosen_joint)
+        self.profiler.record("process_landmarks", start)
 
-            # Draw the chosen joint and adjusted distance on the frame
-            if not chosen_joint == "SKELETON":
-                joint_x, joint_y = int(joint_elbow_position[0] * frame.shape[1]), int(joint_elbow_position[1] * frame.shape[0])
+    def annotate_frame(self, frame, chosen_joint):
+        # Draw the chosen joint(s) and adjusted distance on the frame, display-only frames reuse the last sample
+        if self.last_angle is not None and not chosen_joint == "SKELETON":
+            for angle, position in zip(np.atleast_1d(self.last_angle), np.atleast_2d(self.last_joint_position)):
+                joint_x, joint_y = int(position[0] * frame.shape[1]), int(position[1] * frame.shape[0])
                 cv2.putText(frame, f'Angle: {angle:.2f}',
                             (joint_x, joint_y), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 1, cv2.LINE_AA)
-        
+        if self.analytics is not None and self.analytics.primary is not None:
+            channel = self.analytics.primary
+            text = f'Reps: {channel.reps}'
+            if channel.current_hold():
+                text += f'  Hold: {channel.current_hold():.1f} s'
+            cv2.putText(frame, text, (10, frame.shape[0] - 15), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2, cv2.LINE_AA)
+
     def is_file_open(self, file_path):
+        import psutil
         try:
             file_descriptor = os.open(file_path, os.O_RDWR)
             process_info = psutil.Process(psutil.Process().pid).open_files()[file_descriptor]
@@ -186,13 +449,32 @@ class PoseEstimatorMP:
             return False
 
     def show_error_message(self, title, message):
+        from PyQt5.QtWidgets import QMessageBox
         msg_box = QMessageBox()
         msg_box.setIcon(QMessageBox.Critical)
         msg_box.setWindowTitle(title)
         msg_box.setText(message)
         msg_box.exec_()
 
+    def save_data(self, file_path):
+        if self.writer is not None:
+            # Samples are already on disk, only the last batch is flushed before the rename
+            self.writer.finalize(file_path)
+            self.saved_rows = self.writer.rows_written
+            self.writer = None
+        else:
+            write_data_csv(file_path, self.data)
+            self.saved_rows = len(self.data)
+        if self.landmark_log is not None:
+            self.landmark_log.save(landmark_log_path(file_path))
+        if self.quality_controller is not None:
+            self.quality_controller.save(quality_log_path(file_path), self.start_time)
+        if self.analytics is not None:
+            self.analytics.save(summary_path(file_path))
+
     def save_data_after_estimation(self):
+        from tkinter import filedialog
+
         if self.save_location:
             default_file_name = os.path.join(self.save_location, "default_name.csv")
         else:
@@ -208,14 +490,9 @@ class PoseEstimatorMP:
 
         if file_path:
             if not self.is_file_open(file_path):  # Check if the file is open
-                with open(file_path, mode='w', newline='') as csv_file:
-                    fieldnames = ['Timestamp', 'Adjusted Distance X', 'Adjusted Distance Y', 'Angle']
-                    writer = csv.writer(csv_file)
-                    writer.writerow(fieldnames)
-
-                    for row in self.data:
-                        timestamp, adjusted_distance_x, adjusted_distance_y, joint_position = row
-                        rounded_row = [round(value, 2) if isinstance(value, (float, int)) else value for value in [timestamp, adjusted_distance_x, adjusted_distance_y, joint_position]]
-                        writer.writerow(rounded_row)
+                self.save_data(file_path)
             else:
                 self.save_data_after_estimation()
+        elif self.writer is not None:
+            self.writer.close()
+            print(f"Motion data kept in {self.writer.csv_path}")
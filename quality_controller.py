@@ -0,0 +1,109 @@
+# quality_controller.py
+# Holds a live session's sample rate when the machine gets busy. The time the
+# inference stage spends on every sampled frame is smoothed (EWMA) and compared
+# with the frame budget, 1 / target rate. A sustained overrun steps down to a
+# cheaper QualityLevel, a sustained margin steps back up (more slowly, so the
+# controller does not oscillate around the limit).
+#
+# Every sample records the level it was produced at in a "Quality Level" column,
+# and save_data writes the levels and every change to <csv>_quality.json.
+import json
+import os
+import time
+
+
+def quality_log_path(csv_path):
+    return os.path.splitext(csv_path)[0] + "_quality.json"
+
+
+class QualityLevel:
+    def __init__(self, model_complexity, inference_size, display_every=1, overlay=True):
+        self.model_complexity = model_complexity  # MediaPipe Pose model, 0 is the lightest
+        self.inference_size = inference_size      # long side of the frames given to the model
+        self.display_every = display_every        # show every n-th frame
+        self.overlay = overlay                    # draw landmarks and stage timings on the frames
+
+    def to_dict(self):
+        return {"model_complexity": self.model_complexity, "inference_size": self.inference_size,
+                "display_every": self.display_every, "overlay": self.overlay}
+
+
+# Level 0 is the default session, each following level is cheaper
+QUALITY_LEVELS = [
+    QualityLevel(1, 640),
+    QualityLevel(1, 480),
+    QualityLevel(0, 480, display_every=2),
+    QualityLevel(0, 320, display_every=2, overlay=False),
+    QualityLevel(0, 256, display_every=3, overlay=False),
+]
+
+
+class QualityController:
+    def __init__(self, target_rate=None, levels=None, smoothing=0.2, headroom=0.9, recover_ratio=0.6, patience=10, cooldown=2.0):
+        self.target_rate = target_rate  # samples per second to hold, set from the camera when None
+        self.levels = levels or QUALITY_LEVELS
+        self.smoothing = smoothing          # EWMA weight of the newest latency
+        self.headroom = headroom            # step down above this share of the frame budget
+        self.recover_ratio = recover_ratio  # step up below this share of the frame budget
+        self.patience = patience            # frames in a row over budget before stepping down
+        self.cooldown = cooldown            # seconds a new level is kept before the next change
+        self.level = 0
+        self.latency = None
+        self.frames_over = 0
+        self.frames_under = 0
+        self.last_change = None
+        self.changes = []
+
+    @property
+    def current(self):
+        return self.levels[self.level]
+
+    def attach(self, pose_estimator):
+        # Adds the "Quality Level" column; before start_streaming/start_publishing, which fix the columns
+        pose_estimator.quality_controller = self
+        pose_estimator.add_quality_column()
+        self.apply(pose_estimator)
+
+    def apply(self, pose_estimator):
+        pose_estimator.set_quality(self.level, self.current.model_complexity, self.current.inference_size)
+
+    def update(self, timestamp, latency):
+        # Latency in seconds of one sampled frame, True when the level changed
+        if not self.target_rate:
+            return False
+        self.latency = latency if self.latency is None else self.latency + self.smoothing * (latency - self.latency)
+        budget = 1 / self.target_rate
+        if self.latency > budget * self.headroom:
+            self.frames_over += 1
+            self.frames_under = 0
+        elif self.latency < budget * self.recover_ratio:
+            self.frames_under += 1
+            self.frames_over = 0
+        else:
+            self.frames_over = self.frames_under = 0
+
+        if self.last_change is not None and timestamp - self.last_change < self.cooldown:
+            return False
+        if self.frames_over >= self.patience and self.level < len(self.levels) - 1:
+            return self.change(timestamp, self.level + 1)
+        if self.frames_under >= 4 * self.patience and self.level > 0:
+            return self.change(timestamp, self.level - 1)
+        return False
+
+    def change(self, timestamp, level):
+        print(f"Quality level {self.level} -> {level} at {self.latency * 1000:.0f} ms per frame "
+              f"(budget {1000 / self.target_rate:.0f} ms): {self.current.to_dict()} -> {self.levels[level].to_dict()}")
+        self.changes.append({"timestamp": timestamp, "from": self.level, "to": level, "latency_ms": self.latency * 1000,
+                             "time": time.strftime("%Y-%m-%dT%H:%M:%S")})
+        self.level = level
+        self.last_change = timestamp
+        self.frames_over = self.frames_under = 0
+        return True
+
+    def save(self, path, start_time=None):
+        # Change timestamps are made relative like the sample timestamps when start_time is given
+        changes = [dict(change, timestamp=change["timestamp"] - (start_time or 0)) for change in self.changes]
+        with open(path, "w") as quality_file:
+            json.dump({"target_rate": self.target_rate, "levels": [level.to_dict() for level in self.levels], "changes": changes},
+                      quality_file, indent=2)
+        return path
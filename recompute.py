@@ -0,0 +1,116 @@
+# recompute.py
+# Recomputes a recorded session from its landmark log (<csv>_landmarks.npz) with a
+# different reference scale, origin or joint choice, in one NumPy pass:
+#   python recompute.py session_landmarks.npz --scale 0.04 --output session_fixed.csv
+#   python recompute.py session_landmarks.npz --joint ALL_JOINTS --reference-distance 100 --reference-percentage 22.5
+# The samples are recomputed from the landmarks smoothed as the session did. The
+# One-Euro filter can be run again on the raw landmarks, with the session's settings
+# or others (about 10k samples per second, the pass itself does millions):
+#   python recompute.py session_landmarks.npz --refilter --min-cutoff 0.5 --beta 10 --output smoother.csv
+#   python recompute.py session_landmarks.npz --no-filter --output raw.csv
+import argparse
+
+import numpy as np
+
+from calibration import reference_scale
+from landmark_filter import filter_landmark_sequence
+from landmark_log import load_landmark_log
+from pose_estimator_mp import CSV_FIELDNAMES, write_data_csv
+from sample_store import SampleStore
+from utils import ALL_JOINTS, TRACKED_JOINTS, calculate_angles, joint_index_triples, wide_fieldnames
+
+
+# Samples per NumPy pass, keeps the temporaries in cache instead of one full-size array each
+BLOCK_SIZE = 8192
+
+
+def recompute_matrix(timestamps, landmarks, joints, user_distance, origin=None):
+    # (n, 1 + 3 * len(joints)) rows laid out like the live session writes them:
+    # timestamp, then adjusted distance X, Y and angle per joint.
+    # origin is the normalized (x, y) displacements are measured from, one pair or one
+    # per joint; by default each joint's position in the first sample, like a live session.
+    triples = joint_index_triples(joints)
+    if origin is None:
+        origin = landmarks[0, triples[:, 2], :2] if len(landmarks) else np.zeros((len(joints), 2))
+    origin = np.broadcast_to(np.asarray(origin, dtype=np.float64), (len(joints), 2))
+
+    matrix = np.empty((len(timestamps), 1 + 3 * len(joints)))
+    matrix[:, 0] = timestamps
+    values = matrix[:, 1:].reshape(len(timestamps), len(joints), 3)  # a view into matrix
+    for start in range(0, len(timestamps), BLOCK_SIZE):
+        block = landmarks[start:start + BLOCK_SIZE]
+        vertices = block[:, triples[:, 2], :2].astype(np.float64)
+        values[start:start + BLOCK_SIZE, :, :2] = (user_distance * ((vertices - origin) * 100)) * 100
+        values[start:start + BLOCK_SIZE, :, 2] = calculate_angles(block, triples)
+    return matrix
+
+
+def raw_landmarks(log):
+    # Landmarks of the log before smoothing, logs of sessions without a filter only have those
+    timestamps, landmarks = log.arrays(raw=True)
+    if landmarks is None:
+        if "landmark_filter" not in log.settings or log.settings["landmark_filter"] is not None:
+            raise ValueError("The landmark log holds no unsmoothed landmarks")
+        timestamps, landmarks = log.arrays()
+    return timestamps, landmarks
+
+
+def recompute_store(log, chosen_joint=None, user_distance=None, origin=None, filter_settings=None, smooth=True):
+    # SampleStore of the session in the CSV layout; joint and scale default to the recorded ones.
+    # The logged landmarks are used as the session smoothed them. With filter_settings (a dict,
+    # may be empty) the raw landmarks go through the filter again, with the session's settings
+    # updated with these; smooth=False uses the raw landmarks.
+    chosen_joint = chosen_joint or log.settings.get("chosen_joint", "LEFT_SHOULDER")
+    user_distance = user_distance if user_distance is not None else log.settings.get("user_distance", 100)
+    joints = TRACKED_JOINTS if chosen_joint == ALL_JOINTS else [chosen_joint]
+    fieldnames = wide_fieldnames(joints) if chosen_joint == ALL_JOINTS else CSV_FIELDNAMES
+
+    if not smooth:
+        timestamps, landmarks = raw_landmarks(log)
+    elif filter_settings is not None:
+        timestamps, landmarks = raw_landmarks(log)
+        settings = dict(log.settings.get("landmark_filter") or {})
+        settings.update(filter_settings)
+        landmarks = filter_landmark_sequence(timestamps, landmarks, settings)
+    else:
+        timestamps, landmarks = log.arrays()
+    store = SampleStore(fieldnames, capacity=max(1, len(timestamps)))
+    store.extend(recompute_matrix(timestamps, landmarks, joints, user_distance, origin))
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute a recorded session with a new scale, origin or joint.")
+    parser.add_argument("landmarks", help="Landmark log written next to the session CSV (*_landmarks.npz)")
+    parser.add_argument("--output", required=True, help="CSV file to write")
+    parser.add_argument("--joint", default=None, help="Joint to analyse, or ALL_JOINTS (defaults to the recorded joint)")
+    parser.add_argument("--scale", type=float, default=None, help="Reference scale as sent by the distance picker")
+    parser.add_argument("--reference-distance", type=float, default=None, help="Real length of the reference, e.g. 100 (cm)")
+    parser.add_argument("--reference-percentage", type=float, default=None, help="Length of the reference in percent of the frame diagonal")
+    parser.add_argument("--origin", type=float, nargs=2, default=None, metavar=("X", "Y"),
+                        help="Normalized frame position displacements are measured from (defaults to the first sample)")
+    parser.add_argument("--no-filter", action="store_true", help="Use the landmarks as the model gave them, without smoothing")
+    parser.add_argument("--refilter", action="store_true", help="Smooth the raw landmarks again instead of using the session's smoothing")
+    parser.add_argument("--min-cutoff", type=float, default=None, help="One-Euro minimum cutoff in Hz for --refilter (defaults to the session's)")
+    parser.add_argument("--beta", type=float, default=None, help="One-Euro speed coefficient for --refilter (defaults to the session's)")
+    args = parser.parse_args()
+    if (args.min_cutoff is not None or args.beta is not None) and not args.refilter:
+        parser.error("--min-cutoff and --beta need --refilter")
+    if args.refilter and args.no_filter:
+        parser.error("--refilter and --no-filter cannot be combined")
+
+    user_distance = args.scale
+    if user_distance is None and args.reference_distance is not None and args.reference_percentage:
+        user_distance = reference_scale(args.reference_distance, args.reference_percentage)
+
+    log = load_landmark_log(args.landmarks)
+    filter_settings = None
+    if args.refilter:
+        filter_settings = {name: value for name, value in (("min_cutoff", args.min_cutoff), ("beta", args.beta)) if value is not None}
+    store = recompute_store(log, args.joint, user_distance, args.origin, filter_settings, smooth=not args.no_filter)
+    write_data_csv(args.output, store)
+    print(f"{len(store)} samples written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
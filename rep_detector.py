@@ -0,0 +1,353 @@
+# rep_detector.py
+# Repetitions, range of motion and holds, computed on the live sample stream.
+# Every sample recorded by PoseEstimatorMP goes through MotionAnalytics.update,
+# which keeps one SignalAnalytics per angle and displacement column. All state is
+# constant in size, whatever the session length: running totals, a fixed rolling
+# window and the current candidate extreme, so the summary is ready live and at
+# the end of the session without a second pass over the CSV.
+#
+# Summaries of an existing CSV, e.g. a session recorded before this existed:
+#   python rep_detector.py session.csv
+import argparse
+import collections
+import csv
+import json
+import math
+import os
+
+import numpy as np
+
+PEAK = "peak"
+VALLEY = "valley"
+
+
+def summary_path(csv_path):
+    return os.path.splitext(csv_path)[0] + "_summary.json"
+
+
+# Min, max and mean of the last `window` values: a ring of values for the mean and
+# monotonic deques of (index, value) for the extremes, amortised O(1) per update
+class RollingStats:
+    def __init__(self, window=90):
+        self.window = window
+        self.values = np.zeros(window)
+        self.count = 0
+        self.total = 0.0
+        self.minima = collections.deque()
+        self.maxima = collections.deque()
+
+    def update(self, value):
+        index = self.count
+        slot = index % self.window
+        if index >= self.window:
+            self.total -= self.values[slot]
+        self.values[slot] = value
+        self.total += value
+        self.count += 1
+
+        while self.minima and self.minima[-1][1] >= value:
+            self.minima.pop()
+        self.minima.append((index, value))
+        while self.maxima and self.maxima[-1][1] <= value:
+            self.maxima.pop()
+        self.maxima.append((index, value))
+        oldest = index - self.window
+        if self.minima[0][0] <= oldest:
+            self.minima.popleft()
+        if self.maxima[0][0] <= oldest:
+            self.maxima.popleft()
+
+    def summary(self):
+        if not self.count:
+            return {"min": None, "max": None, "mean": None}
+        return {"min": self.minima[0][1], "max": self.maxima[0][1], "mean": float(self.total / min(self.count, self.window))}
+
+
+# Peaks and valleys with hysteresis: an extreme is only confirmed once the signal has
+# moved `threshold` away from it, so noise smaller than that never makes an extreme.
+# The level the signal starts from is not one: nothing came before it to turn from.
+# It is kept in `origin` when the signal first leaves it, for callers that know
+# better (e.g. the subject rested there).
+class ExtremaDetector:
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.direction = 0  # 1 rising towards a peak, -1 falling towards a valley, 0 not known yet
+        self.candidate = None  # (timestamp, value) of the extreme not confirmed yet
+        self.origin = None  # (PEAK or VALLEY, timestamp, value) of the starting level, set once the signal leaves it
+        self.low = None
+        self.high = None
+
+    def update(self, timestamp, value):
+        # (PEAK or VALLEY, timestamp, value) when an extreme is confirmed, else None
+        if self.direction == 0:
+            if self.low is None or value < self.low[1]:
+                self.low = (timestamp, value)
+            if self.high is None or value > self.high[1]:
+                self.high = (timestamp, value)
+            if value - self.low[1] >= self.threshold:
+                self.direction, self.candidate = 1, (timestamp, value)
+                self.origin = (VALLEY,) + self.low
+            elif self.high[1] - value >= self.threshold:
+                self.direction, self.candidate = -1, (timestamp, value)
+                self.origin = (PEAK,) + self.high
+            return None
+
+        if self.direction == 1:
+            if value >= self.candidate[1]:
+                self.candidate = (timestamp, value)
+            elif self.candidate[1] - value >= self.threshold:
+                event = (PEAK,) + self.candidate
+                self.direction, self.candidate = -1, (timestamp, value)
+                return event
+        else:
+            if value <= self.candidate[1]:
+                self.candidate = (timestamp, value)
+            elif value - self.candidate[1] >= self.threshold:
+                event = (VALLEY,) + self.candidate
+                self.direction, self.candidate = 1, (timestamp, value)
+                return event
+        return None
+
+
+# Running min/max/mean/std (Welford) of a stream
+class RunningStats:
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def update(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def summary(self):
+        if not self.count:
+            return {"count": 0}
+        return {"count": self.count, "min": self.min, "max": self.max, "mean": self.mean,
+                "std": math.sqrt(self.m2 / self.count) if self.count > 1 else 0.0}
+
+
+# One column of the session, e.g. "LEFT_ELBOW Angle".
+# A repetition is one full cycle between two extremes of the kind the movement started
+# from (valley -> peak -> valley for a flexion that starts extended); its range of
+# motion is the distance to the opposite extreme in between. A hold is a stretch of at
+# least min_hold seconds over which the signal, smoothed against landmark jitter
+# (EWMA weight hold_smoothing), stays within +-hold_tolerance.
+# The session's first and last levels only count as extremes when the subject held
+# still there, a recording that starts or stops mid-movement did not turn there.
+class SignalAnalytics:
+    def __init__(self, name, threshold, hold_tolerance, min_hold=1.0, window=90, recent_reps=20, hold_smoothing=0.2):
+        self.name = name
+        self.extrema = ExtremaDetector(threshold)
+        self.rolling = RollingStats(window)
+        self.overall = RunningStats()
+        self.hold_tolerance = hold_tolerance
+        self.min_hold = min_hold
+        self.last_timestamp = None
+        self.finished = False
+
+        self.peaks = 0
+        self.valleys = 0
+        self.rep_start = None  # (kind, timestamp, value) that opened the current repetition
+        self.rep_turn = None   # opposite extreme inside the current repetition
+        self.reps = 0
+        self.range_of_motion = RunningStats()
+        self.rep_duration = RunningStats()
+        self.recent_reps = collections.deque(maxlen=recent_reps)
+
+        self.hold_smoothing = hold_smoothing
+        self.smoothed = None
+        self.hold_start = None
+        self.hold_last = None  # last sample still inside the current hold
+        self.last_rest = None  # (start, end) of the latest hold of at least min_hold
+        self.hold_min = self.hold_max = None
+        self.holds = RunningStats()  # durations
+
+    def update(self, timestamp, value):
+        self.last_timestamp = timestamp
+        self.overall.update(value)
+        self.rolling.update(value)
+        event = self.extrema.update(timestamp, value)
+        if self.extrema.origin is not None:
+            origin, self.extrema.origin = self.extrema.origin, None
+            if self._rested_at(origin[1]):
+                event = origin
+        if event is not None:
+            self._on_extreme(event)
+        self._update_hold(timestamp, value)
+        return event
+
+    def _on_extreme(self, event):
+        kind = event[0]
+        if kind == PEAK:
+            self.peaks += 1
+        else:
+            self.valleys += 1
+
+        if self.rep_start is None:
+            self.rep_start = event
+        elif kind != self.rep_start[0]:
+            self.rep_turn = event
+        elif self.rep_turn is not None:
+            range_of_motion = abs(self.rep_turn[2] - self.rep_start[2])
+            duration = event[1] - self.rep_start[1]
+            self.reps += 1
+            self.range_of_motion.update(range_of_motion)
+            self.rep_duration.update(duration)
+            self.recent_reps.append({"start": self.rep_start[1], "end": event[1], "duration": duration,
+                                     "range_of_motion": range_of_motion, "turn": self.rep_turn[2]})
+            self.rep_start, self.rep_turn = event, None
+
+    def _update_hold(self, timestamp, value):
+        self.smoothed = value if self.smoothed is None else self.smoothed + self.hold_smoothing * (value - self.smoothed)
+        value = self.smoothed
+        if self.hold_start is not None:
+            low, high = min(self.hold_min, value), max(self.hold_max, value)
+            if high - low <= 2 * self.hold_tolerance:
+                self.hold_min, self.hold_max = low, high
+                self.hold_last = timestamp
+                return
+            # This sample broke the hold, it ended at the one before
+            self._close_hold()
+        self.hold_start = self.hold_last = timestamp
+        self.hold_min = self.hold_max = value
+
+    def _close_hold(self):
+        if self.hold_start is not None:
+            duration = self.hold_last - self.hold_start
+            if duration >= self.min_hold:
+                self.holds.update(duration)
+                self.last_rest = (self.hold_start, self.hold_last)
+        self.hold_start = self.hold_last = None
+
+    def _rested_at(self, timestamp):
+        # The smoothed hold can end a little before the raw signal has moved `threshold`
+        if self.current_hold():
+            return True
+        return self.last_rest is not None and self.last_rest[0] <= timestamp <= self.last_rest[1]
+
+    def current_hold(self):
+        # Seconds the signal has been still so far, 0 when it is moving
+        if self.hold_start is None:
+            return 0.0
+        duration = self.hold_last - self.hold_start
+        return duration if duration >= self.min_hold else 0.0
+
+    def finish(self):
+        # End of the session: a level the subject came to rest at is the last extreme
+        if self.finished:
+            return
+        self.finished = True
+        if self.extrema.candidate is not None and self.current_hold():
+            self._on_extreme((PEAK if self.extrema.direction == 1 else VALLEY,) + self.extrema.candidate)
+        self._close_hold()
+
+    def summary(self):
+        holds = self.holds.summary()
+        return {
+            "reps": self.reps,
+            "peaks": self.peaks,
+            "valleys": self.valleys,
+            "range_of_motion": self.range_of_motion.summary(),
+            "rep_duration": self.rep_duration.summary(),
+            "recent_reps": list(self.recent_reps),
+            "holds": holds["count"],
+            "hold_seconds": holds["mean"] * holds["count"] if holds["count"] else 0.0,
+            "longest_hold": holds.get("max", 0.0),
+            "current_hold": self.current_hold(),
+            "rolling": self.rolling.summary(),
+            "overall": self.overall.summary(),
+        }
+
+
+class MotionAnalytics:
+    def __init__(self, fieldnames, angle_threshold=15.0, distance_threshold=5.0, angle_hold_tolerance=3.0, distance_hold_tolerance=1.0,
+                 min_hold=1.0, window=90):
+        # Angles in degrees, distances in the session's adjusted distance unit
+        self.channels = []
+        for index, name in enumerate(fieldnames):
+            if name.endswith("Angle"):
+                self.channels.append((index, SignalAnalytics(name, angle_threshold, angle_hold_tolerance, min_hold, window)))
+            elif "Adjusted Distance" in name:
+                self.channels.append((index, SignalAnalytics(name, distance_threshold, distance_hold_tolerance, min_hold, window)))
+        self.samples = 0
+        self.first_timestamp = None
+        self.last_timestamp = None
+
+    @property
+    def primary(self):
+        # The chosen joint's angle (the first joint's in ALL_JOINTS mode), shown on the frames
+        for _, channel in self.channels:
+            if channel.name.endswith("Angle"):
+                return channel
+        return self.channels[0][1] if self.channels else None
+
+    def update(self, row):
+        timestamp = float(row[0])
+        if self.first_timestamp is None:
+            self.first_timestamp = timestamp
+        self.last_timestamp = timestamp
+        self.samples += 1
+        for index, channel in self.channels:
+            value = float(row[index])
+            if value == value:  # NaN angles of degenerate poses are skipped
+                channel.update(timestamp, value)
+
+    def summary(self):
+        duration = self.last_timestamp - self.first_timestamp if self.samples else 0.0
+        return {"samples": self.samples, "duration": duration, "channels": {channel.name: channel.summary() for _, channel in self.channels}}
+
+    def finish(self):
+        # Once the last sample is in, before the final summary
+        for _, channel in self.channels:
+            channel.finish()
+
+    def save(self, path):
+        self.finish()
+        with open(path, "w") as summary_file:
+            json.dump(self.summary(), summary_file, indent=2)
+        return path
+
+    def print_summary(self):
+        # At the end of the session, also when the summary is not saved
+        self.finish()
+        for name, channel in self.summary()["channels"].items():
+            range_of_motion = channel["range_of_motion"]
+            line = f"{name:>32}: {channel['reps']} reps"
+            if range_of_motion["count"]:
+                line += f", range of motion {range_of_motion['mean']:.1f} (max {range_of_motion['max']:.1f})"
+            if channel["holds"]:
+                line += f", {channel['holds']} holds, longest {channel['longest_hold']:.1f} s"
+            print(line)
+
+
+def analyse_csv(csv_path, **options):
+    with open(csv_path, newline='') as csv_file:
+        reader = csv.reader(csv_file)
+        analytics = MotionAnalytics(next(reader), **options)
+        for row in reader:
+            analytics.update([float(value) if value else math.nan for value in row])
+    return analytics
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count repetitions and holds in a recorded session CSV.")
+    parser.add_argument("csv", help="Session CSV written by the estimator")
+    parser.add_argument("--angle-threshold", type=float, default=15.0, help="Degrees an angle must turn back to make a peak or valley")
+    parser.add_argument("--distance-threshold", type=float, default=5.0, help="Same for the adjusted distances")
+    parser.add_argument("--min-hold", type=float, default=1.0, help="Seconds a joint must stay still to count as a hold")
+    args = parser.parse_args()
+
+    analytics = analyse_csv(args.csv, angle_threshold=args.angle_threshold, distance_threshold=args.distance_threshold, min_hold=args.min_hold)
+    analytics.print_summary()
+    print(f"Summary written to {analytics.save(summary_path(args.csv))}")
+
+
+if __name__ == '__main__':
+    main()
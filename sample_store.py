@@ -0,0 +1,112 @@
+# sample_store.py
+import numpy as np
+
+
+# Samples are kept in one structured NumPy array instead of a list of lists.
+# All columns are float64, so adjusted distances in the hundreds of thousands keep
+# their two decimals: a sample costs 32 bytes instead of roughly 200 for a list of
+# four boxed floats.
+# With ring=True the store keeps only the newest `capacity` samples.
+class SampleStore:
+    def __init__(self, fieldnames, capacity=4096, ring=False, value_dtype=np.float64):
+        self.fieldnames = list(fieldnames)
+        self.dtype = np.dtype([(self.fieldnames[0], np.float64)] + [(name, value_dtype) for name in self.fieldnames[1:]])
+        self.array = np.zeros(capacity, dtype=self.dtype)
+        self.ring = ring
+        self.size = 0
+        self.head = 0  # index of the oldest sample when the ring has wrapped
+
+    def __len__(self):
+        return self.size
+
+    def append(self, row):
+        capacity = len(self.array)
+        if self.size < capacity:
+            self.array[self.size] = tuple(row)
+            self.size += 1
+        elif self.ring:
+            self.array[self.head] = tuple(row)
+            self.head = (self.head + 1) % capacity
+        else:
+            # Grow geometrically so appends stay amortised O(1)
+            grown = np.zeros(capacity * 2, dtype=self.dtype)
+            grown[:capacity] = self.array
+            self.array = grown
+            self.array[self.size] = tuple(row)
+            self.size += 1
+
+    def extend(self, matrix):
+        # Append many samples at once from a 2D array with one column per field
+        matrix = np.asarray(matrix)
+        if self.ring:
+            for row in matrix[-len(self.array):]:
+                self.append(row)
+            return
+        needed = self.size + len(matrix)
+        if needed > len(self.array):
+            grown = np.zeros(max(needed, len(self.array) * 2), dtype=self.dtype)
+            grown[:self.size] = self.array[:self.size]
+            self.array = grown
+        for i, name in enumerate(self.fieldnames):
+            self.array[name][self.size:needed] = matrix[:, i]
+        self.size = needed
+
+    def clear(self):
+        self.size = 0
+        self.head = 0
+
+    def samples(self):
+        # Samples in time order, a view unless the ring buffer has wrapped
+        if self.head == 0:
+            return self.array[:self.size]
+        return np.concatenate((self.array[self.head:], self.array[:self.head]))
+
+    def column(self, name):
+        return self.samples()[name]
+
+    def window(self, start_time, end_time):
+        samples = self.samples()
+        timestamps = samples[self.fieldnames[0]]
+        first, last = np.searchsorted(timestamps, [start_time, end_time], side='left')
+        return samples[first:last]
+
+    def latest(self, seconds):
+        if not self.size:
+            return self.samples()
+        end_time = self.column(self.fieldnames[0])[-1]
+        return self.window(end_time - seconds, np.inf)
+
+    def to_matrix(self, samples=None):
+        # 2D float64 array with one column per field
+        if samples is None:
+            samples = self.samples()
+        matrix = np.empty((len(samples), len(self.fieldnames)), dtype=np.float64)
+        for i, name in enumerate(self.fieldnames):
+            matrix[:, i] = samples[name]
+        return matrix
+
+    def rounded(self, decimals=2):
+        return np.round(self.to_matrix(), decimals)
+
+    def velocities(self):
+        # d(value)/dt for every value column, same shape as to_matrix() minus the timestamp column
+        matrix = self.to_matrix()
+        if len(matrix) < 2:
+            return np.zeros((len(matrix), len(self.fieldnames) - 1))
+        return np.gradient(matrix[:, 1:], matrix[:, 0], axis=0)
+
+    def smoothed(self, window=5):
+        # Centred moving average of the value columns using cumulative sums
+        matrix = self.to_matrix()
+        values = matrix[:, 1:]
+        if window <= 1 or len(values) == 0:
+            return values
+        cumulative = np.cumsum(np.vstack((np.zeros((1, values.shape[1])), values)), axis=0)
+        half = window // 2
+        index = np.arange(len(values))
+        lower = np.clip(index - half, 0, len(values))
+        upper = np.clip(index + half + 1, 0, len(values))
+        return (cumulative[upper] - cumulative[lower]) / (upper - lower)[:, None]
+
+    def nbytes(self):
+        return self.array.nbytes
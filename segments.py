@@ -0,0 +1,142 @@
+# segments.py
+# Parts of a long recording to analyse, by time or frame index:
+#   "1:30-2:00"   one minute thirty to two minutes
+#   "95.5-120"    seconds
+#   "f2700-f3600" frame indices (end excluded)
+#   "45:00-"      from 45 minutes to the end of the file
+import cv2
+
+SECONDS = "seconds"
+FRAMES = "frames"
+
+
+def parse_time(text):
+    # "90", "90.5", "1:30" or "1:02:03.5" -> seconds
+    seconds = 0.0
+    for part in text.split(":"):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+class Segment:
+    def __init__(self, start, end=None, unit=SECONDS):
+        self.start = start
+        self.end = end  # None means to the end of the file
+        self.unit = unit
+
+    def __repr__(self):
+        return f"Segment({self.start}, {self.end}, {self.unit!r})"
+
+    def frame_range(self, fps, frame_count=None):
+        # (first frame, frame after the last), for code that works on frame indices
+        if self.unit == FRAMES:
+            first, stop = int(self.start), self.end
+        else:
+            first, stop = int(round(self.start * fps)), None if self.end is None else int(round(self.end * fps))
+        if stop is None or (frame_count is not None and stop > frame_count):
+            stop = frame_count
+        return first, stop
+
+    def position(self, frame_index, timestamp):
+        # Where a frame is, in this segment's unit
+        return frame_index if self.unit == FRAMES else timestamp
+
+
+def parse_segment(text):
+    start, separator, end = text.strip().partition("-")
+    if not separator:
+        raise ValueError(f"Segment {text!r} needs a start and an end, e.g. 1:30-2:00")
+    start, end = start.strip(), end.strip()
+    if start.lower().startswith("f"):
+        if end and not end.lower().startswith("f"):
+            raise ValueError(f"Segment {text!r} mixes frames and time")
+        return Segment(int(start[1:]), int(end[1:]) if end else None, FRAMES)
+    return Segment(parse_time(start), parse_time(end) if end else None, SECONDS)
+
+
+def parse_segments(texts):
+    # Accepts a list of segment strings or one comma separated string
+    if isinstance(texts, str):
+        texts = texts.split(",")
+    return [parse_segment(text) for text in texts if text.strip()]
+
+
+def frames_in_segments(frames, segments, fps):
+    if not segments:
+        return frames
+    ranges = [segment.frame_range(fps) for segment in segments]
+    return [frame for frame in frames if any(first <= frame and (stop is None or frame < stop) for first, stop in ranges)]
+
+
+# Reads only the given segments of a video file. Between segments the decoder seeks
+# (OpenCV goes to the preceding keyframe and decodes forward to the target) instead
+# of decoding everything in between; one VideoCapture serves every segment.
+# Frames come out like ThreadedVideoCapture.read_timestamped: frame, position in the
+# file in seconds and the frame's index in the file.
+class SegmentCapture:
+    def __init__(self, source, segments):
+        self.cap = cv2.VideoCapture(source)
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.segments = sorted(segments, key=lambda segment: segment.frame_range(self.fps)[0])
+        self.segment_index = -1
+        self.segment = None
+        self.opened = self.cap.isOpened()
+        self.seeks = 0
+        if self.opened:
+            self._next_segment()
+
+    def _next_segment(self):
+        # Moves on to the next segment, True when that needed a seek
+        self.segment_index += 1
+        if self.segment_index >= len(self.segments):
+            self.segment = None
+            self.opened = False
+            return False
+        self.segment = self.segments[self.segment_index]
+
+        first, _ = self.segment.frame_range(self.fps)
+        if first <= int(self.cap.get(cv2.CAP_PROP_POS_FRAMES)):
+            return False  # overlapping or adjoining segments just keep reading
+        if self.segment.unit == FRAMES:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, first)
+        else:
+            self.cap.set(cv2.CAP_PROP_POS_MSEC, self.segment.start * 1000)
+        self.seeks += 1
+        return True
+
+    def read_timestamped(self, timeout=None):
+        while self.segment is not None:
+            if not self.cap.grab():
+                self.segment = None
+                self.opened = False
+                break
+            index = int(self.cap.get(cv2.CAP_PROP_POS_FRAMES)) - 1
+            timestamp = self.cap.get(cv2.CAP_PROP_POS_MSEC) / 1000
+
+            seeked = False
+            while self.segment is not None and self.segment.end is not None and self.segment.position(index, timestamp) >= self.segment.end:
+                seeked = self._next_segment()
+                if seeked:
+                    break
+            if self.segment is None or seeked:
+                continue  # the grabbed frame is behind the seek
+            if self.segment.position(index, timestamp) < self.segment.start:
+                continue  # the seek landed early, decode forward to the segment start
+
+            ret, frame = self.cap.retrieve()
+            if ret:
+                return True, frame, timestamp, index
+        return False, None, None, None
+
+    def isOpened(self):
+        return self.opened
+
+    def get(self, prop):
+        return self.cap.get(prop)
+
+    def set(self, prop, value):
+        return self.cap.set(prop, value)
+
+    def release(self):
+        self.opened = False
+        self.cap.release()
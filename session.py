@@ -0,0 +1,251 @@
+# session.py
+# Library entry point: runs an estimation session without any GUI toolkit.
+import time
+
+import cv2
+
+from frame_scheduler import FrameScheduler
+from instrumentation import Profiler
+from pipeline import FramePipeline, DROP_LATEST, DROP_NEVER
+from pose_backends import MediaPipeSolutionBackend
+from pose_estimator_mp import PoseEstimatorMP, warm_up_pose_model
+from quality_controller import QualityController
+from segments import SegmentCapture
+from spool import SpoolCapture, is_spool
+from utils import draw_landmark_array
+from video_capture import ThreadedVideoCapture, is_live_source
+
+
+def parse_source(source):
+    # "0" -> camera index 0, anything else is a video path
+    if isinstance(source, str) and source.isdigit():
+        return int(source)
+    return source
+
+
+# Plain OpenCV window for headless tools that still want to watch the session
+class OpenCVDisplay:
+    def __init__(self, window_name='Pose Landmarker'):
+        self.window_name = window_name
+
+    def show(self, frame):
+        cv2.imshow(self.window_name, frame)
+        return not (cv2.waitKey(1) & 0xFF == 27)  # 'Esc' key
+
+    def close(self):
+        cv2.destroyWindow(self.window_name)
+
+
+# One estimation run over a camera or video file.
+# display is any object with show(frame) -> bool and close(); without one the
+# render stage does nothing and the session runs headless.
+class EstimationSession:
+    def __init__(self, pose_estimator, source, drop_policy=None, landmark_cache=None, display=None, max_duration=None, host_clock=False,
+                 overlay=False, segments=None, quality=None):
+        self.pose_estimator = pose_estimator
+        self.source = source
+        self.live = is_live_source(source)
+        # Live cameras should never fall behind, recorded files must not lose frames
+        self.drop_policy = drop_policy or (DROP_LATEST if self.live else DROP_NEVER)
+        self.landmark_cache = landmark_cache
+        self.display = display
+        self.max_duration = max_duration
+        # Time camera frames with time.monotonic() even when the camera has its own clock
+        self.host_clock = host_clock
+        # Draw pose_estimator.profiler's live stage timings on the displayed frames
+        self.overlay = overlay
+        # Only these parts of a video file are decoded, see segments.py
+        self.segments = segments if segments and not self.live and not is_spool(source) else None
+        if self.segments and pose_estimator.start_time is None:
+            # Timestamps stay positions in the file, the segments can be found again in the video
+            pose_estimator.start_time = 0.0
+        # QualityController trading model, resolution and display cost for a steady rate, live sources only
+        self.quality = quality if self.live else None
+        self.pipeline = None
+        self.stopped = False
+
+    def open_capture(self):
+        # Cameras are read by a grabber thread that only keeps the newest frame
+        if is_spool(self.source):
+            return SpoolCapture(self.source)
+        if self.segments:
+            return SegmentCapture(self.source, self.segments)
+        if not self.live:
+            return cv2.VideoCapture(self.source)
+        return ThreadedVideoCapture(self.source, device_clock=False if self.host_clock else None)
+
+    def open_cache_entry(self, cap):
+        # Recorded files reuse the landmarks of earlier runs over the same video
+        if self.landmark_cache is None or self.live or not cap.isOpened():
+            return None
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if frame_count <= 0:
+            return None
+        return self.landmark_cache.open(self.source, self.pose_estimator.model_settings(), frame_count, cap.get(cv2.CAP_PROP_FPS))
+
+    def run(self):
+        pose_estimator = self.pose_estimator
+        cap = self.open_capture()
+        if not cap.isOpened():
+            raise ValueError(f"Error opening video source: {self.source}")
+
+        # Decides before inference whether a frame becomes a sample
+        scheduler = FrameScheduler(pose_estimator.data_points_per_second)
+        cache_entry = self.open_cache_entry(cap)
+        if cache_entry is None and self.display is None:
+            pose_estimator.convert_needed_landmarks_only()
+        last_landmarks = [None]
+        first_capture = [None]
+        rendered = [0]
+        profiler = pose_estimator.profiler
+        quality = self.quality
+        if quality is not None:
+            self.prepare_quality(quality, cap)
+
+        def infer(packet):
+            chosen_joint = pose_estimator.chosen_joint
+            if scheduler.should_sample(packet.captured_at):
+                sample_start = time.perf_counter()
+                hit, landmarks = False, None
+                if cache_entry is not None:
+                    start = profiler.clock()
+                    hit, landmarks = cache_entry.get(packet.index)
+                    profiler.record("cache_lookup", start)
+                if not hit:
+                    # Cropped and downscaled inference, landmarks come back in full-frame coordinates
+                    landmarks = pose_estimator.infer_landmarks(packet.frame, packet.captured_at)
+                    if cache_entry is not None:
+                        cache_entry.put(packet.index, landmarks)
+
+                # Samples are timed by when the frame was captured
+                pose_estimator.process_landmark_array(packet.frame, chosen_joint, landmarks, packet.captured_at)
+                last_landmarks[0] = landmarks
+                if quality is not None and quality.update(packet.captured_at, time.perf_counter() - sample_start):
+                    quality.apply(pose_estimator)
+                    profiler.set_counter("quality level", quality.level)
+            else:
+                # Display-only frame, reuse the last landmarks instead of running the model
+                pose_estimator.annotate_frame(packet.frame, chosen_joint)
+
+            packet.landmarks = last_landmarks[0]
+
+        def render(packet):
+            if self.stopped:
+                return False
+            if self.max_duration is not None:
+                if first_capture[0] is None:
+                    first_capture[0] = packet.captured_at
+                if packet.captured_at - first_capture[0] >= self.max_duration:
+                    return False
+
+            if self.display is None:
+                return True
+
+            level = quality.current if quality is not None else None
+            rendered[0] += 1
+            if level is not None and rendered[0] % level.display_every:
+                return True  # display rate lowered by the quality controller
+            overlay = level is None or level.overlay
+
+            # Draw the landmarks on the frame
+            start = profiler.clock()
+            if packet.landmarks is not None and overlay:
+                draw_landmark_array(packet.frame, packet.landmarks)
+            profiler.record("draw_landmarks", start)
+
+            if self.overlay and overlay and profiler.enabled:
+                self.update_counters(profiler)
+                profiler.draw_overlay(packet.frame)
+
+            start = profiler.clock()
+            keep_going = self.display.show(packet.frame)
+            profiler.record("display", start)
+            return keep_going
+
+        self.pipeline = FramePipeline(cap, infer, self.drop_policy, live=self.live)
+        try:
+            self.pipeline.run(render)
+        finally:
+            cap.release()
+            if self.display is not None:
+                self.display.close()
+            if cache_entry is not None:
+                cache_entry.flush()
+            if profiler.enabled:
+                self.update_counters(profiler)
+
+        return self.pipeline.report()
+
+    def prepare_quality(self, quality, cap):
+        if not quality.target_rate:
+            quality.target_rate = self.pose_estimator.data_points_per_second or cap.get(cv2.CAP_PROP_FPS) or 30.0
+        pose_estimator = self.pose_estimator
+        if pose_estimator.shared_model and pose_estimator.backend == MediaPipeSolutionBackend.name:
+            # Load the graphs of the other levels now, not when the machine is already too slow
+            for model_complexity in sorted({level.model_complexity for level in quality.levels}):
+                warm_up_pose_model(model_complexity)
+
+    def update_counters(self, profiler):
+        # Frames lost between the stages, and by the camera grabber before the pipeline saw them
+        profiler.set_counter("captured", self.pipeline.capture_stats.count)
+        profiler.set_counter("dropped before inference", self.pipeline.capture_stats.dropped)
+        profiler.set_counter("dropped before render", self.pipeline.inference_stats.dropped)
+        if isinstance(self.pipeline.cap, ThreadedVideoCapture):
+            profiler.set_counter("dropped by grabber", self.pipeline.cap.dropped)
+
+    def stop(self):
+        # Safe to call from any thread, also before run() has built the pipeline
+        self.stopped = True
+        if self.pipeline is not None:
+            self.pipeline.stop_event.set()
+
+
+def run_session(source, chosen_joint="LEFT_SHOULDER", user_distance=100, data_points_per_second=None, output_path=None,
+                display=None, landmark_cache=None, max_duration=None, publish_channel=None, stats_path=None, overlay=False,
+                keep_landmarks=False, segments=None, backend=None, backend_options=None, adaptive_quality=False, analytics=False):
+    # Runs one session and returns its PoseEstimatorMP; samples are streamed to output_path when given
+    # and published live on the shared-memory channel publish_channel (see metrics_publisher).
+    # stats_path or overlay turn the per-stage profiler on, its statistics are dumped to stats_path as JSON.
+    # keep_landmarks saves the landmarks next to output_path so recompute.py can redo the session.
+    # segments (see segments.parse_segments) limits a video file to those parts.
+    # source can also be a spool recorded by spool.SpoolRecorder, analysed with its recorded capture times.
+    # backend and backend_options pick the pose runtime, see pose_backends.
+    # adaptive_quality lowers model, resolution and display cost of a live camera to hold the sample rate.
+    # analytics counts repetitions and holds while the session runs, see rep_detector.
+    if keep_landmarks and not output_path:
+        raise ValueError("keep_landmarks needs an output_path to save the landmarks next to")
+    pose_estimator = PoseEstimatorMP(chosen_joint, user_distance=user_distance, data_points_per_second=data_points_per_second)
+    if backend:
+        pose_estimator.backend = backend
+        pose_estimator.backend_options = dict(backend_options or {})
+    if stats_path or overlay:
+        pose_estimator.profiler = Profiler(target_rate=data_points_per_second)
+    source = parse_source(source)
+    quality = None
+    if adaptive_quality and is_live_source(source):
+        quality = QualityController(data_points_per_second)
+        quality.attach(pose_estimator)
+    if analytics:
+        pose_estimator.start_analytics()
+    if output_path:
+        pose_estimator.start_streaming(output_path)
+    if publish_channel:
+        pose_estimator.start_publishing(publish_channel)
+    if keep_landmarks:
+        pose_estimator.keep_landmarks()
+
+    session = EstimationSession(pose_estimator, source, landmark_cache=landmark_cache, display=display, max_duration=max_duration,
+                                overlay=overlay, segments=segments, quality=quality)
+    try:
+        session.run()
+    except KeyboardInterrupt:
+        pass  # Ctrl+C ends a live session, the samples so far are still saved
+    finally:
+        pose_estimator.stop_publishing()
+        if output_path:
+            pose_estimator.save_data(output_path)
+        if stats_path:
+            pose_estimator.profiler.dump(stats_path)
+
+    pose_estimator.session_report = session.pipeline.report() if session.pipeline is not None else []
+    return pose_estimator
@@ -0,0 +1,136 @@
+# session_manager.py
+# Runs several cameras or video files at once, e.g. one subject filmed from several angles.
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pose_estimator_mp import PoseEstimatorMP
+from quality_controller import QualityController
+from session import EstimationSession, parse_source
+from video_capture import is_live_source
+
+
+# One camera or video file of a multi-source session, with its own reference
+# scale (as sent by PointSelectorApp for that camera) and its own output file
+class SessionSource:
+    def __init__(self, source, chosen_joint="LEFT_SHOULDER", user_distance=100, output_path=None, data_points_per_second=None, display=None):
+        self.source = parse_source(source)
+        self.chosen_joint = chosen_joint
+        self.user_distance = user_distance
+        self.output_path = output_path
+        self.data_points_per_second = data_points_per_second
+        self.display = display
+        self.pose_estimator = None
+        self.session = None
+        self.report = []
+        self.error = None
+
+    @property
+    def name(self):
+        return f"Device {self.source}" if is_live_source(self.source) else os.path.basename(self.source)
+
+
+# Every source gets its own PoseEstimatorMP, pose graph and writer, and its session
+# runs on a worker of a shared pool (capture and inference keep their own threads
+# inside each session, MediaPipe releases the GIL while it runs). Camera frames are
+# all timed with the host's monotonic clock from one common start, so rows of
+# different cameras with the same Timestamp were captured at the same moment. That
+# only holds while every camera has a worker of its own, a smaller pool is rejected.
+class SessionManager:
+    def __init__(self, sources=None, workers=None, landmark_cache=None, max_duration=None, backend=None, backend_options=None,
+                 keep_landmarks=False, analytics=False, adaptive_quality=False):
+        self.sources = []
+        # Pose runtime every source uses, see pose_backends
+        self.backend = backend
+        self.backend_options = dict(backend_options or {})
+        # Same as in session.run_session, applied to every source
+        self.keep_landmarks = keep_landmarks
+        self.analytics = analytics
+        self.adaptive_quality = adaptive_quality
+        self.workers = workers
+        self.landmark_cache = landmark_cache
+        self.max_duration = max_duration
+        self.start_time = None
+        for source in sources or []:
+            self.add_source(source)
+
+    def add_source(self, source, **kwargs):
+        session_source = source if isinstance(source, SessionSource) else SessionSource(source, **kwargs)
+        if self.keep_landmarks and not session_source.output_path:
+            raise ValueError(f"{session_source.name}: keep_landmarks needs an output_path to save the landmarks next to")
+        self.sources.append(session_source)
+        return session_source
+
+    def prepare(self, session_source):
+        pose_estimator = PoseEstimatorMP(session_source.chosen_joint, user_distance=session_source.user_distance,
+                                         data_points_per_second=session_source.data_points_per_second)
+        pose_estimator.shared_model = False
+        if self.backend:
+            pose_estimator.backend = self.backend
+            pose_estimator.backend_options = dict(self.backend_options)
+        live = is_live_source(session_source.source)
+        if live:
+            # Common time origin, process_landmark_array only sets start_time when it is missing
+            pose_estimator.start_time = self.start_time
+        quality = None
+        if self.adaptive_quality and live:
+            quality = QualityController(session_source.data_points_per_second)
+            quality.attach(pose_estimator)
+        if self.analytics:
+            pose_estimator.start_analytics()
+        if session_source.output_path:
+            pose_estimator.start_streaming(session_source.output_path)
+        if self.keep_landmarks:
+            pose_estimator.keep_landmarks()
+
+        session_source.pose_estimator = pose_estimator
+        session_source.session = EstimationSession(pose_estimator, session_source.source,
+                                                   landmark_cache=None if live else self.landmark_cache,
+                                                   display=session_source.display, max_duration=self.max_duration,
+                                                   host_clock=True, quality=quality)
+
+    def run_source(self, session_source):
+        try:
+            session_source.report = session_source.session.run()
+        except Exception as e:
+            # One failing camera does not end the others
+            session_source.error = e
+            print(f"{session_source.name}: {e}")
+        finally:
+            if session_source.output_path:
+                session_source.pose_estimator.save_data(session_source.output_path)
+            session_source.pose_estimator.close_pose_model()
+
+    def live_sources(self):
+        return [session_source for session_source in self.sources if is_live_source(session_source.source)]
+
+    def run(self):
+        live_count = len(self.live_sources())
+        if self.workers and self.workers < live_count:
+            # A camera waiting for a worker would be stamped against a start it did not capture from
+            raise ValueError(f"{live_count} live cameras need at least {live_count} workers, got {self.workers}")
+        self.start_time = time.monotonic()
+        for session_source in self.sources:
+            self.prepare(session_source)
+
+        pool = ThreadPoolExecutor(max_workers=self.workers or len(self.sources), thread_name_prefix="source")
+        try:
+            for future in [pool.submit(self.run_source, session_source) for session_source in self.sources]:
+                future.result()
+        except KeyboardInterrupt:
+            # Ctrl+C ends every source, the samples so far are still saved
+            self.stop()
+        finally:
+            pool.shutdown(wait=True)
+        return self.sources
+
+    def stop(self):
+        for session_source in self.sources:
+            if session_source.session is not None:
+                session_source.session.stop()
+
+    def print_report(self):
+        for session_source in self.sources:
+            print(session_source.name)
+            for stage in session_source.report:
+                print(f"{stage['stage']:>10}: {stage['frames']} frames, {stage['fps']:.1f} FPS, {stage['mean_ms']:.1f} ms/frame")
@@ -0,0 +1,250 @@
+# spool.py
+# Record now, analyse later. A SpoolRecorder writes every camera frame with its
+# capture time to a spool file and runs no pose inference, so slow machines still
+# keep the full frame rate; the spool is analysed afterwards like a video file,
+# as fast as the machine allows:
+#   python cli_mp.py 0 --spool-to session.spool --duration 600
+#   python cli_mp.py session.spool --joint LEFT_ELBOW --scale 0.05 --output session.csv
+#
+# File layout: SPOOL_MAGIC, then one record per frame, a RECORD_HEADER (capture
+# time in seconds, JPEG size in bytes) followed by the JPEG bytes. There is no
+# separate index, the reader rebuilds it from the record headers, so a spool cut
+# short by a crash or a full disk is still readable up to its last whole frame.
+import os
+import queue
+import struct
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from video_capture import read_timestamped
+
+SPOOL_EXTENSION = ".spool"
+SPOOL_MAGIC = b"POSESPL1"
+RECORD_HEADER = struct.Struct("<dI")
+
+_END = object()  # tells the encoder thread to finish
+
+
+def is_spool(source):
+    return isinstance(source, str) and source.lower().endswith(SPOOL_EXTENSION)
+
+
+# Encodes and writes frames on its own thread. write() never blocks the caller:
+# when the encoder falls `queue_size` frames behind, further frames are counted
+# as dropped instead of stalling the camera.
+class SpoolWriter:
+    def __init__(self, path, quality=90, queue_size=256):
+        self.path = path
+        self.params = [cv2.IMWRITE_JPEG_QUALITY, int(quality)]
+        self.file = open(path, "wb")
+        self.file.write(SPOOL_MAGIC)
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.written = 0
+        self.dropped = 0
+        self.bytes_written = len(SPOOL_MAGIC)
+        self.error = None
+        self.thread = threading.Thread(target=self._encode_loop, name="spool-encoder", daemon=True)
+        self.thread.start()
+
+    def write(self, frame, timestamp):
+        try:
+            self.queue.put_nowait((frame, timestamp))
+        except queue.Full:
+            self.dropped += 1
+
+    def _encode_loop(self):
+        try:
+            while True:
+                item = self.queue.get()
+                if item is _END:
+                    break
+                frame, timestamp = item
+                ok, encoded = cv2.imencode(".jpg", frame, self.params)
+                if not ok:
+                    self.dropped += 1
+                    continue
+                self.file.write(RECORD_HEADER.pack(timestamp, len(encoded)))
+                self.file.write(encoded.data)
+                self.written += 1
+                self.bytes_written += RECORD_HEADER.size + len(encoded)
+        except Exception as e:
+            self.error = e
+            # Keep emptying the queue so close() can still hand over the end marker
+            while self.queue.get() is not _END:
+                pass
+
+    def close(self):
+        self.queue.put(_END)
+        self.thread.join()
+        self.file.close()
+        if self.error is not None:
+            raise self.error
+
+
+# Capture-only session: camera -> SpoolWriter, with the same run()/stop() interface
+# as EstimationSession. display (show(frame) -> bool and close()) is optional and is
+# only given every `display_every`-th frame so that watching costs little.
+class SpoolRecorder:
+    def __init__(self, source, path, display=None, max_duration=None, quality=90, display_every=2):
+        self.source = source
+        self.path = path
+        self.display = display
+        self.max_duration = max_duration
+        self.quality = quality
+        self.display_every = max(1, display_every)
+        self.stopped = False
+        self.frames = 0
+        self.elapsed = 0.0
+        self.writer = None
+
+    def run(self):
+        cap = cv2.VideoCapture(self.source)
+        if not cap.isOpened():
+            raise ValueError(f"Error opening video source: {self.source}")
+
+        self.writer = SpoolWriter(self.path, self.quality)
+        start = time.perf_counter()
+        first_capture = None
+        try:
+            while not self.stopped:
+                # Timed right after grab(), like a live EstimationSession
+                ret, frame, timestamp = read_timestamped(cap, live=True)
+                if not ret:
+                    break
+                if first_capture is None:
+                    first_capture = timestamp
+                if self.max_duration is not None and timestamp - first_capture >= self.max_duration:
+                    break
+
+                self.writer.write(frame, timestamp)
+                self.frames += 1
+                if self.display is not None and self.frames % self.display_every == 0:
+                    if not self.display.show(frame):
+                        break
+        finally:
+            self.elapsed = time.perf_counter() - start
+            cap.release()
+            if self.display is not None:
+                self.display.close()
+            self.writer.close()
+        return self.report()
+
+    def stop(self):
+        # Safe to call from any thread
+        self.stopped = True
+
+    def report(self):
+        writer = self.writer
+        return {
+            "path": self.path,
+            "frames": self.frames,
+            "written": writer.written if writer else 0,
+            "dropped": writer.dropped if writer else 0,
+            "fps": self.frames / self.elapsed if self.elapsed > 0 else 0.0,
+            "megabytes": writer.bytes_written / 1024 ** 2 if writer else 0.0,
+        }
+
+    def print_report(self):
+        report = self.report()
+        print(f"Spooled {report['written']} of {report['frames']} frames at {report['fps']:.1f} FPS to {report['path']} "
+              f"({report['megabytes']:.1f} MB, {report['dropped']} dropped)")
+
+
+def read_spool_index(path):
+    # (offsets, sizes, timestamps) of every whole JPEG record in the spool
+    offsets, sizes, timestamps = [], [], []
+    file_size = os.path.getsize(path)
+    with open(path, "rb") as spool_file:
+        if spool_file.read(len(SPOOL_MAGIC)) != SPOOL_MAGIC:
+            raise ValueError(f"{path} is not a frame spool")
+        position = len(SPOOL_MAGIC)
+        while position + RECORD_HEADER.size <= file_size:
+            timestamp, size = RECORD_HEADER.unpack(spool_file.read(RECORD_HEADER.size))
+            position += RECORD_HEADER.size
+            if position + size > file_size:
+                break  # cut short while the frame was being written
+            offsets.append(position)
+            sizes.append(size)
+            timestamps.append(timestamp)
+            position += size
+            spool_file.seek(position)
+    return np.array(offsets, dtype=np.int64), np.array(sizes, dtype=np.int64), np.array(timestamps)
+
+
+# Reads a spool like a video file: read_timestamped() returns the frames in order with
+# their recorded capture times, get()/set() answer the cv2.CAP_PROP_* properties the
+# sessions and the landmark cache use, CAP_PROP_POS_FRAMES seeks.
+class SpoolCapture:
+    def __init__(self, path):
+        self.path = path
+        self.offsets, self.sizes, self.timestamps = read_spool_index(path)
+        self.file = open(path, "rb")
+        self.position = 0
+        self.width = self.height = 0
+        if len(self.offsets):
+            first = self._decode(0)
+            if first is not None:
+                self.height, self.width = first.shape[:2]
+
+    def _decode(self, index):
+        self.file.seek(self.offsets[index])
+        data = np.frombuffer(self.file.read(self.sizes[index]), dtype=np.uint8)
+        return cv2.imdecode(data, cv2.IMREAD_COLOR)
+
+    def fps(self):
+        # The rate the camera delivered, not what it advertised
+        if len(self.timestamps) < 2 or self.timestamps[-1] <= self.timestamps[0]:
+            return 30.0
+        return (len(self.timestamps) - 1) / (self.timestamps[-1] - self.timestamps[0])
+
+    def isOpened(self):
+        return self.file is not None and self.position < len(self.offsets)
+
+    def read_timestamped(self, timeout=None):
+        while self.isOpened():
+            index = self.position
+            self.position += 1
+            frame = self._decode(index)
+            if frame is not None:
+                return True, frame, float(self.timestamps[index]), index
+        return False, None, None, None
+
+    def read(self):
+        ret, frame, _, _ = self.read_timestamped()
+        return ret, frame
+
+    def grab(self):
+        if not self.isOpened():
+            return False
+        self.position += 1
+        return True
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return float(len(self.offsets))
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps()
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return float(self.position)
+        if prop == cv2.CAP_PROP_POS_MSEC and len(self.timestamps):
+            index = min(self.position, len(self.timestamps) - 1)
+            return (self.timestamps[index] - self.timestamps[0]) * 1000
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.width)
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.height)
+        return 0.0
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            self.position = int(min(max(value, 0), len(self.offsets)))
+            return True
+        return False
+
+    def release(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
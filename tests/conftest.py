@@ -0,0 +1,6 @@
+# tests/conftest.py
+# The modules live at the top of the repository, next to this folder
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
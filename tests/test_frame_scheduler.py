@@ -0,0 +1,44 @@
+# tests/test_frame_scheduler.py
+import numpy as np
+
+from frame_scheduler import FrameScheduler
+
+
+def sampled(scheduler, timestamps):
+    return [timestamp for timestamp in timestamps if scheduler.should_sample(timestamp)]
+
+
+def test_without_rate_every_frame_is_sampled():
+    scheduler = FrameScheduler()
+    assert sampled(scheduler, np.arange(10) / 30) == list(np.arange(10) / 30)
+    assert scheduler.sampled == 10 and scheduler.skipped == 0
+
+
+def test_samples_on_a_fixed_grid():
+    scheduler = FrameScheduler(10)
+    timestamps = np.arange(90) / 30  # 3 s at 30 FPS
+    assert len(sampled(scheduler, timestamps)) == 30
+    assert scheduler.skipped == 60
+
+
+def test_late_frames_do_not_cause_a_burst():
+    # A 0.5 s stall, then frames resume: one sample, not the five the gap "owed"
+    scheduler = FrameScheduler(10)
+    assert sampled(scheduler, [0.0, 0.1, 0.6, 0.61, 0.65, 0.7]) == [0.0, 0.1, 0.6, 0.7]
+
+
+def test_decision_depends_only_on_the_timestamp():
+    # Two workers starting at different frames of the same file agree on the samples they share
+    timestamps = np.arange(300) / 30
+    whole = sampled(FrameScheduler(7), timestamps)
+    second_half = sampled(FrameScheduler(7), timestamps[150:])
+    assert second_half == [timestamp for timestamp in whole if timestamp >= timestamps[150]]
+
+
+def test_reset_forgets_the_grid():
+    scheduler = FrameScheduler(1)
+    assert scheduler.should_sample(5.0)
+    assert not scheduler.should_sample(5.5)
+    scheduler.reset()
+    assert scheduler.should_sample(0.0)
+    assert scheduler.sampled == 1
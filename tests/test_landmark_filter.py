@@ -0,0 +1,74 @@
+# tests/test_landmark_filter.py
+import numpy as np
+
+from landmark_filter import OneEuroLandmarkFilter, filter_landmark_sequence
+
+
+def pose(x=0.5, y=0.5, visibility=1.0, count=33):
+    return np.column_stack((np.full(count, x), np.full(count, y), np.full(count, visibility)))
+
+
+def test_first_frame_passes_through():
+    landmark_filter = OneEuroLandmarkFilter()
+    landmarks = pose(0.3, 0.7)
+    np.testing.assert_array_equal(landmark_filter.filter(0.0, landmarks), landmarks)
+
+
+def test_jitter_on_a_still_subject_is_smoothed():
+    rng = np.random.default_rng(0)
+    landmark_filter = OneEuroLandmarkFilter()
+    raw, filtered = [], []
+    for index in range(300):
+        landmarks = pose()
+        landmarks[:, :2] += rng.normal(0, 0.003, (33, 2))
+        raw.append(landmarks[:, :2])
+        filtered.append(landmark_filter.filter(index / 30, landmarks)[:, :2])
+    assert np.std(filtered[30:]) < 0.5 * np.std(raw[30:])
+
+
+def test_fast_movement_is_followed():
+    landmark_filter = OneEuroLandmarkFilter()
+    for index in range(60):
+        x = 0.2 + 0.01 * index  # 0.3 frame widths per second
+        out = landmark_filter.filter(index / 30, pose(x))
+    assert abs(out[0, 0] - x) < 0.01
+
+
+def test_visibility_is_kept():
+    landmark_filter = OneEuroLandmarkFilter()
+    landmark_filter.filter(0.0, pose())
+    out = landmark_filter.filter(1 / 30, pose(visibility=0.8))
+    np.testing.assert_array_equal(out[:, 2], 0.8)
+
+
+def test_jumps_and_hidden_landmarks_hold_the_last_position():
+    landmark_filter = OneEuroLandmarkFilter(max_hold=0.5)
+    for index in range(10):
+        landmark_filter.filter(index / 30, pose(0.5))
+    jump = pose(0.5)
+    jump[0, 0] = 0.95  # 13.5 frame widths per second
+    jump[1, 2] = 0.1   # not visible
+    out = landmark_filter.filter(10 / 30, jump)
+    assert landmark_filter.rejected == 1
+    assert abs(out[0, 0] - 0.5) < 1e-6
+    assert abs(out[1, 0] - 0.5) < 1e-6
+
+
+def test_raw_value_comes_back_after_max_hold():
+    landmark_filter = OneEuroLandmarkFilter(max_hold=0.2)
+    landmark_filter.filter(0.0, pose(0.5))
+    hidden = pose(0.9, visibility=0.1)
+    out = landmark_filter.filter(0.1, hidden)
+    assert abs(out[0, 0] - 0.5) < 1e-6
+    out = landmark_filter.filter(0.5, hidden)
+    assert abs(out[0, 0] - 0.9) < 1e-6
+
+
+def test_sequence_matches_the_live_filter_and_its_settings():
+    rng = np.random.default_rng(1)
+    timestamps = np.arange(50) / 30
+    landmarks = pose()[None] + np.concatenate((rng.normal(0, 0.01, (50, 33, 2)), np.zeros((50, 33, 1))), axis=2)
+
+    live = OneEuroLandmarkFilter(min_cutoff=0.5, beta=10.0)
+    expected = np.array([live.filter(timestamp, frame) for timestamp, frame in zip(timestamps, landmarks)])
+    np.testing.assert_array_equal(filter_landmark_sequence(timestamps, landmarks, live.settings()), expected)
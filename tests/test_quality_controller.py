@@ -0,0 +1,130 @@
+# tests/test_quality_controller.py
+import json
+
+import numpy as np
+
+import pose_estimator_mp
+from pose_backends import PoseBackend
+from pose_estimator_mp import PoseEstimatorMP
+from quality_controller import QUALITY_LEVELS, QualityController
+
+
+class FakeBackend(PoseBackend):
+    name = "fake"
+    model_name = "fake"
+
+    def __init__(self, model_complexity):
+        self.model_complexity = model_complexity
+        self.closed = False
+
+    def infer(self, frame, timestamp=None):
+        return None
+
+    def close(self):
+        self.closed = True
+
+
+def own_model_estimator(monkeypatch):
+    # An estimator with its own graphs, created by the fake backend instead of MediaPipe
+    created = []
+
+    def create_pose_model(model_complexity=1, backend=None, backend_options=None):
+        created.append(FakeBackend(model_complexity))
+        return created[-1]
+
+    monkeypatch.setattr(pose_estimator_mp, "create_pose_model", create_pose_model)
+    pose_estimator = PoseEstimatorMP("LEFT_ELBOW")
+    pose_estimator.shared_model = False
+    pose_estimator.infer_landmarks(np.zeros((48, 64, 3), dtype=np.uint8))
+    return pose_estimator, created
+
+
+def feed(controller, start, count, latency, rate=30.0):
+    # count frames at `rate`, returns the timestamps of level changes
+    changes = []
+    for index in range(count):
+        timestamp = start + index / rate
+        if controller.update(timestamp, latency):
+            changes.append(timestamp)
+    return changes
+
+
+def test_without_a_target_rate_nothing_changes():
+    controller = QualityController()
+    assert feed(controller, 0.0, 100, latency=1.0) == []
+    assert controller.level == 0
+
+
+def test_sustained_overload_steps_down_after_patience_and_cooldown():
+    controller = QualityController(target_rate=30, patience=10, cooldown=2.0, smoothing=1.0)
+    changes = feed(controller, 0.0, 150, latency=0.05)  # 50 ms against a 33 ms budget
+    assert changes[0] == 9 / 30  # the tenth frame over budget
+    assert all(later - earlier >= 2.0 for earlier, later in zip(changes, changes[1:]))
+    assert controller.level == len(changes)
+
+
+def test_never_goes_past_the_cheapest_level():
+    controller = QualityController(target_rate=30, patience=1, cooldown=0.0, smoothing=1.0)
+    feed(controller, 0.0, 100, latency=1.0)
+    assert controller.level == len(QUALITY_LEVELS) - 1
+
+
+def test_recovery_is_slower_than_stepping_down():
+    controller = QualityController(target_rate=30, patience=10, cooldown=0.0, smoothing=1.0)
+    feed(controller, 0.0, 10, latency=0.05)
+    assert controller.level == 1
+    assert feed(controller, 1.0, 39, latency=0.001) == []
+    assert feed(controller, 3.0, 1, latency=0.001) == [3.0]
+    assert controller.level == 0
+
+
+def test_latency_inside_the_band_resets_both_counters():
+    controller = QualityController(target_rate=30, patience=10, cooldown=0.0, smoothing=1.0)
+    feed(controller, 0.0, 9, latency=0.05)
+    feed(controller, 1.0, 1, latency=0.025)  # between recover_ratio and headroom of the budget
+    assert feed(controller, 2.0, 9, latency=0.05) == []
+
+
+def test_attach_records_the_level_with_every_sample(tmp_path):
+    pose_estimator = PoseEstimatorMP("LEFT_ELBOW")
+    controller = QualityController(target_rate=30, patience=1, cooldown=0.0, smoothing=1.0)
+    controller.attach(pose_estimator)
+    assert pose_estimator.fieldnames[-1] == "Quality Level"
+    assert pose_estimator.quality_level == 0
+    assert pose_estimator.inference_size == QUALITY_LEVELS[0].inference_size
+
+    controller.update(10.0, 1.0)
+    controller.apply(pose_estimator)
+    assert pose_estimator.quality_level == 1
+    assert pose_estimator.inference_size == QUALITY_LEVELS[1].inference_size
+
+    path = controller.save(str(tmp_path / "quality.json"), start_time=9.0)
+    with open(path) as quality_file:
+        log = json.load(quality_file)
+    assert log["target_rate"] == 30
+    assert [(change["timestamp"], change["from"], change["to"]) for change in log["changes"]] == [(1.0, 0, 1)]
+
+
+def test_set_quality_swaps_in_a_model_loaded_in_the_background(monkeypatch):
+    pose_estimator, created = own_model_estimator(monkeypatch)
+    first = created[0]
+
+    pose_estimator.set_quality(1, 0, 480)
+    pose_estimator._model_loader.join()
+    assert pose_estimator.pose_landmarker is first  # swapped between frames, not by the loader
+    pose_estimator.infer_landmarks(np.zeros((48, 64, 3), dtype=np.uint8))
+    assert [model.model_complexity for model in created] == [1, 0]
+    assert pose_estimator.pose_landmarker is created[1]
+    assert pose_estimator.front_end.model is created[1]
+    assert first.closed
+
+    pose_estimator.close_pose_model()
+    assert created[1].closed
+
+
+def test_set_quality_keeps_the_model_when_the_complexity_is_unchanged(monkeypatch):
+    pose_estimator, created = own_model_estimator(monkeypatch)
+    pose_estimator.set_quality(1, 1, 480)
+    assert pose_estimator._model_loader is None
+    assert len(created) == 1 and not created[0].closed
+    assert pose_estimator.front_end.inference_size == 480
@@ -0,0 +1,124 @@
+# tests/test_rep_detector.py
+import csv
+import json
+
+import numpy as np
+import pytest
+
+from rep_detector import PEAK, VALLEY, ExtremaDetector, MotionAnalytics, RollingStats, RunningStats, SignalAnalytics, analyse_csv
+
+
+def run(values, timestamps, **options):
+    channel = SignalAnalytics("Angle", threshold=15, hold_tolerance=3, **options)
+    for timestamp, value in zip(timestamps, values):
+        channel.update(timestamp, value)
+    channel.finish()
+    return channel.summary()
+
+
+def test_sine_starting_mid_swing_gives_full_range_reps():
+    # 90 +- 40 degrees, 2 s period, 10 cycles from the middle of a swing: 9 full peak-to-peak reps
+    timestamps = np.arange(0, 20, 1 / 30)
+    summary = run(90 + 40 * np.sin(2 * np.pi * timestamps / 2), timestamps)
+    assert summary["reps"] == 9
+    assert summary["range_of_motion"]["min"] == pytest.approx(80, abs=0.1)
+    assert summary["range_of_motion"]["mean"] == pytest.approx(80, abs=0.1)
+    assert summary["rep_duration"]["mean"] == pytest.approx(2, abs=0.05)
+    assert summary["holds"] == 0
+
+
+def test_reps_between_rests_count_the_first_and_last():
+    # 2 s rest, 5 reps of 2 s from the rest level up and back, 2 s rest
+    timestamps = np.arange(0, 14, 1 / 30)
+    moving = (timestamps >= 2) & (timestamps < 12)
+    values = np.where(moving, 90 - 40 * np.cos(2 * np.pi * (timestamps - 2) / 2), 50)
+    summary = run(values, timestamps)
+    assert summary["reps"] == 5
+    assert summary["range_of_motion"]["mean"] == pytest.approx(80, abs=0.1)
+    assert summary["holds"] == 2
+
+
+def test_noise_below_the_threshold_makes_no_extremes():
+    rng = np.random.default_rng(0)
+    timestamps = np.arange(0, 10, 1 / 30)
+    summary = run(90 + rng.uniform(-5, 5, len(timestamps)), timestamps)
+    assert summary["peaks"] == summary["valleys"] == summary["reps"] == 0
+
+
+def test_extrema_need_the_threshold_on_both_sides():
+    detector = ExtremaDetector(10)
+    events = [detector.update(index, value) for index, value in enumerate([50, 55, 62, 70, 65, 59, 40, 45, 51])]
+    assert [event for event in events if event] == [(PEAK, 3, 70), (VALLEY, 6, 40)]
+    assert detector.origin == (VALLEY, 0, 50)  # where it started, not reported as an extreme
+
+
+def test_hold_ends_at_its_last_still_sample():
+    timestamps = np.arange(0, 5, 0.1)
+    values = np.where(timestamps < 2.05, 0.0, 100.0)
+    channel = SignalAnalytics("Angle", threshold=15, hold_tolerance=3, hold_smoothing=1.0)
+    for timestamp, value in zip(timestamps, values):
+        channel.update(timestamp, value)
+    assert channel.holds.count == 1
+    assert channel.holds.max == pytest.approx(2.0)
+    assert channel.current_hold() == pytest.approx(2.8)  # still since 2.1, the first sample at 100
+
+
+def test_short_stillness_is_not_a_hold():
+    timestamps = np.arange(0, 3, 0.1)
+    values = np.where(timestamps < 0.55, 0.0, 50 + 40 * np.sin(timestamps * 7))
+    channel = SignalAnalytics("Angle", threshold=15, hold_tolerance=3, min_hold=1.0, hold_smoothing=1.0)
+    for timestamp, value in zip(timestamps, values):
+        channel.update(timestamp, value)
+    assert channel.holds.count == 0
+
+
+def test_rolling_stats_match_numpy_over_the_window():
+    rng = np.random.default_rng(2)
+    values = rng.normal(size=500)
+    rolling = RollingStats(window=50)
+    for index, value in enumerate(values):
+        rolling.update(value)
+        window = values[max(0, index - 49):index + 1]
+        summary = rolling.summary()
+        assert (summary["min"], summary["max"]) == (window.min(), window.max())
+        assert summary["mean"] == pytest.approx(window.mean())
+
+
+def test_running_stats_match_numpy():
+    values = np.random.default_rng(3).normal(5, 2, 1000)
+    stats = RunningStats()
+    for value in values:
+        stats.update(value)
+    summary = stats.summary()
+    assert summary["mean"] == pytest.approx(values.mean())
+    assert summary["std"] == pytest.approx(values.std())
+    assert (summary["min"], summary["max"]) == (values.min(), values.max())
+
+
+def test_motion_analytics_tracks_angle_and_distance_columns(tmp_path):
+    fieldnames = ['Timestamp', 'LEFT_ELBOW Adjusted Distance X', 'LEFT_ELBOW Adjusted Distance Y', 'LEFT_ELBOW Angle', 'Quality Level']
+    timestamps = np.arange(0, 10, 1 / 30)
+    angles = 90 + 40 * np.sin(2 * np.pi * timestamps / 2)
+    rows = np.column_stack((timestamps, 20 * np.sin(2 * np.pi * timestamps / 2), np.zeros_like(timestamps), angles,
+                            np.zeros_like(timestamps)))
+    rows[5, 3] = np.nan  # degenerate pose
+
+    analytics = MotionAnalytics(fieldnames)
+    assert [channel.name for _, channel in analytics.channels] == fieldnames[1:4]
+    assert analytics.primary.name == 'LEFT_ELBOW Angle'
+    for row in rows:
+        analytics.update(row)
+    path = analytics.save(str(tmp_path / "session_summary.json"))
+    with open(path) as summary_file:
+        summary = json.load(summary_file)
+    assert summary["samples"] == len(rows)
+    assert summary["channels"]['LEFT_ELBOW Angle']["reps"] == 4
+    assert summary["channels"]['LEFT_ELBOW Adjusted Distance X']["reps"] == 4
+
+    csv_path = tmp_path / "session.csv"
+    with open(csv_path, "w", newline="") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(fieldnames)
+        writer.writerows(np.round(rows, 2).tolist())
+    offline = analyse_csv(str(csv_path)).summary()
+    assert offline["channels"]['LEFT_ELBOW Angle']["reps"] == 4
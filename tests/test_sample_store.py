@@ -0,0 +1,84 @@
+# tests/test_sample_store.py
+import numpy as np
+
+from pose_estimator_mp import write_data_csv
+from sample_store import SampleStore
+
+FIELDNAMES = ['Timestamp', 'Adjusted Distance X', 'Adjusted Distance Y', 'Angle']
+
+
+def rows(count, start=0):
+    return [[index / 10, index, -index, 90 + index] for index in range(start, start + count)]
+
+
+def test_append_grows_past_capacity():
+    store = SampleStore(FIELDNAMES, capacity=4)
+    for row in rows(10):
+        store.append(row)
+    assert len(store) == 10
+    np.testing.assert_allclose(store.to_matrix(), rows(10))
+
+
+def test_ring_keeps_the_newest_samples_in_order():
+    store = SampleStore(FIELDNAMES, capacity=4, ring=True)
+    for row in rows(10):
+        store.append(row)
+    assert len(store) == 4
+    np.testing.assert_allclose(store.to_matrix(), rows(4, start=6))
+
+
+def test_extend_matches_append():
+    appended = SampleStore(FIELDNAMES, capacity=2)
+    for row in rows(7):
+        appended.append(row)
+    extended = SampleStore(FIELDNAMES, capacity=2)
+    extended.extend(np.array(rows(3)))
+    extended.extend(np.array(rows(4, start=3)))
+    np.testing.assert_array_equal(extended.to_matrix(), appended.to_matrix())
+
+    ring = SampleStore(FIELDNAMES, capacity=3, ring=True)
+    ring.extend(np.array(rows(7)))
+    np.testing.assert_allclose(ring.to_matrix(), rows(3, start=4))
+
+
+def test_window_and_latest_select_by_timestamp():
+    store = SampleStore(FIELDNAMES)
+    store.extend(np.array(rows(20)))
+    np.testing.assert_allclose(store.window(0.5, 0.8)['Timestamp'], [0.5, 0.6, 0.7])
+    np.testing.assert_allclose(store.latest(0.25)['Timestamp'], [1.7, 1.8, 1.9])
+    assert len(SampleStore(FIELDNAMES).latest(1.0)) == 0
+
+
+def test_timestamps_keep_double_precision():
+    store = SampleStore(FIELDNAMES)
+    store.append([1700000000.123, 1, 2, 3])
+    assert store.column('Timestamp')[0] == 1700000000.123
+
+
+def test_velocities_and_smoothing():
+    store = SampleStore(FIELDNAMES)
+    store.extend(np.array(rows(10)))
+    velocities = store.velocities()
+    assert velocities.shape == (10, 3)
+    np.testing.assert_allclose(velocities, np.tile([10.0, -10.0, 10.0], (10, 1)))
+
+    smoothed = store.smoothed(window=3)
+    # A straight line stays a straight line away from the edges
+    np.testing.assert_allclose(smoothed[1:-1], store.to_matrix()[1:-1, 1:])
+    np.testing.assert_allclose(smoothed[0], [0.5, -0.5, 90.5])
+
+
+def test_clear_empties_the_store():
+    store = SampleStore(FIELDNAMES, capacity=2, ring=True)
+    store.extend(np.array(rows(5)))
+    store.clear()
+    assert len(store) == 0
+    assert store.samples().shape == (0,)
+
+
+def test_large_distances_keep_their_decimals_in_the_csv(tmp_path):
+    store = SampleStore(FIELDNAMES)
+    store.append([1.5, 312345.70, -98765.43, 45.25])
+    csv_path = tmp_path / "motion_data.csv"
+    write_data_csv(str(csv_path), store)
+    assert csv_path.read_text().splitlines()[1] == "1.5,312345.7,-98765.43,45.25"
@@ -0,0 +1,66 @@
+# tests/test_segments.py
+import cv2
+import numpy as np
+import pytest
+
+from segments import FRAMES, SECONDS, SegmentCapture, frames_in_segments, parse_segment, parse_segments, parse_time
+
+
+def test_parse_time():
+    assert parse_time("90") == 90
+    assert parse_time("90.5") == 90.5
+    assert parse_time("1:30") == 90
+    assert parse_time("1:02:03.5") == 3723.5
+
+
+def test_parse_segment_by_time_and_frame():
+    segment = parse_segment(" 1:30 - 2:00 ")
+    assert (segment.start, segment.end, segment.unit) == (90, 120, SECONDS)
+    segment = parse_segment("f2700-f3600")
+    assert (segment.start, segment.end, segment.unit) == (2700, 3600, FRAMES)
+    assert parse_segment("45:00-").end is None
+    assert parse_segment("f10-").end is None
+
+
+@pytest.mark.parametrize("text", ["90", "f10-20", "a-b"])
+def test_bad_segments_are_rejected(text):
+    with pytest.raises(ValueError):
+        parse_segment(text)
+
+
+def test_parse_segments_takes_a_list_or_a_comma_separated_string():
+    assert len(parse_segments(["0-1", "f5-f9"])) == 2
+    assert [segment.start for segment in parse_segments("0-1, 5-6,")] == [0, 5]
+
+
+def test_frame_range():
+    assert parse_segment("1-2").frame_range(30) == (30, 60)
+    assert parse_segment("1-").frame_range(30, frame_count=100) == (30, 100)
+    assert parse_segment("f10-f500").frame_range(30, frame_count=100) == (10, 100)
+
+
+def test_frames_in_segments():
+    frames = list(range(100))
+    assert frames_in_segments(frames, None, 30) == frames
+    assert frames_in_segments(frames, parse_segments("f10-f13,2-2.1"), 30) == [10, 11, 12, 60, 61, 62]
+
+
+def test_segment_capture_reads_only_the_segments(tmp_path):
+    path = str(tmp_path / "clip.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 30, (64, 48))
+    for index in range(120):
+        writer.write(np.full((48, 64, 3), index * 2, dtype=np.uint8))
+    writer.release()
+
+    cap = SegmentCapture(path, parse_segments("f90-f95,f5-f8"))
+    indices = []
+    while True:
+        ret, frame, timestamp, index = cap.read_timestamped()
+        if not ret:
+            break
+        indices.append(index)
+        assert abs(timestamp - index / 30) < 1e-3
+        assert abs(int(frame[0, 0, 0]) - index * 2) <= 4  # JPEG rounding
+    cap.release()
+    assert indices == [5, 6, 7, 90, 91, 92, 93, 94]
+    assert not cap.isOpened()
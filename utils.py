@@ -1,38 +1,139 @@
 #utils.py
+import itertools
+import operator
+import os
+
+import cv2
+import numpy as np
+
+# (joint1, joint2, vertex) used to measure the angle at each joint
+JOINT_COMBINATIONS = {
+    "LEFT_SHOULDER": ("RIGHT_SHOULDER", "LEFT_ELBOW", "LEFT_SHOULDER"),
+    "RIGHT_SHOULDER": ("LEFT_SHOULDER", "RIGHT_ELBOW", "RIGHT_SHOULDER"),
+
+    "LEFT_ELBOW": ("LEFT_SHOULDER", "LEFT_WRIST", "LEFT_ELBOW"),
+    "RIGHT_ELBOW": ("RIGHT_SHOULDER", "RIGHT_WRIST", "RIGHT_ELBOW"),
+
+    "RIGHT_WRIST": ("RIGHT_ELBOW", "RIGHT_INDEX", "RIGHT_WRIST"),
+    "LEFT_WRIST": ("LEFT_ELBOW", "LEFT_INDEX", "LEFT_WRIST"),
+
+    "RIGHT_HIP": ("RIGHT_SHOULDER", "RIGHT_KNEE", "RIGHT_HIP"),
+    "LEFT_HIP": ("LEFT_SHOULDER", "LEFT_KNEE", "LEFT_HIP"),
+
+    "RIGHT_KNEE": ("RIGHT_HIP", "RIGHT_ANKLE", "RIGHT_KNEE"),
+    "LEFT_KNEE": ("LEFT_HIP", "LEFT_ANKLE", "LEFT_KNEE"),
+
+    "RIGHT_ANKLE": ("RIGHT_KNEE", "RIGHT_HEEL", "RIGHT_ANKLE"),
+    "LEFT_ANKLE": ("LEFT_KNEE", "LEFT_HEEL", "LEFT_ANKLE"),
+
+    "SKELETON": ("RIGHT_SHOULDER", "LEFT_ELBOW", "LEFT_SHOULDER"),
+}
+
+# Add more cases for other joints as needed
+DEFAULT_JOINT_COMBINATION = ("LEFT_SHOULDER", "RIGHT_SHOULDER", "LEFT_ELBOW")
+
+
 def get_joint_combinations(chosen_joint):
-    if chosen_joint == "LEFT_SHOULDER":
-        return "RIGHT_SHOULDER", "LEFT_ELBOW", "LEFT_SHOULDER"
-    elif chosen_joint == "RIGHT_SHOULDER":
-        return "LEFT_SHOULDER", "RIGHT_ELBOW", "RIGHT_SHOULDER"
-
-    elif chosen_joint == "LEFT_ELBOW":
-        return "LEFT_SHOULDER", "LEFT_WRIST", "LEFT_ELBOW"
-    elif chosen_joint == "RIGHT_ELBOW":
-        return "RIGHT_SHOULDER", "RIGHT_WRIST", "RIGHT_ELBOW"
-
-    elif chosen_joint == "RIGHT_WRIST":
-        return "RIGHT_ELBOW", "RIGHT_INDEX", "RIGHT_WRIST"
-    elif chosen_joint == "LEFT_WRIST":
-        return "LEFT_ELBOW", "LEFT_INDEX", "LEFT_WRIST"
-    
-    elif chosen_joint == "RIGHT_HIP":
-        return "RIGHT_SHOULDER", "RIGHT_KNEE", "RIGHT_HIP"
-    elif chosen_joint == "LEFT_HIP":
-        return "LEFT_SHOULDER", "LEFT_KNEE", "LEFT_HIP"
-
-    elif chosen_joint == "RIGHT_KNEE":
-        return "RIGHT_HIP", "RIGHT_ANKLE", "RIGHT_KNEE"
-    elif chosen_joint == "LEFT_KNEE":
-        return "LEFT_HIP", "LEFT_ANKLE", "LEFT_KNEE"
-    
-    elif chosen_joint == "RIGHT_ANKLE":
-        return "RIGHT_KNEE", "RIGHT_HEEL", "RIGHT_ANKLE"
-    elif chosen_joint == "LEFT_ANKLE":
-        return "LEFT_KNEE", "LEFT_HEEL", "LEFT_ANKLE"
-    
-    elif chosen_joint == "SKELETON":
-        return "RIGHT_SHOULDER", "LEFT_ELBOW", "LEFT_SHOULDER"
-
-    # Add more cases for other joints as needed
-    else:
-        return "LEFT_SHOULDER", "RIGHT_SHOULDER", "LEFT_ELBOW"
+    return JOINT_COMBINATIONS.get(chosen_joint, DEFAULT_JOINT_COMBINATION)
+
+
+# Landmark order of the MediaPipe/BlazePose 33 point model
+POSE_LANDMARK_NAMES = [
+    "NOSE", "LEFT_EYE_INNER", "LEFT_EYE", "LEFT_EYE_OUTER", "RIGHT_EYE_INNER", "RIGHT_EYE", "RIGHT_EYE_OUTER",
+    "LEFT_EAR", "RIGHT_EAR", "MOUTH_LEFT", "MOUTH_RIGHT",
+    "LEFT_SHOULDER", "RIGHT_SHOULDER", "LEFT_ELBOW", "RIGHT_ELBOW", "LEFT_WRIST", "RIGHT_WRIST",
+    "LEFT_PINKY", "RIGHT_PINKY", "LEFT_INDEX", "RIGHT_INDEX", "LEFT_THUMB", "RIGHT_THUMB",
+    "LEFT_HIP", "RIGHT_HIP", "LEFT_KNEE", "RIGHT_KNEE", "LEFT_ANKLE", "RIGHT_ANKLE",
+    "LEFT_HEEL", "RIGHT_HEEL", "LEFT_FOOT_INDEX", "RIGHT_FOOT_INDEX",
+]
+
+# "ALL_JOINTS" records every joint below from the same inference pass
+ALL_JOINTS = "ALL_JOINTS"
+TRACKED_JOINTS = [
+    "LEFT_SHOULDER", "RIGHT_SHOULDER", "LEFT_ELBOW", "RIGHT_ELBOW", "RIGHT_WRIST", "LEFT_WRIST",
+    "RIGHT_HIP", "LEFT_HIP", "RIGHT_KNEE", "LEFT_KNEE", "RIGHT_ANKLE", "LEFT_ANKLE",
+]
+
+
+def joint_index_triples(joint_names):
+    # (n, 3) landmark indices of (joint1, joint2, vertex) for every joint, resolved once per session
+    return np.array([[POSE_LANDMARK_NAMES.index(name) for name in get_joint_combinations(joint)] for joint in joint_names], dtype=np.intp)
+
+
+def wide_fieldnames(joint_names):
+    fieldnames = ['Timestamp']
+    for joint in joint_names:
+        fieldnames += [f'{joint} Adjusted Distance X', f'{joint} Adjusted Distance Y', f'{joint} Angle']
+    return fieldnames
+
+
+def calculate_angles(landmarks, triples):
+    # Angle at the vertex of every (joint1, joint2, vertex) triple, in degrees.
+    # landmarks is (..., 33, >=2), extra leading axes (e.g. frames) are broadcast.
+    # x and y are handled as separate arrays: reductions over a length-2 axis are
+    # slow in NumPy, and the maths runs in float64 even on float32 landmarks.
+    x = landmarks[..., 0]
+    y = landmarks[..., 1]
+    vertex_x = x[..., triples[:, 2]].astype(np.float64)
+    vertex_y = y[..., triples[:, 2]].astype(np.float64)
+    vector1_x = x[..., triples[:, 0]] - vertex_x
+    vector1_y = y[..., triples[:, 0]] - vertex_y
+    vector2_x = x[..., triples[:, 1]] - vertex_x
+    vector2_y = y[..., triples[:, 1]] - vertex_y
+
+    dot_product = vector1_x * vector2_x + vector1_y * vector2_y
+    magnitudes = np.sqrt((vector1_x * vector1_x + vector1_y * vector1_y) * (vector2_x * vector2_x + vector2_y * vector2_y))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cos_theta = np.clip(dot_product / magnitudes, -1.0, 1.0)
+    return np.degrees(np.arccos(cos_theta))
+
+
+_LANDMARK_VALUES = operator.attrgetter("x", "y", "visibility")
+_NO_LANDMARKS = np.full((len(POSE_LANDMARK_NAMES), 3), np.nan)
+
+
+def landmarks_to_array(pose_landmarks, rows=None):
+    # MediaPipe landmark list -> (33, 3) array of normalized x, y and visibility.
+    # attrgetter and fromiter keep the per-landmark work in C, about a third faster than
+    # np.array over a list of tuples. Reading the attributes is most of the cost, so with
+    # rows (an intp array) only those landmarks are read and the other rows are NaN.
+    landmarks = pose_landmarks.landmark
+    if rows is None:
+        values = itertools.chain.from_iterable(map(_LANDMARK_VALUES, landmarks))
+        return np.fromiter(values, np.float64, 3 * len(landmarks)).reshape(-1, 3)
+    values = itertools.chain.from_iterable(map(_LANDMARK_VALUES, map(landmarks.__getitem__, rows.tolist())))
+    array = _NO_LANDMARKS.copy()
+    array[rows] = np.fromiter(values, np.float64, 3 * len(rows)).reshape(-1, 3)
+    return array
+
+
+# Skeleton edges, same as mp.solutions.pose.POSE_CONNECTIONS without importing MediaPipe to draw
+POSE_CONNECTIONS = [
+    (0, 1), (1, 2), (2, 3), (3, 7), (0, 4), (4, 5), (5, 6), (6, 8), (9, 10),
+    (11, 12), (11, 13), (13, 15), (15, 17), (15, 19), (15, 21), (17, 19),
+    (12, 14), (14, 16), (16, 18), (16, 20), (16, 22), (18, 20),
+    (11, 23), (12, 24), (23, 24), (23, 25), (24, 26), (25, 27), (26, 28),
+    (27, 29), (28, 30), (29, 31), (30, 32), (27, 31), (28, 32),
+]
+
+
+def draw_landmark_array(frame, landmarks, connections=POSE_CONNECTIONS, visibility_threshold=0.5):
+    # Same picture as mp.solutions.drawing_utils.draw_landmarks, from a (33, 3) array
+    height, width = frame.shape[:2]
+    points = {}
+    for index, (x, y, visibility) in enumerate(landmarks):
+        if np.isnan(x) or visibility < visibility_threshold:
+            continue
+        points[index] = (int(x * width), int(y * height))
+    for start, end in connections:
+        if start in points and end in points:
+            cv2.line(frame, points[start], points[end], (224, 224, 224), 2)
+    for point in points.values():
+        cv2.circle(frame, point, 2, (0, 0, 255), 2)
+
+
+def app_data_dir():
+    # Per-user folder for caches and saved settings
+    path = os.path.join(os.path.expanduser("~"), ".motion_capture")
+    os.makedirs(path, exist_ok=True)
+    return path
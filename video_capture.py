@@ -0,0 +1,105 @@
+# video_capture.py
+import threading
+import time
+
+import cv2
+
+
+def is_live_source(source):
+    return isinstance(source, int)
+
+
+def read_timestamped(cap, live):
+    # Grab a frame and return it with its capture time in seconds. Files use their
+    # own presentation time, cameras a monotonic clock read right after grab(),
+    # before any decoding or inference has happened.
+    if not cap.grab():
+        return False, None, None
+    timestamp = time.monotonic() if live else cap.get(cv2.CAP_PROP_POS_MSEC) / 1000
+    ret, frame = cap.retrieve()
+    return ret, frame, timestamp
+
+
+# Grabs camera frames on its own thread and keeps only the newest one, so a slow
+# consumer never reads a frame that has been waiting in a driver or queue buffer.
+# device_clock=None uses the camera's own timestamps when it reports any, False
+# always uses the host's monotonic clock (needed to line several cameras up).
+class ThreadedVideoCapture:
+    def __init__(self, source, device_clock=None):
+        self.source = source
+        self.live = is_live_source(source)
+        self.cap = cv2.VideoCapture(source)
+        self.condition = threading.Condition()
+        self.frame = None
+        self.timestamp = None
+        self.frame_index = -1
+        self.read_index = -1
+        self.dropped = 0
+        self.device_clock = device_clock
+        self.releasing = False
+        self.running = self.cap.isOpened()
+        self.thread = threading.Thread(target=self._grab_loop, name="grabber", daemon=True)
+        if self.running:
+            self.thread.start()
+
+    def _grab_loop(self):
+        try:
+            while self.running:
+                ret = self.cap.grab()
+                if ret:
+                    grabbed_at = time.monotonic()
+                    position = self.cap.get(cv2.CAP_PROP_POS_MSEC) / 1000
+                    if self.device_clock is None:
+                        # Decided on the first frame so that the two clocks are never mixed
+                        self.device_clock = not self.live or position > 0
+                    timestamp = position if self.device_clock else grabbed_at
+                    ret, frame = self.cap.retrieve()
+                with self.condition:
+                    if not ret:
+                        self.running = False
+                        self.condition.notify_all()
+                        break
+                    if self.frame_index > self.read_index:
+                        self.dropped += 1  # the previous frame was never read
+                    self.frame = frame
+                    self.timestamp = timestamp
+                    self.frame_index += 1
+                    self.condition.notify_all()
+        finally:
+            if self.releasing:
+                # release() gave up waiting while grab() was blocked, the capture is closed here instead
+                self.cap.release()
+
+    def isOpened(self):
+        return self.running or self.frame_index > self.read_index
+
+    def read_timestamped(self, timeout=1.0):
+        # Newest frame not returned before, waits up to `timeout` seconds for one
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.frame_index > self.read_index or not self.running, timeout):
+                return False, None, None, None
+            if self.frame_index <= self.read_index:
+                return False, None, None, None
+            self.read_index = self.frame_index
+            return True, self.frame, self.timestamp, self.frame_index
+
+    def read(self, timeout=1.0):
+        ret, frame, _, _ = self.read_timestamped(timeout)
+        return ret, frame
+
+    def get(self, prop):
+        return self.cap.get(prop)
+
+    def set(self, prop, value):
+        return self.cap.set(prop, value)
+
+    def release(self):
+        # The capture is never released while the grabber may still be inside grab()/retrieve():
+        # a camera that hangs past the timeout is released by the grabber when it returns
+        self.releasing = True
+        self.running = False
+        if self.thread.is_alive():
+            self.thread.join(timeout=1.0)
+            if self.thread.is_alive():
+                return
+        self.cap.release()
@@ -0,0 +1,108 @@
+# video_display.py
+import threading
+
+import cv2
+import numpy as np
+from PyQt5.QtCore import QPointF, QRectF, Qt, QTimer
+from PyQt5.QtGui import QColor, QImage, QPainter
+from PyQt5.QtWidgets import QApplication, QWidget
+
+# Qt >= 5.14 reads OpenCV's BGR buffers directly, older versions need one RGB conversion
+BGR_FORMAT = getattr(QImage, 'Format_BGR888', None)
+
+
+def display_refresh_interval(default_hz=60):
+    # Milliseconds between repaints, one per display refresh
+    screen = QApplication.primaryScreen()
+    refresh_rate = screen.refreshRate() if screen is not None else 0
+    return max(1, int(1000 / (refresh_rate if refresh_rate > 0 else default_hz)))
+
+
+def frame_to_qimage(frame):
+    # Wraps the frame's own buffer, the caller keeps `frame` alive while the image is used
+    if BGR_FORMAT is None:
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        image_format = QImage.Format_RGB888
+    else:
+        frame = np.ascontiguousarray(frame)
+        image_format = BGR_FORMAT
+    height, width = frame.shape[:2]
+    return QImage(frame.data, width, height, frame.strides[0], image_format), frame
+
+
+# Shows BGR frames without resizing or copying them: the QImage is built on the
+# frame buffer and Qt scales it while painting. set_frame() may be called from any
+# thread and only stores the newest frame, the widget repaints at most once per
+# display refresh so producers are never held up by drawing.
+class VideoDisplayWidget(QWidget):
+    def __init__(self, parent=None):
+        super(VideoDisplayWidget, self).__init__(parent)
+        self.lock = threading.Lock()
+        self.frame = None
+        self.frame_size = None  # (width, height) of the last frame
+        self.dirty = False
+        self.markers = []  # points in frame pixels, drawn on top of the frame
+        self.marker_radius = 4
+        self.setAttribute(Qt.WA_OpaquePaintEvent)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(display_refresh_interval())
+
+    def set_frame(self, frame):
+        with self.lock:
+            self.frame = frame
+            self.frame_size = (frame.shape[1], frame.shape[0])
+            self.dirty = True
+
+    def set_markers(self, markers):
+        self.markers = list(markers)
+        self.update()
+
+    def refresh(self):
+        if self.dirty:
+            self.update()
+
+    def target_rect(self):
+        # Largest rectangle with the frame's aspect ratio, centred in the widget
+        if self.frame_size is None:
+            return QRectF(self.rect())
+        frame_width, frame_height = self.frame_size
+        scale = min(self.width() / frame_width, self.height() / frame_height)
+        width, height = frame_width * scale, frame_height * scale
+        return QRectF((self.width() - width) / 2, (self.height() - height) / 2, width, height)
+
+    def display_scale(self):
+        # Widget pixels per frame pixel
+        if self.frame_size is None:
+            return 1.0
+        return self.target_rect().width() / self.frame_size[0]
+
+    def widget_to_frame(self, point):
+        rect = self.target_rect()
+        scale = self.display_scale()
+        return ((point.x() - rect.x()) / scale, (point.y() - rect.y()) / scale)
+
+    def frame_to_widget(self, point):
+        rect = self.target_rect()
+        scale = self.display_scale()
+        return QPointF(rect.x() + point[0] * scale, rect.y() + point[1] * scale)
+
+    def paintEvent(self, event):
+        with self.lock:
+            frame = self.frame
+            self.dirty = False
+
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), Qt.black)
+        if frame is not None:
+            image, buffer = frame_to_qimage(frame)
+            painter.setRenderHint(QPainter.SmoothPixmapTransform)
+            painter.drawImage(self.target_rect(), image)
+            del buffer  # the image must not outlive the buffer it points into
+
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(QColor(0, 255, 0))
+        for marker in self.markers:
+            painter.drawEllipse(self.frame_to_widget(marker), self.marker_radius, self.marker_radius)
+        painter.end()